@@ -0,0 +1,342 @@
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+LATIN_WORDS = ("the reader turned another page while rain kept falling over quiet harbour town "
+               "letters arrived late every winter and nobody asked where the lighthouse keeper went").split()
+CJK_CHARACTERS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+
+
+def _paragraphs(rng: random.Random, characters: int, language: str) -> List[str]:
+    paragraphs, size = [], 0
+    while size < characters:
+        if language == "cjk":
+            text = "".join(rng.choice(CJK_CHARACTERS) for _ in range(rng.randint(60, 200))) + "。"
+        else:
+            text = " ".join(rng.choice(LATIN_WORDS) for _ in range(rng.randint(20, 60))).capitalize() + "."
+        paragraphs.append(text)
+        size += len(text)
+    return paragraphs
+
+
+def _image(rng: random.Random, size: int) -> bytes:
+    from PyQt5.QtCore import QBuffer, QIODevice
+    from PyQt5.QtGui import QColor, QImage, QPainter
+
+    image = QImage(size, size * 3 // 4, QImage.Format_RGB32)
+    image.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter = QPainter(image)
+    for _ in range(64):
+        painter.fillRect(rng.randrange(size), rng.randrange(size), rng.randrange(1, size // 4 + 2),
+                         rng.randrange(1, size // 4 + 2),
+                         QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.end()
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPEG", 90)
+    return bytes(buffer.data())
+
+
+def generateEpub(epubPath: str, chapters: int = 50, chapterChars: int = 20000, cssFiles: int = 2, images: int = 0,
+                 imageSize: int = 2048, tocDepth: int = 2, language: str = "latin", seed: int = 0) -> str:
+    """
+    Writes a synthetic EPUB of the given shape. The same arguments always produce the same book.
+    Every chapter has tocDepth levels of nested sections, each listed in the toc.ncx and the nav document,
+    and the images are spread over the chapters.
+    """
+    if language not in ("latin", "cjk"):
+        raise ValueError("language must be latin or cjk")
+    rng = random.Random(seed)
+    manifest, spine, navPoints, navItems = [], [], [], []
+    playOrder = 0
+
+    with zipfile.ZipFile(epubPath, "w", zipfile.ZIP_DEFLATED) as zipFile:
+        zipFile.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zipFile.writestr("META-INF/container.xml",
+                         '<?xml version="1.0"?><container version="1.0" '
+                         'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                         '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+                         '</rootfiles></container>')
+        for index in range(cssFiles):
+            rules = "\n".join(f".c{index}-{rule} {{ margin: {rule % 7}px; color: #{rng.randrange(0xffffff):06x}; }}"
+                              for rule in range(200))
+            zipFile.writestr(f"OEBPS/Styles/style{index}.css", f"p {{ line-height: 1.{index + 4}; }}\n{rules}")
+            manifest.append(f'<item id="css{index}" href="Styles/style{index}.css" media-type="text/css"/>')
+        for index in range(images):
+            zipFile.writestr(f"OEBPS/Images/image{index}.jpg", _image(rng, imageSize))
+            manifest.append(f'<item id="image{index}" href="Images/image{index}.jpg" media-type="image/jpeg"/>')
+        links = "".join(f'<link rel="stylesheet" type="text/css" href="../Styles/style{index}.css"/>'
+                        for index in range(cssFiles))
+
+        for chapter in range(chapters):
+            paragraphs = _paragraphs(rng, chapterChars, language)
+            sections = max(1, tocDepth)
+            body = []
+            for section in range(sections):
+                heading = f"Chapter {chapter + 1}" if section == 0 else f"Section {chapter + 1}.{section}"
+                body.append(f'<h{min(6, section + 1)} id="s{chapter}-{section}">{heading}</h{min(6, section + 1)}>')
+                body.extend(f"<p>{text}</p>" for text in paragraphs[len(paragraphs) * section // sections:
+                                                                     len(paragraphs) * (section + 1) // sections])
+            if images:
+                for index in range(chapter * images // chapters, (chapter + 1) * images // chapters):
+                    body.append(f'<p><img src="../Images/image{index}.jpg" alt=""/></p>')
+            zipFile.writestr(f"OEBPS/Text/chapter{chapter}.xhtml",
+                             '<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml">'
+                             f'<head><title>Chapter {chapter + 1}</title>{links}</head>'
+                             f'<body>{"".join(body)}</body></html>')
+            manifest.append(f'<item id="chapter{chapter}" href="Text/chapter{chapter}.xhtml" '
+                            'media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="chapter{chapter}"/>')
+
+            ncx, nav = "", ""
+            for section in reversed(range(sections)):
+                playOrder += 1
+                title = f"Chapter {chapter + 1}" if section == 0 else f"Section {chapter + 1}.{section}"
+                href = f"Text/chapter{chapter}.xhtml#s{chapter}-{section}"
+                ncx = (f'<navPoint id="nav{chapter}-{section}" playOrder="{playOrder}"><navLabel><text>{title}'
+                       f'</text></navLabel><content src="{href}"/>{ncx}</navPoint>')
+                nav = f'<li><a href="{href}">{title}</a>{f"<ol>{nav}</ol>" if nav else ""}</li>'
+            navPoints.append(ncx)
+            navItems.append(nav)
+
+        zipFile.writestr("OEBPS/toc.ncx",
+                         '<?xml version="1.0" encoding="utf-8"?><ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" '
+                         f'version="2005-1"><navMap>{"".join(navPoints)}</navMap></ncx>')
+        zipFile.writestr("OEBPS/nav.xhtml",
+                         '<?xml version="1.0" encoding="utf-8"?><html xmlns="http://www.w3.org/1999/xhtml" '
+                         'xmlns:epub="http://www.idpf.org/2007/ops"><head><title>Contents</title></head><body>'
+                         f'<nav epub:type="toc"><ol>{"".join(navItems)}</ol></nav></body></html>')
+        zipFile.writestr("OEBPS/content.opf",
+                         '<?xml version="1.0" encoding="utf-8"?><package xmlns="http://www.idpf.org/2007/opf" '
+                         'version="3.0" unique-identifier="id"><metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                         f'<dc:identifier id="id">benchmark-{seed}</dc:identifier><dc:title>Benchmark {seed}</dc:title>'
+                         f'<dc:language>{"zh" if language == "cjk" else "en"}</dc:language></metadata><manifest>'
+                         '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+                         '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+                         f'{"".join(manifest)}</manifest><spine toc="ncx">{"".join(spine)}</spine></package>')
+    return epubPath
+
+
+def _summary(samples: List[float]) -> dict:
+    return {"samples": len(samples), "min": min(samples), "median": statistics.median(samples),
+            "mean": statistics.fmean(samples), "max": max(samples)}
+
+
+def _time(func: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(epubPath: str, repeat: int = 5, query: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Times the reading paths on a book, in seconds. The caches must point to an empty directory.
+    """
+    from .utils import EpubParser, SearchIndex, StateStore, parseOpf, searchBook
+    from .utils.parsecache import parseCache
+
+    results = {}
+
+    def openCold() -> None:
+        parseCache.entryPath(epubPath).unlink(missing_ok=True)
+        EpubParser(epubPath).close()
+
+    results["parser.open.cold"] = _summary(_time(openCold, repeat))
+    results["parser.open.cached"] = _summary(_time(lambda: EpubParser(epubPath).close(), repeat))
+
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    package = parseOpf(epubParser.readFile(epubParser.opfFile), epubParser.opfFile)
+    results["parser.parseToc"] = _summary(_time(lambda: epubParser.parseToc(package), repeat))
+
+    pageSamples = []
+    for _ in range(repeat):
+        epubParser.renderCache.clear()
+        epubParser._bookCss = None
+        for pagePath in epubParser.pagesPath:
+            start = time.perf_counter()
+            epubParser.getPageHtml(pagePath)
+            pageSamples.append(time.perf_counter() - start)
+    results["parser.getPageHtml"] = _summary(pageSamples)
+    results["parser.getPageHtml.cached"] = _summary(
+        _time(lambda: [epubParser.getPageHtml(pagePath) for pagePath in epubParser.pagesPath], repeat))
+
+    if query is None:
+        query = "人民" if epubParser.meta.get("dc:language") == "zh" else "lighthouse keeper"
+    # the first search starts the worker processes
+    list(searchBook(epubPath, epubParser.pagesPath, query))
+    results["search.scan"] = _summary(_time(lambda: list(searchBook(epubPath, epubParser.pagesPath, query)), repeat))
+    searchIndex = SearchIndex.build(epubParser)
+    results["search.buildIndex"] = _summary(_time(lambda: SearchIndex.build(epubParser), repeat))
+    results["search.index"] = _summary(_time(lambda: list(searchIndex.hits(query)), repeat))
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = StateStore(os.path.join(directory, "state.db"))
+        progress = {"pageIndex": 0, "scrollHeight": 0.0, "fraction": 0.0, "percentage": 0.0}
+
+        def saveProgress() -> None:
+            progress["fraction"] = (progress["fraction"] + 0.01) % 1
+            store.setProgress(epubPath, progress)
+
+        saveProgress()
+        results["state.setProgress"] = _summary(_time(saveProgress, repeat * 20))
+        store.close()
+    epubParser.close()
+    return results
+
+
+def measureMemory(epubPath: str) -> dict:
+    """
+    Returns the peak traced allocations of opening a book, rendering every page and indexing it.
+    """
+    from .utils import EpubParser, SearchIndex
+
+    tracemalloc.start()
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    for pagePath in epubParser.pagesPath:
+        epubParser.getPageHtml(pagePath)
+    SearchIndex.build(epubParser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    epubParser.close()
+    memory = {"tracedPeakBytes": peak}
+    try:
+        import resource
+        # ru_maxrss is in kilobytes, except on macOS
+        memory["maxRssBytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (
+            1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        pass
+    return memory
+
+
+def measureStartup(epubPath: str, repeat: int = 5) -> Dict[str, dict]:
+    """
+    Times what a start of the reader waits on before the last page is shown: importing the gui,
+    and either restoring the page from the restore cache or opening the book and rendering the page.
+    """
+    from .utils import EpubParser, RestoreCache
+    from .utils.parsecache import parseCache
+
+    results = {}
+    script = ("import time; start = time.perf_counter(); import ereader.main, ereader.gui; "
+              "print(time.perf_counter() - start)")
+    try:
+        results["startup.import"] = _summary([
+            float(subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent,
+                                 capture_output=True, text=True, check=True).stdout)
+            for _ in range(repeat)])
+    except subprocess.CalledProcessError as e:
+        print(f"skipping startup.import, the gui can not be imported: {e.stderr.strip().splitlines()[-1]}",
+              file=sys.stderr)
+
+    def openBook() -> EpubParser:
+        epubParser = EpubParser(epubPath)
+        epubParser.currentPageIndex = len(epubParser.pagesPath) // 2
+        epubParser.currentPageHtml()
+        return epubParser
+
+    def openCold() -> None:
+        parseCache.entryPath(epubPath).unlink(missing_ok=True)
+        openBook().close()
+
+    results["startup.openBook.cold"] = _summary(_time(openCold, repeat))
+    results["startup.openBook.cached"] = _summary(_time(lambda: openBook().close(), repeat))
+
+    epubParser = openBook()
+    restoreCache = RestoreCache()
+    restoreCache.save(epubPath, epubParser.bookId, epubParser.currentPageIndex, epubParser.currentPageUrl(),
+                      epubParser.currentPageHtml(), {"pageIndex": epubParser.currentPageIndex, "fraction": 0.5})
+    epubParser.close()
+    results["startup.restore"] = _summary(_time(lambda: restoreCache.load(epubPath), repeat))
+    return results
+
+
+def _benchmark(measures: Callable, output: Optional[str], repeat: int, epub: Optional[str], shape: dict) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["EREADER_CACHE_DIR"] = os.path.join(directory, "cache")
+        if epub:
+            epubPath, shape = epub, {"epub": epub}
+        else:
+            epubPath = generateEpub(os.path.join(directory, "benchmark.epub"), **shape)
+        results = {"commit": _commit(), "python": platform.python_version(), "platform": platform.platform(),
+                   "time": time.time(), "shape": shape, "bookBytes": os.path.getsize(epubPath),
+                   **measures(epubPath, repeat)}
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+def run(output: Optional[str] = None, chapters: int = 50, chapterChars: int = 20000, cssFiles: int = 2,
+        images: int = 0, imageSize: int = 2048, tocDepth: int = 2, language: str = "latin", repeat: int = 5,
+        seed: int = 0, epub: Optional[str] = None) -> None:
+    """
+    Benchmarks the parser, rendering, search and state store on a generated book, or on --epub, without a GUI.
+    Caches go to a temporary directory. The results are printed, or written as json to output.
+    Nothing is returned, fire would print the results a second time.
+    """
+    shape = {"chapters": chapters, "chapterChars": chapterChars, "cssFiles": cssFiles, "images": images,
+             "imageSize": imageSize, "tocDepth": tocDepth, "language": language, "seed": seed}
+    _benchmark(lambda epubPath, repeat: {"results": measure(epubPath, repeat),
+                                         "memory": measureMemory(epubPath)},
+               output, repeat, epub, shape)
+
+
+def startup(output: Optional[str] = None, chapters: int = 200, chapterChars: int = 20000, language: str = "latin",
+            repeat: int = 5, seed: int = 0, epub: Optional[str] = None) -> None:
+    """
+    Benchmarks the start of the reader on a generated book, or on --epub, in the format of run.
+    """
+    shape = {"chapters": chapters, "chapterChars": chapterChars, "language": language, "seed": seed}
+    _benchmark(lambda epubPath, repeat: {"results": measureStartup(epubPath, repeat)},
+               output, repeat, epub, shape)
+
+
+def compare(baseline: str, current: str, threshold: float = 0.1) -> None:
+    """
+    Compares the medians of two result files, flagging stages more than threshold slower than the baseline.
+    """
+    with open(baseline, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(current, encoding="utf-8") as f:
+        after = json.load(f)
+    if before["shape"] != after["shape"]:
+        print("warning: the results were measured on books of different shapes")
+
+    ratios = {}
+    print(f"{'stage':<28}{'baseline ms':>14}{'current ms':>14}{'ratio':>8}")
+    for name, stage in after["results"].items():
+        if name not in before["results"]:
+            continue
+        old, new = before["results"][name]["median"], stage["median"]
+        ratios[name] = new / old if old else float("inf")
+        flag = "  slower" if ratios[name] > 1 + threshold else "  faster" if ratios[name] < 1 - threshold else ""
+        print(f"{name:<28}{old * 1000:>14.3f}{new * 1000:>14.3f}{ratios[name]:>8.2f}{flag}")
+    if "memory" in before and "memory" in after:
+        old, new = before["memory"]["tracedPeakBytes"], after["memory"]["tracedPeakBytes"]
+        ratios["memory.tracedPeak"] = new / old if old else float("inf")
+        print(f"{'memory.tracedPeak MB':<28}{old / 2 ** 20:>14.1f}{new / 2 ** 20:>14.1f}"
+              f"{ratios['memory.tracedPeak']:>8.2f}")
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from .utils import EpubParser, htmlToMarkdown, htmlToText, normalizeBlankLines
+
+FORMATS = {"txt": ".txt", "md": ".md", "jsonl": ".jsonl"}
+
+
+def bookTitle(epubParser: EpubParser) -> str:
+    title = (epubParser.meta or {}).get("dc:title", "")
+    if isinstance(title, list):
+        title = title[0]
+    return title or Path(epubParser.epubPath).stem
+
+
+def exportBook(epubPath: str, outputPath: str, format: str = "txt") -> Tuple[str, int, int]:
+    """
+    Writes the text of a book to outputPath one chapter at a time, returns the book, its chapter and character counts.
+    """
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    characters = 0
+    tempPath = f"{outputPath}.part"
+    try:
+        title = bookTitle(epubParser)
+        with open(tempPath, "w", encoding="utf-8") as out:
+            for index, pagePath in enumerate(epubParser.pagesPath):
+                html = epubParser.getPageHtml(pagePath, withCss=False)
+                if format == "md":
+                    text = htmlToMarkdown(html)
+                else:
+                    text = normalizeBlankLines(htmlToText(html, "\n"))
+                if not text:
+                    continue
+                characters += len(text)
+                if format == "jsonl":
+                    out.write(json.dumps({"book": title, "path": epubPath, "chapter": index,
+                                          "href": pagePath, "text": text}, ensure_ascii=False) + "\n")
+                else:
+                    out.write(text + "\n\n")
+        os.replace(tempPath, outputPath)
+    finally:
+        epubParser.close()
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+    return epubPath, len(epubParser.pagesPath), characters
+
+
+def findBooks(source: Path) -> Iterator[Path]:
+    if source.is_file():
+        yield source
+    else:
+        yield from sorted(source.rglob("*.epub"))
+
+
+def export(source: str, output: Optional[str] = None, format: str = "txt", workers: Optional[int] = None,
+           overwrite: bool = False) -> None:
+    """
+    Exports a book, or every book under a directory, to plain text, markdown or json lines.
+    Books are processed in parallel, the output keeps the directory layout of the source.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    source = Path(source)
+    root = source.parent if source.is_file() else source
+    outputRoot = Path(output) if output else root
+
+    jobs = []
+    for book in findBooks(source):
+        target = (outputRoot / book.relative_to(root)).with_suffix(FORMATS[format])
+        if target.exists() and not overwrite:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        jobs.append((str(book), str(target)))
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(exportBook, book, target, format): book for book, target in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                epubPath, chapters, characters = future.result()
+                print(f"[{done}/{len(jobs)}] {epubPath}: {chapters} chapters, {characters} characters")
+            except Exception as e:
+                failed += 1
+                logging.error("[%d/%d] %s: %s", done, len(jobs), futures[future], e)
+    print(f"exported {len(jobs) - failed} books, {failed} failed")
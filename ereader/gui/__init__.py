@@ -1 +1,3 @@
-from .ereader import EReader
\ No newline at end of file
+from .commandserver import CommandServer, StdinReader
+from .ereader import EReader
+from .schemehandler import registerEpubScheme
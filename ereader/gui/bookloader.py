@@ -0,0 +1,81 @@
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from ..utils import EpubParser, data, threadPool
+
+
+class BookLoader(QObject):
+    """
+    Opens books on the worker pool so the gui never waits for an archive or its parsing.
+    Stages are reported through progress, pageReady delivers the parser as soon as the page
+    to show first is rendered. Starting a load supersedes the one running, whose result is dropped,
+    also when it was already queued to the gui thread.
+    """
+
+    progress = pyqtSignal(str, str)
+    pageReady = pyqtSignal(object, dict)
+    failed = pyqtSignal(str, str)
+    _pageReady = pyqtSignal(object, dict, int)
+    _failed = pyqtSignal(str, str, int)
+
+    def __init__(self, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._pageReady.connect(self._deliverPage)
+        self._failed.connect(self._deliverFailure)
+
+    def _deliverPage(self, epubParser, readProgress: dict, generation: int) -> None:
+        if self._current(generation):
+            self.pageReady.emit(epubParser, readProgress)
+        else:
+            epubParser.close()
+
+    def _deliverFailure(self, epubPath: str, error: str, generation: int) -> None:
+        if self._current(generation):
+            self.failed.emit(epubPath, error)
+
+    def load(self, epubPath: str, extract: bool = False) -> None:
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        threadPool().submit(self._load, generation, epubPath, extract)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._generation += 1
+
+    def _current(self, generation: int) -> bool:
+        with self._lock:
+            return generation == self._generation
+
+    def _load(self, generation: int, epubPath: str, extract: bool) -> None:
+        epubParser = None
+        try:
+            self.progress.emit(epubPath, "opening")
+            epubParser = EpubParser(epubPath, extract)
+            if not self._current(generation):
+                epubParser.close()
+                return
+
+            self.progress.emit(epubPath, "rendering")
+            readProgress = data.progress(epubPath)
+            pageIndex = epubParser.progressPageIndex(readProgress) if readProgress else None
+            if pageIndex is not None:
+                readProgress = dict(readProgress, pageIndex=pageIndex)
+                epubParser.currentPageIndex = pageIndex
+            else:
+                readProgress = {}
+            epubParser.currentPageHtml()
+            if not self._current(generation):
+                epubParser.close()
+                return
+            self._pageReady.emit(epubParser, readProgress, generation)
+        except Exception as e:
+            logging.exception("failed to open %s", epubPath)
+            if epubParser:
+                epubParser.close()
+            if self._current(generation):
+                self._failed.emit(epubPath, str(e), generation)
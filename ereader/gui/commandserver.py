@@ -0,0 +1,84 @@
+import getpass
+import json
+import sys
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+from .shell import CommandDispatcher
+
+
+class StdinReader(QObject):
+    """
+    Reads shell commands from stdin on a daemon thread, the Qt event loop only sees whole lines.
+    The end of stdin quits the reader only if exitOnEof is set, a closed stdin of a launcher or service
+    just stops the reading.
+    """
+
+    lineReceived = pyqtSignal(str)
+
+    def __init__(self, prompt: str = "$", exitOnEof: bool = True, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self.prompt = prompt
+        self.exitOnEof = exitOnEof
+
+    def start(self) -> None:
+        threading.Thread(target=self.run, name="ereader-stdin", daemon=True).start()
+
+    def run(self) -> None:
+        while True:
+            print(self.prompt, end="", flush=True)
+            line = sys.stdin.readline()
+            if not line:
+                if self.exitOnEof:
+                    self.lineReceived.emit("exit")
+                return
+            self.lineReceived.emit(line)
+            if line.strip() == "exit":
+                return
+
+
+class CommandServer(QObject):
+    """
+    Accepts commands on a local socket and answers each request with one json line.
+    A request is a line holding a command, several commands separated by semicolons (answered
+    with a list of replies), or a json array of commands.
+    """
+
+    def __init__(self, dispatcher: CommandDispatcher, name: str = None, parent: QObject = None) -> None:
+        super().__init__(parent)
+        self.dispatcher = dispatcher
+        self.name = name or f"ereader-{getpass.getuser()}"
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.onNewConnection)
+
+    def listen(self) -> bool:
+        QLocalServer.removeServer(self.name)
+        return self.server.listen(self.name)
+
+    def onNewConnection(self) -> None:
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.onReadyRead(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def onReadyRead(self, socket: QLocalSocket) -> None:
+        while socket.canReadLine():
+            request = bytes(socket.readLine()).decode("utf-8").strip()
+            if request:
+                socket.write((json.dumps(self.handle(request), ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        socket.flush()
+
+    def handle(self, request: str):
+        if request.startswith("["):
+            try:
+                lines = json.loads(request)
+            except json.JSONDecodeError as e:
+                return {"ok": False, "command": request, "error": f"JSONDecodeError: {e}"}
+            if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+                return {"ok": False, "command": request,
+                        "error": "TypeError: a json request must be an array of strings"}
+            return [self.dispatcher.dispatch(line) for line in lines]
+        replies = self.dispatcher.dispatchBatch(request)
+        return replies[0] if len(replies) == 1 else replies
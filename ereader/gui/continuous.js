@@ -0,0 +1,64 @@
+window.ereader = (function () {
+    var container = document.getElementById('ereader-chapters');
+
+    function section(index, html) {
+        var chapter = document.createElement('section');
+        chapter.className = 'ereader-chapter';
+        chapter.dataset.index = index;
+        chapter.innerHTML = html;
+        return chapter;
+    }
+
+    function keepPosition(change) {
+        var height = document.documentElement.scrollHeight;
+        change();
+        window.scrollBy(0, document.documentElement.scrollHeight - height);
+    }
+
+    return {
+        append: function (index, html) {
+            container.appendChild(section(index, html));
+        },
+        prepend: function (index, html) {
+            keepPosition(function () {
+                container.insertBefore(section(index, html), container.firstChild);
+            });
+        },
+        evictFirst: function () {
+            keepPosition(function () {
+                container.firstElementChild.remove();
+            });
+        },
+        evictLast: function () {
+            container.lastElementChild.remove();
+        },
+        locate: function () {
+            var chapters = container.children;
+            for (var i = 0; i < chapters.length; i++) {
+                var rect = chapters[i].getBoundingClientRect();
+                if (rect.bottom > 0) {
+                    var scrollable = Math.max(1, rect.height - window.innerHeight);
+                    return [parseInt(chapters[i].dataset.index), Math.min(1, Math.max(0, -rect.top / scrollable))];
+                }
+            }
+            return null;
+        },
+        scrollToAnchor: function (index, id) {
+            var chapter = container.querySelector('section[data-index="' + index + '"]');
+            if (!chapter) {
+                return false;
+            }
+            var anchor = id ? chapter.querySelector('[id="' + CSS.escape(id) + '"], [name="' + CSS.escape(id) + '"]') : null;
+            (anchor || chapter).scrollIntoView();
+            return true;
+        },
+        scrollTo: function (index, fraction) {
+            var chapter = container.querySelector('section[data-index="' + index + '"]');
+            if (!chapter) {
+                return false;
+            }
+            window.scrollTo(0, chapter.offsetTop + fraction * Math.max(0, chapter.offsetHeight - window.innerHeight));
+            return true;
+        }
+    };
+})();
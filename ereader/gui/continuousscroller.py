@@ -0,0 +1,147 @@
+import json
+from typing import Callable
+
+from PyQt5.QtCore import QObject, QPointF, QUrl
+
+from ..utils import bodyOf, rewriteUrls
+from .resources import resource
+
+# links to chapters become fragments the scroller follows, the chapters are not documents of their own here
+CHAPTER_LINK = "ereader-chapter-"
+
+
+class ContinuousScroller(QObject):
+    """
+    Continuous reading mode: the web view holds one document with a sliding window of chapters.
+    Chapters are appended or prepended when the reader scrolls near an edge of the window,
+    and the chapter furthest away is evicted once the window holds more than maxChapters.
+    """
+
+    def __init__(self, readView, maxChapters: int = 4) -> None:
+        super().__init__(readView)
+        self.readView = readView
+        self.maxChapters = maxChapters
+        self.first = self.last = 0
+        self._pending = False
+        readView.page().scrollPositionChanged.connect(self.onScrollPositionChanged)
+        readView.urlChanged.connect(self.onUrlChanged)
+
+    @property
+    def epubParser(self):
+        return self.readView.epubParser
+
+    def chapterHtml(self, index: int) -> str:
+        """
+        Returns the body of a chapter, its relative urls rewritten since it leaves its own document.
+        Links to chapters point to fragments that onUrlChanged follows inside the continuous document.
+        """
+        pagePath = self.epubParser.pagesPath[index]
+        hrefIndex = self.readView.navIndex().hrefIndex
+
+        def rewrite(url: str) -> str:
+            path, _, fragment = url.partition('#')
+            target = self.epubParser.resolveHref(pagePath, path) if path else pagePath
+            if target in hrefIndex:
+                return f'#{CHAPTER_LINK}{hrefIndex[target]}:{fragment}'
+            url = self.epubParser.pageUrl(target)
+            return f'{url}#{fragment}' if fragment else url
+
+        return rewriteUrls(bodyOf(self.readView.prefetcher.pageHtml(index)), rewrite)
+
+    @staticmethod
+    def sectionSelector(index: int) -> str:
+        return f"document.querySelector('section.ereader-chapter[data-index=\"{index}\"]')"
+
+    def open(self, index: int) -> None:
+        """
+        Replaces the document with a window holding only chapter index.
+        """
+        self.first = self.last = index
+        self._pending = False
+        html = ('<!DOCTYPE html><html><head><meta charset="utf-8"/>'
+                f'<style>{self.epubParser.bookCss()}\nbody {{ overflow-anchor: none; }}</style></head><body>'
+                f'<div id="ereader-chapters"><section class="ereader-chapter" data-index="{index}">'
+                f'{self.chapterHtml(index)}</section></div><script>{resource("continuous.js")}'
+                f'{self.readView.highlightScript(index, self.sectionSelector(index))}</script></body></html>')
+        self.readView.setHtml(html, QUrl(self.epubParser.currentPageUrl()))
+
+    def gotoChapter(self, index: int, onOpened: Callable = None) -> None:
+        """
+        Scrolls to the start of chapter index, opening a new window if it is not loaded.
+        """
+        if self.first <= index <= self.last and not self.readView.loading:
+            self.readView.page().runJavaScript(f"ereader.scrollTo({index}, 0);")
+        else:
+            self.open(index)
+            if onOpened:
+                self.readView.runALF(onOpened)
+
+    def scrollTo(self, index: int, fraction: float) -> None:
+        self.readView.page().runJavaScript(f"ereader.scrollTo({index}, {fraction});")
+
+    def onUrlChanged(self, url: QUrl) -> None:
+        fragment = url.fragment()
+        if not fragment.startswith(CHAPTER_LINK) or not self.epubParser:
+            return
+        index, _, anchor = fragment[len(CHAPTER_LINK):].partition(':')
+        # drop the fragment, so following the same link again changes the url again
+        self.readView.page().runJavaScript("history.replaceState(null, '', location.href.split('#')[0]);")
+        if index.isdigit() and int(index) < len(self.epubParser.pagesPath):
+            self.followLink(int(index), anchor)
+
+    def followLink(self, index: int, anchor: str = "") -> None:
+        """
+        Scrolls to anchor in chapter index, or to the chapter's start, opening a window at it if it is not loaded.
+        """
+        def scroll() -> None:
+            self.readView.page().runJavaScript(f"ereader.scrollToAnchor({index}, {json.dumps(anchor)});")
+
+        if self.first <= index <= self.last and not self.readView.loading:
+            self.epubParser.currentPageIndex = index
+            scroll()
+        else:
+            self.readView.loadPage(index, scroll)
+
+    def onScrollPositionChanged(self, position: QPointF) -> None:
+        if self._pending or self.readView.loading or not self.epubParser:
+            return
+        page = self.readView.page()
+        viewportHeight = self.readView.height() / page.zoomFactor()
+        margin = 2 * viewportHeight
+        if position.y() + viewportHeight > page.contentsSize().height() - margin and \
+                self.last + 1 < len(self.epubParser.pagesPath):
+            self.last += 1
+            js = f"ereader.append({self.last}, {json.dumps(self.chapterHtml(self.last))});"
+            js += self.readView.highlightScript(self.last, self.sectionSelector(self.last))
+            if self.last - self.first + 1 > self.maxChapters:
+                js += "ereader.evictFirst();"
+                self.first += 1
+            self._run(js)
+            self.readView.prefetcher.schedule(self.last, 1)
+        elif position.y() < margin and self.first > 0:
+            self.first -= 1
+            js = f"ereader.prepend({self.first}, {json.dumps(self.chapterHtml(self.first))});"
+            js += self.readView.highlightScript(self.first, self.sectionSelector(self.first))
+            if self.last - self.first + 1 > self.maxChapters:
+                js += "ereader.evictLast();"
+                self.last -= 1
+            self._run(js)
+            self.readView.prefetcher.schedule(self.first, -1)
+
+    def _run(self, js: str) -> None:
+        self._pending = True
+
+        def done(_) -> None:
+            self._pending = False
+
+        self.readView.page().runJavaScript(js, done)
+
+    def locate(self, callback: Callable[[int, float], None]) -> None:
+        """
+        Finds the chapter at the top of the viewport and the fraction of it scrolled past.
+        """
+        def located(result) -> None:
+            if result:
+                callback(int(result[0]), float(result[1]))
+
+        self.readView.page().runJavaScript("ereader.locate();", located)
@@ -1,16 +1,14 @@
 import logging
-import os
 from queue import Queue
 
-import fire
 from PyQt5 import QtGui
 from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtWebEngineWidgets import QWebEngineSettings
 from PyQt5.QtWidgets import QApplication, QHBoxLayout
 from qframelesswindow import FramelessWindow, StandardTitleBar
 
-from ..utils import data
 from .readwidget import ReadWidget
+from .resources import resource
+from .shell import CommandDispatcher, Shell
 from .tocwidget import TocWidget
 
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +28,8 @@ class EReader(FramelessWindow):
         self._resizeWindow()
         self._setLayout()
         self._setQss()
+        self.shell = Shell(self)
+        self.dispatcher = CommandDispatcher(self.shell)
         self.receivedCmd.connect(self.dealCmd)
 
         self.setMouseTracking(True)
@@ -37,53 +37,7 @@ class EReader(FramelessWindow):
         self.show()
 
     def dealCmd(self, cmd: str) -> None:
-        try:
-            readView = self.readView
-
-            class Shell:
-                def next(self, pageNum: int = 1) -> None:
-                    readView.loadPage(
-                        readView.epubParser.currentPageIndex + pageNum)
-
-                def pre(self, pageNum: int = 1) -> None:
-                    readView.loadPage(
-                        readView.epubParser.currentPageIndex - pageNum)
-
-                def home(self) -> None:
-                    readView.ctrlHome()
-
-                def end(self) -> None:
-                    readView.ctrlEnd()
-
-                def path(self) -> None:
-                    print(readView.epubParser.epubPath)
-
-                def toc(self) -> None:
-                    readView.epubParser.printToc()
-
-                def meta(self) -> None:
-                    print(readView.epubParser.meta)
-
-                def search(self, query: str, allPages: bool = False) -> None:
-                    readView.search(query, allPages)
-
-                def index(self) -> None:
-                    print(readView.epubParser.currentPageIndex)
-
-                def setFontFamily(self, family: str) -> None:
-                    QWebEngineSettings.globalSettings().setFontFamily(
-                        QWebEngineSettings.StandardFont, family)
-
-                def setFontSize(self, size: int) -> None:
-                    QWebEngineSettings.globalSettings().setFontSize(
-                        QWebEngineSettings.DefaultFontSize, size)
-
-                def exit(self) -> None:
-                    ...
-
-            fire.Fire(name="ereader", component=Shell, command=cmd)
-        except:
-            ...
+        self.dispatcher.dispatchBatch(cmd, capture=False)
 
     def _resizeWindow(self) -> None:
         self.resize(1080, 784)
@@ -101,9 +55,7 @@ class EReader(FramelessWindow):
         self.setLayout(self.hBoxLayout)
 
     def _setQss(self) -> None:
-        qss_path = os.path.join(os.path.dirname(__file__), 'ereader.qss')
-        with open(qss_path, 'r', encoding='utf-8') as f:
-            self.setStyleSheet(f.read())
+        self.setStyleSheet(resource("ereader.qss"))
 
     def openEpub(self) -> None:
         self.readView.openEpub()
@@ -111,6 +63,16 @@ class EReader(FramelessWindow):
     def loadEpub(self, epubPath: str) -> None:
         self.readView.loadEpub(epubPath)
 
+    def updateTitle(self, percentage: float) -> None:
+        title = (self.readView.epubParser.meta or {}).get("dc:title", "EReader")
+        if isinstance(title, list):
+            title = title[0]
+        if self.readView.paginator:
+            page, pages, exact = self.readView.paginator.bookPage()
+            self.setWindowTitle(f"{title} - page {page} of {pages if exact else f'~{pages}'} - {percentage:.1f}%")
+        else:
+            self.setWindowTitle(f"{title} - {percentage:.1f}%")
+
     def currentReadProgress(self) -> dict:
         return self.readView.currentReadProgress()
 
@@ -125,11 +87,7 @@ class EReader(FramelessWindow):
             self.tocView.hide()
         return super().mouseMoveEvent(e)
 
-    def closeEvent(self, e: QtGui.QCloseEvent=None) -> None:
-        if e:
-            super().closeEvent(e)
-        data["currentReadProgress"] = self.currentReadProgress()
-        data.save()
-
-        print("exit")
-        exit()
+    def closeEvent(self, e: QtGui.QCloseEvent) -> None:
+        # leaves the event loop, run saves the progress and cleans up once app.exec_ returns
+        e.accept()
+        QApplication.quit()
@@ -0,0 +1,92 @@
+window.ereaderHighlights = window.ereaderHighlights || (function () {
+    function textNodes(root) {
+        var walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+        var nodes = [], node;
+        while ((node = walker.nextNode())) {
+            nodes.push(node);
+        }
+        return nodes;
+    }
+
+    function clear(root) {
+        var marks = root.querySelectorAll('mark.ereader-highlight');
+        if (!marks.length) {
+            return;
+        }
+        marks.forEach(function (mark) {
+            mark.replaceWith.apply(mark, Array.from(mark.childNodes));
+        });
+        root.normalize();
+    }
+
+    function wrap(node, from, to, segment, seen) {
+        if (to < node.length) {
+            node.splitText(to);
+        }
+        var target = from > 0 ? node.splitText(from) : node;
+        var mark = document.createElement('mark');
+        mark.className = 'ereader-highlight';
+        mark.dataset.ids = segment[2].join(' ');
+        mark.style.backgroundColor = segment[3];
+        mark.style.color = 'inherit';
+        segment[2].forEach(function (id) {
+            if (!seen.has(id)) {
+                seen.add(id);
+                mark.id = 'ereader-highlight-' + id;
+            }
+        });
+        target.parentNode.insertBefore(mark, target);
+        mark.appendChild(target);
+    }
+
+    function rootOf(node) {
+        var element = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+        return (element && element.closest('section.ereader-chapter')) || document.body;
+    }
+
+    return {
+        // wraps the sorted disjoint [start, end, ids, color] segments of root's text in marks, in one walk
+        apply: function (root, segments) {
+            if (!root) {
+                return 0;
+            }
+            clear(root);
+            var nodes = textNodes(root), seen = new Set(), next = 0, offset = 0;
+            for (var i = 0; i < nodes.length && next < segments.length; i++) {
+                var node = nodes[i], start = offset, end = offset + node.length;
+                offset = end;
+                var first = next;
+                while (next < segments.length && segments[next][1] <= end) {
+                    next++;
+                }
+                var last = next < segments.length && segments[next][0] < end ? next : next - 1;
+                // right to left, so node keeps holding the text before the marks
+                for (var j = last; j >= first; j--) {
+                    var from = Math.max(segments[j][0], start) - start, to = Math.min(segments[j][1], end) - start;
+                    if (from < to) {
+                        wrap(node, from, to, segments[j], seen);
+                    }
+                }
+            }
+            return segments.length;
+        },
+        // the selection as [chapter index or null, start, end, text], offsets into the text of its chapter
+        selection: function () {
+            var selection = window.getSelection();
+            if (!selection.rangeCount || selection.isCollapsed) {
+                return null;
+            }
+            var range = selection.getRangeAt(0), root = rootOf(range.startContainer);
+            var before = document.createRange();
+            before.selectNodeContents(root);
+            before.setEnd(range.startContainer, range.startOffset);
+            if (!root.contains(range.endContainer)) {
+                range = range.cloneRange();
+                range.setEndAfter(root.lastChild);
+            }
+            var start = before.toString().length, text = range.toString();
+            var index = root.dataset && root.dataset.index !== undefined ? parseInt(root.dataset.index) : null;
+            return [index, start, start + text.length, text];
+        }
+    };
+})();
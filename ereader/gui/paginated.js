@@ -0,0 +1,60 @@
+window.ereader = (function () {
+    var scroller = document.scrollingElement;
+
+    function pageWidth() {
+        return window.innerWidth;
+    }
+
+    function pageCount() {
+        return Math.max(1, Math.round(scroller.scrollWidth / pageWidth()));
+    }
+
+    function textStarts() {
+        var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        var starts = new Map(), offset = 0, node;
+        while ((node = walker.nextNode())) {
+            starts.set(node, offset);
+            offset += node.length;
+        }
+        return {starts: starts, length: offset};
+    }
+
+    function textOffset(text, container, offset) {
+        if (container.nodeType === Node.TEXT_NODE) {
+            return text.starts.get(container) + offset;
+        }
+        // the caret is between elements, take the first text after it
+        var node = container.childNodes[offset] || container;
+        var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        walker.currentNode = node;
+        var next = node.nodeType === Node.TEXT_NODE ? node : walker.nextNode();
+        return next ? text.starts.get(next) : text.length;
+    }
+
+    return {
+        // the character offsets of the first text of every page
+        measure: function () {
+            var text = textStarts(), style = getComputedStyle(document.body);
+            var x = parseFloat(style.paddingLeft) + 2, y = parseFloat(style.paddingTop) + 2;
+            var position = scroller.scrollLeft, breaks = [], pages = pageCount();
+            for (var i = 0; i < pages; i++) {
+                scroller.scrollLeft = i * pageWidth();
+                var range = document.caretRangeFromPoint(x, y);
+                var offset = range ? textOffset(text, range.startContainer, range.startOffset) : 0;
+                breaks.push(Math.max(offset, breaks.length ? breaks[breaks.length - 1] : 0));
+            }
+            scroller.scrollLeft = position;
+            return breaks;
+        },
+        showPage: function (page) {
+            scroller.scrollLeft = page * pageWidth();
+        },
+        pageOfElement: function (id) {
+            var element = document.getElementById(id);
+            if (!element) {
+                return -1;
+            }
+            return Math.floor((element.getBoundingClientRect().left + scroller.scrollLeft) / pageWidth());
+        }
+    };
+})();
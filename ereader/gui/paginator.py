@@ -0,0 +1,198 @@
+import json
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QObject, QTimer, QUrl
+
+from ..utils import addCssToHtml, layoutCache
+from .resources import resource
+
+
+class Paginator(QObject):
+    """
+    Paginated reading mode: chapters are laid out in CSS columns, one screen page per column.
+    The page breaks of a chapter, as character offsets of the page starts, are measured once per layout
+    (typography and viewport) and kept in the layout cache, so page counts, jumps and
+    progress are lookups. A change of layout keeps the reader on the text that was at the top of the page.
+    """
+
+    def __init__(self, readView, relayoutDelay: int = 200) -> None:
+        super().__init__(readView)
+        self.readView = readView
+        self.page = 0
+        self.breaks: Dict[int, List[int]] = {}
+        self.layoutKey = None
+        self.contentHash = None
+        self._ready = False
+        self._target: Optional[Callable[[List[int]], int]] = None
+
+        self.relayoutTimer = QTimer(self)
+        self.relayoutTimer.setSingleShot(True)
+        self.relayoutTimer.setInterval(relayoutDelay)
+        self.relayoutTimer.timeout.connect(self.relayout)
+
+    @property
+    def epubParser(self):
+        return self.readView.epubParser
+
+    @property
+    def chapter(self) -> int:
+        return self.epubParser.currentPageIndex
+
+    def currentLayoutKey(self) -> str:
+        zoom = self.readView.zoomFactor()
+        return (f"{self.readView.typography.layoutKey()}|"
+                f"{round(self.readView.width() / zoom)}x{round(self.readView.height() / zoom)}")
+
+    def loadLayout(self) -> None:
+        layoutKey = self.currentLayoutKey()
+        # the breaks belong to one book, switching books loads the other's
+        if layoutKey != self.layoutKey or self.epubParser.contentHash != self.contentHash:
+            self.layoutKey = layoutKey
+            self.contentHash = self.epubParser.contentHash
+            self.breaks = layoutCache.load(self.contentHash, layoutKey)
+
+    def pageCount(self) -> int:
+        return len(self.breaks.get(self.chapter) or [0])
+
+    def open(self, index: int) -> None:
+        """
+        Shows chapter index laid out in pages, measuring its page breaks if this layout has not seen it.
+        """
+        self.loadLayout()
+        self.page = 0
+        self._ready = False
+        html = addCssToHtml(resource("paginated.css"), self.readView.prefetcher.pageHtml(index))
+        self.readView.setHtml(html, QUrl(self.epubParser.pageUrl(self.epubParser.pagesPath[index])))
+        self.readView.runALF(lambda: self._onLoaded(index))
+
+    def _onLoaded(self, index: int) -> None:
+        if index != self.chapter:
+            return
+        # highlights only split text nodes, the text offsets of the page breaks stay the same
+        js = self.readView.highlightScript(index) + resource("paginated.js")
+        if index in self.breaks:
+            self.readView.page().runJavaScript(js, lambda _: self._laidOut())
+        else:
+            key = (self.contentHash, self.layoutKey)
+            self.readView.page().runJavaScript(js + "ereader.measure();",
+                                               lambda breaks: self._measured(index, key, breaks))
+
+    def _measured(self, index: int, key: Tuple[str, str], breaks: Optional[list]) -> None:
+        if key != (self.contentHash, self.layoutKey) or index != self.chapter:
+            return
+        self.breaks[index] = [int(offset) for offset in breaks or [0]]
+        layoutCache.save(self.contentHash, self.layoutKey, self.breaks)
+        self._laidOut()
+
+    def _laidOut(self) -> None:
+        self._ready = True
+        target, self._target = self._target, None
+        self.gotoPage(target(self.breaks[self.chapter]) if target else self.page)
+
+    def _goto(self, target: Callable[[List[int]], int]) -> None:
+        if self._ready:
+            self.gotoPage(target(self.breaks[self.chapter]))
+        else:
+            self._target = target
+
+    def gotoPage(self, page: int) -> None:
+        if not self._ready:
+            self._target = lambda breaks: page
+            return
+        self.page = min(max(page, 0), self.pageCount() - 1)
+        self.readView.page().runJavaScript(f"ereader.showPage({self.page});")
+        self.readView.progressTracker.reset(0, self.fraction())
+
+    def gotoLast(self) -> None:
+        self._goto(lambda breaks: len(breaks) - 1)
+
+    def gotoFraction(self, fraction: float) -> None:
+        self._goto(lambda breaks: round(fraction * (len(breaks) - 1)))
+
+    def gotoOffset(self, offset: int) -> None:
+        self._goto(lambda breaks: bisect_right(breaks, offset) - 1)
+
+    def gotoElement(self, elementId: str) -> None:
+        def found(page) -> None:
+            if isinstance(page, (int, float)) and page >= 0:
+                self.gotoPage(int(page))
+
+        def find() -> None:
+            self.readView.page().runJavaScript(f"ereader.pageOfElement({json.dumps(elementId)});", found)
+
+        if self.readView.loading:
+            self.readView.runALF(find)
+        else:
+            find()
+
+    def next(self) -> None:
+        if self.page + 1 < self.pageCount():
+            self.gotoPage(self.page + 1)
+        elif self.chapter + 1 < len(self.epubParser.pagesPath):
+            self.readView.loadPage(self.chapter + 1)
+
+    def previous(self) -> None:
+        if self.page > 0:
+            self.gotoPage(self.page - 1)
+        elif self.chapter > 0:
+            self.readView.loadPage(self.chapter - 1, self.readView.scrollToButton)
+
+    def fraction(self) -> float:
+        count = self.pageCount()
+        return self.page / (count - 1) if count > 1 else 0.0
+
+    def currentOffset(self) -> int:
+        breaks = self.breaks.get(self.chapter)
+        return breaks[self.page] if breaks and self.page < len(breaks) else 0
+
+    def scheduleRelayout(self) -> None:
+        self.relayoutTimer.start()
+
+    def relayout(self) -> None:
+        """
+        Switches to the page breaks of the current layout, staying on the text at the top of the page.
+        """
+        if not self.epubParser or self.readView.loading:
+            return
+        offset = self.currentOffset()
+        previous = self.layoutKey
+        self.loadLayout()
+        if self.layoutKey == previous:
+            return
+        self._ready = False
+        self._target = lambda breaks: bisect_right(breaks, offset) - 1
+        self._onLoaded(self.chapter)
+
+    def chapterCounts(self) -> Tuple[List[int], bool]:
+        """
+        Returns the page count of every chapter and whether they are all measured.
+        The counts of chapters not laid out yet are estimated from their lengths.
+        """
+        navIndex = self.readView.navIndex()
+        lengths = [end - start for start, end in zip(navIndex.offsets, navIndex.offsets[1:])]
+        known = [index for index in range(len(lengths)) if index in self.breaks]
+        knownLength = sum(lengths[index] for index in known)
+        pagesPerChar = sum(len(self.breaks[index]) for index in known) / knownLength if knownLength else 0
+        counts = [len(self.breaks[index]) if index in self.breaks else max(1, round(length * pagesPerChar))
+                  for index, length in enumerate(lengths)]
+        return counts, len(known) == len(lengths)
+
+    def bookPage(self) -> Tuple[int, int, bool]:
+        """
+        Returns the page number in the book, the number of pages and whether the numbers are exact.
+        """
+        counts, exact = self.chapterCounts()
+        return sum(counts[:self.chapter]) + self.page + 1, sum(counts), exact
+
+    def gotoBookPage(self, number: int) -> None:
+        counts, _ = self.chapterCounts()
+        remaining = max(1, number) - 1
+        for index, count in enumerate(counts):
+            if remaining < count or index == len(counts) - 1:
+                break
+            remaining -= count
+        if index == self.chapter:
+            self.gotoPage(remaining)
+        else:
+            self.readView.loadPage(index, lambda: self.gotoPage(remaining))
@@ -0,0 +1,68 @@
+from PyQt5.QtCore import QObject, QPointF, QTimer, pyqtSignal
+
+
+class ProgressTracker(QObject):
+    """
+    Tracks the reading position of a ReadWidget from its scrollPositionChanged signal.
+    Bursts of scroll events are coalesced into one update per interval, read from the position the
+    signal carries instead of asking the renderer, and handed to the state store at most once per saveInterval.
+    The position is kept both in pixels and as a fraction of the chapter, which survives font changes.
+    """
+
+    progressChanged = pyqtSignal()
+
+    def __init__(self, readView, interval: int = 150, saveInterval: int = 3000) -> None:
+        super().__init__(readView)
+        self.readView = readView
+        self.scrollHeight = 0.0
+        self.fraction = 0.0
+        self._position = 0.0
+
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(interval)
+        self.updateTimer.timeout.connect(self.update)
+        self.saveTimer = QTimer(self)
+        self.saveTimer.setSingleShot(True)
+        self.saveTimer.setInterval(saveInterval)
+        self.saveTimer.timeout.connect(self.readView.saveReadProgress)
+
+        readView.page().scrollPositionChanged.connect(self.onScrollPositionChanged)
+
+    def onScrollPositionChanged(self, position: QPointF) -> None:
+        self._position = position.y()
+        if not self.updateTimer.isActive():
+            self.updateTimer.start()
+
+    def update(self) -> None:
+        if self.readView.continuousScroller:
+            self.readView.continuousScroller.locate(self._located)
+            return
+        if self.readView.paginator:
+            # pages are turned by the paginator, which resets the tracker on every turn
+            return
+        page = self.readView.page()
+        viewportHeight = self.readView.height() / page.zoomFactor()
+        scrollable = page.contentsSize().height() - viewportHeight
+        self.scrollHeight = self._position
+        self.fraction = min(1.0, max(0.0, self._position / scrollable)) if scrollable > 0 else 0.0
+        self.changed()
+
+    def _located(self, pageIndex: int, fraction: float) -> None:
+        self.readView.epubParser.currentPageIndex = pageIndex
+        self.scrollHeight = self._position
+        self.fraction = fraction
+        self.changed()
+
+    def reset(self, scrollHeight: float = 0.0, fraction: float = 0.0) -> None:
+        self._position = self.scrollHeight = scrollHeight
+        self.fraction = fraction
+        self.changed()
+
+    def changed(self) -> None:
+        """
+        Schedules a checkpoint of the progress, unless one is already pending.
+        """
+        self.progressChanged.emit()
+        if not self.saveTimer.isActive():
+            self.saveTimer.start()
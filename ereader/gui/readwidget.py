@@ -1,16 +1,25 @@
-import os.path
+import json
 import re
-from typing import Callable
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
 from pathlib import Path
 
-from bs4 import BeautifulSoup
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtCore import Qt
-from PyQt5.QtWebEngineWidgets import QWebEngineSettings
 from PyQt5.QtWidgets import QApplication, QFileDialog, QShortcut, QWidget
-from termcolor import colored
 
-from ..utils import EpubParser, data
+from ..utils import (BookSession, EpubParser, Highlight, NavIndex, OpenBook, Prefetcher, SearchHit, SearchIndex,
+                     addCssToHtml, annotations, data, findAll, htmlToText, metrics, restoreCache, searchBook,
+                     segments, threadPool)
+from .bookloader import BookLoader
+from .continuousscroller import ContinuousScroller
+from .paginator import Paginator
+from .progresstracker import ProgressTracker
+from .resources import resource
+from .schemehandler import SCHEME, EpubSchemeHandler
+from .typography import Typography
 from .webview import WebView
 
 
@@ -21,38 +30,194 @@ class ReadWidget(WebView):
         """
         super().__init__(parent)
         self.settings = settings
-        self._setFont()
+        self.typography = Typography(self, settings)
         self.epubParser = None
+        self.session = BookSession(settings.get("sessionBytes", 256 * 1024 * 1024))
+        self.prefetcher = None
+        self.searchIndex = None
+        self._searchCancelEvent = None
+        self.schemeHandler = EpubSchemeHandler(self)
+        self.page().profile().installUrlSchemeHandler(SCHEME, self.schemeHandler)
 
         self.bindShortcutKeys()
-        self.scrollHeight = 0
-        self.page().scrollPositionChanged.connect(self.onScrollPositionChanged)
-
-    def _setFont(self) -> None:
-        settings = QWebEngineSettings.globalSettings()
-        fontFamily = self.settings.get("fontFamily", "LXGW WenKai")
-        settings.setFontFamily(QWebEngineSettings.StandardFont, fontFamily)
-        fontSize = self.settings.get("fontSize", 24)
-        settings.setFontSize(QWebEngineSettings.DefaultFontSize, fontSize)
-
-    def onScrollPositionChanged(self, _) -> None:
-        def setScrollHeight(height: int) -> None:
-            self.scrollHeight = height
-
-        self.page().runJavaScript("window.scrollY", setScrollHeight)
+        self._savedProgress = None
+        self.continuousScroller = ContinuousScroller(self) if settings.get("continuous") else None
+        self.paginator = Paginator(self) if settings.get("paginated") and not self.continuousScroller else None
+        self.bookLoader = BookLoader(self)
+        self.bookLoader.progress.connect(self.onLoadProgress)
+        self.bookLoader.pageReady.connect(self.onPageReady)
+        self.bookLoader.failed.connect(self.onLoadFailed)
+        self.progressTracker = ProgressTracker(self)
+        self.progressTracker.progressChanged.connect(self.onProgressChanged)
+        self._navIndex = None
+        self._restored = None
 
     def currentReadProgress(self) -> dict:
-        return {"pageIndex": self.epubParser.currentPageIndex, "scrollHeight": self.scrollHeight}
+        return {"pageIndex": self.epubParser.currentPageIndex,
+                "pagePath": self.epubParser.currentPagePath(),
+                "scrollHeight": self.progressTracker.scrollHeight,
+                "fraction": self.progressTracker.fraction,
+                "percentage": self.percentage()}
+
+    def scrollToProgress(self, readProgress: dict) -> None:
+        if self.continuousScroller:
+            self.continuousScroller.scrollTo(readProgress["pageIndex"], readProgress.get("fraction", 0))
+        elif self.paginator:
+            self.paginator.gotoFraction(readProgress.get("fraction", 0))
+        elif "fraction" in readProgress:
+            self.page().runJavaScript(
+                "window.scrollTo(0, (document.documentElement.scrollHeight - window.innerHeight)"
+                f" * {readProgress['fraction']});")
+        else:
+            self.page().runJavaScript(f"window.scrollTo(0,{readProgress['scrollHeight']});")
 
     def gotoReadProgress(self, readProgress: dict) -> None:
         self.runINL(lambda: self.loadPage(readProgress["pageIndex"]))
-        self.runALF(lambda: self.page().runJavaScript(
-            f"window.scrollTo(0,{readProgress['scrollHeight']});"))
+        self.runALF(lambda: self.scrollToProgress(readProgress))
+
+    def readySearchIndex(self) -> Optional[SearchIndex]:
+        if (self.searchIndex and self.searchIndex.done() and not self.searchIndex.cancelled() and
+                not self.searchIndex.exception()):
+            return self.searchIndex.result()
+        return None
+
+    def navIndex(self) -> NavIndex:
+        """
+        Returns the navigation index of the book, switching to exact text offsets once the search index is built.
+        Until then, or if the index is not of this book, the chapter sizes stand in for their lengths.
+        """
+        searchIndex = self.readySearchIndex()
+        if searchIndex and len(searchIndex.texts) != len(self.epubParser.pagesPath):
+            searchIndex = None
+        if self._navIndex is None or (searchIndex and not self._navIndex.exact):
+            self._navIndex = NavIndex.build(self.epubParser, searchIndex.texts if searchIndex else None)
+        return self._navIndex
+
+    def percentage(self) -> float:
+        return self.navIndex().percentage(self.epubParser.currentPageIndex, self.progressTracker.fraction)
+
+    def onProgressChanged(self) -> None:
+        if self.epubParser:
+            self.parent().updateTitle(self.percentage())
+
+    def gotoPercentage(self, percentage: float) -> None:
+        pageIndex, fraction = self.navIndex().locate(percentage)
+        self.gotoReadProgress({"pageIndex": pageIndex, "fraction": fraction})
+
+    def scrollToFragment(self, fragment: str) -> None:
+        if self.paginator:
+            self.paginator.gotoElement(fragment)
+            return
+        self.page().runJavaScript(
+            f"var anchor = document.getElementById({json.dumps(fragment)});"
+            "if (anchor) anchor.scrollIntoView();")
+
+    def gotoHref(self, url: str) -> None:
+        """
+        Shows the page a toc url points to, scrolled to its fragment.
+        """
+        pageIndex, fragment = self.navIndex().resolve(url)
+        if pageIndex is None:
+            return
+        scroll = (lambda: self.scrollToFragment(fragment)) if fragment else None
+        if pageIndex == self.epubParser.currentPageIndex:
+            (scroll or self.scrollToTop)()
+        else:
+            self.loadPage(pageIndex, scroll)
+
+    def saveReadProgress(self) -> None:
+        """
+        Checkpoints the reading progress of the current book, if it moved since the last checkpoint.
+        """
+        if not self.epubParser:
+            return
+        progress = self.currentReadProgress()
+        if progress != self._savedProgress:
+            data.setProgress(self.epubParser.epubPath, progress)
+            self._savedProgress = progress
+
+    def saveRestorePoint(self) -> None:
+        """
+        Keeps the rendering of the current page for the next start to show before the book is opened.
+        """
+        if (not self.epubParser or self.continuousScroller or self.paginator or
+                self.epubParser.extractDir is not None):
+            return
+        restoreCache.save(self.epubParser.epubPath, self.epubParser.bookId, self.epubParser.currentPageIndex,
+                               self.epubParser.currentPageUrl(), self.epubParser.currentPageHtml(),
+                               self.currentReadProgress())
+
+    def addBookmark(self, note: str = "") -> int:
+        return data.addBookmark(self.epubParser.epubPath, self.currentReadProgress(), note)
+
+    def highlightScript(self, index: int, root: str = "document.body", clear: bool = False) -> str:
+        """
+        Returns the script marking all highlights of chapter index under root in one pass.
+        It is empty if the chapter has none, unless the marks shown before have to be cleared.
+        """
+        highlights = annotations.chapter(self.epubParser.epubPath, index)
+        if not highlights and not clear:
+            return ""
+        return resource("highlights.js") + f"ereaderHighlights.apply({root}, {json.dumps(segments(highlights))});"
+
+    def applyHighlights(self, index: int) -> None:
+        if index == self.epubParser.currentPageIndex and (js := self.highlightScript(index)):
+            self.page().runJavaScript(js)
+
+    def refreshHighlights(self) -> None:
+        """
+        Marks the highlights of the displayed chapters again, after some were added or removed.
+        """
+        if self.continuousScroller:
+            js = "".join(self.highlightScript(index, self.continuousScroller.sectionSelector(index), True)
+                         for index in range(self.continuousScroller.first, self.continuousScroller.last + 1))
+        else:
+            js = self.highlightScript(self.epubParser.currentPageIndex, clear=True)
+        self.runINL(lambda: self.page().runJavaScript(js))
+
+    def addHighlight(self, note: str = "", color: str = "yellow",
+                     callback: Callable[[Optional[Highlight]], None] = None) -> None:
+        """
+        Highlights the selected text, callback gets the highlight or None if nothing is selected.
+        """
+        epubParser = self.epubParser
+
+        def selected(selection) -> None:
+            highlight = None
+            if selection and epubParser and epubParser is self.epubParser:
+                index = int(selection[0]) if selection[0] is not None else epubParser.currentPageIndex
+                highlight = annotations.add(epubParser.epubPath, index, int(selection[1]), int(selection[2]),
+                                            selection[3], note, color)
+                self.refreshHighlights()
+            if callback:
+                callback(highlight)
+
+        self.page().runJavaScript(resource("highlights.js") + "ereaderHighlights.selection();", selected)
+
+    def removeHighlight(self, highlightId: int) -> None:
+        annotations.remove(self.epubParser.epubPath, highlightId)
+        self.refreshHighlights()
+
+    def gotoHighlight(self, highlightId: int) -> None:
+        highlight = annotations.get(self.epubParser.epubPath, highlightId)
+        if highlight is None:
+            raise KeyError(f"no highlight {highlightId}")
+        scroll = lambda: self.scrollToFragment(f"ereader-highlight-{highlightId}")
+        if self.continuousScroller:
+            shown = self.continuousScroller.first <= highlight.pageIndex <= self.continuousScroller.last
+        else:
+            shown = highlight.pageIndex == self.epubParser.currentPageIndex
+        if shown and not self.loading:
+            scroll()
+        else:
+            self.loadPage(highlight.pageIndex, scroll)
 
     def ctrlHome(self) -> None:
         self.runINL(lambda: self.loadPage(0))
 
     def ctrlEnd(self) -> None:
+        if not self.epubParser:
+            return
         self.runINL(lambda: self.loadPage(len(self.epubParser.pagesPath) - 1))
 
     def bindShortcutKeys(self) -> None:
@@ -60,10 +225,16 @@ class ReadWidget(WebView):
             QtGui.QKeySequence(key), self).activated.connect(func)
 
         def shiftUp() -> None:
-            self.loadPrePage()
+            if self.paginator:
+                self.paginator.previous()
+            else:
+                self.loadPrePage()
 
         def shiftDown() -> None:
-            self.loadNextPage()
+            if self.paginator:
+                self.paginator.next()
+            else:
+                self.loadNextPage()
 
         shortcut("A", shiftUp)
         shortcut("D", shiftDown)
@@ -74,11 +245,13 @@ class ReadWidget(WebView):
         shortcut("end", self.scrollToButton)
 
         shortcut("O", self.openEpub)
+        shortcut("ctrl+tab", self.switchToPrevious)
+        shortcut("H", lambda: self.addHighlight())
 
-        def up(): return self.runINL(lambda: self.page().runJavaScript(
+        def up(): return shiftUp() if self.paginator else self.runINL(lambda: self.page().runJavaScript(
             "window.scrollBy(0, -window.innerHeight/20);"))
 
-        def down(): return self.runINL(lambda: self.page().runJavaScript(
+        def down(): return shiftDown() if self.paginator else self.runINL(lambda: self.page().runJavaScript(
             "window.scrollBy(0, window.innerHeight/20);"))
 
         shortcut("W", up)
@@ -86,53 +259,91 @@ class ReadWidget(WebView):
         shortcut("up", up)
         shortcut("down", down)
 
-        shortcut(Qt.Key_PageUp,
-                 lambda: self.runINL(lambda: self.page().runJavaScript("window.scrollBy(0, -window.innerHeight);")))
-        shortcut(Qt.Key_PageDown,
-                 lambda: self.runINL(lambda: self.page().runJavaScript("window.scrollBy(0, window.innerHeight);")))
+        shortcut(Qt.Key_PageUp, lambda: shiftUp() if self.paginator else self.runINL(
+            lambda: self.page().runJavaScript("window.scrollBy(0, -window.innerHeight);")))
+        shortcut(Qt.Key_PageDown, lambda: shiftDown() if self.paginator else self.runINL(
+            lambda: self.page().runJavaScript("window.scrollBy(0, window.innerHeight);")))
 
-        shortcut("Q", lambda: self.parent().closeEvent())
+        shortcut("Q", lambda: self.parent().close())
 
         shortcut("ctrl+home", self.ctrlHome)
 
         shortcut("ctrl+end", self.ctrlEnd)
 
-    def searchPage(self, pagePath: str, query: str) -> None:
-        with open(pagePath, "r", encoding='utf-8') as f:
-            html = f.read()
-        soup = BeautifulSoup(html, "html.parser")
-        text = soup.get_text()
-        index = 0
-        while True:
-            index = text.find(query, index)
-            if index == -1:
-                break
-            start = max(0, index - 40)
-            end = min(len(text), index + len(query) + 40)
-            context = text[start:end]
-            context = re.sub(r'\s+', '', context)
-            text_lines = context.split('\n')
-            for line in text_lines:
-                if query in line:
-                    line = line.replace(query, colored(
-                        query, 'green', attrs=['bold']))
-                print(line)
-            print('')
-            index += len(query)
-
-    def search(self, query: str, allPages: bool = False) -> None:
-        if allPages:
-            for pagePath in self.epubParser.pagesPath:
-                self.searchPage(pagePath, query)
+        shortcut("ctrl+=", lambda: self.zoom(self.zoomFactor() * 1.25))
+        shortcut("ctrl+-", lambda: self.zoom(self.zoomFactor() / 1.25))
+        shortcut("ctrl+0", lambda: self.zoom(1.0))
+
+    def zoom(self, factor: float) -> None:
+        """
+        Zooms the page, images are swapped for their originals once they are shown larger than the viewport size.
+        """
+        self.setZoomFactor(min(5.0, max(0.25, factor)))
+        self.updateImageTargetSize()
+        if self.paginator:
+            self.paginator.scheduleRelayout()
+        if self.zoomFactor() > 1:
+            self.page().runJavaScript(
+                "document.querySelectorAll('img').forEach(function (img) {"
+                "  if (img.src.startsWith('epub:') && !img.src.endsWith('?original')) img.src += '?original';"
+                "});")
+
+    def updateImageTargetSize(self) -> None:
+        ratio = self.devicePixelRatioF() * max(1.0, self.zoomFactor())
+        self.schemeHandler.setTargetSize(int(self.width() * ratio), int(self.height() * ratio))
+
+    def resizeEvent(self, e: QtGui.QResizeEvent) -> None:
+        super().resizeEvent(e)
+        self.updateImageTargetSize()
+        if self.paginator:
+            self.paginator.scheduleRelayout()
+
+    def printHit(self, hit: SearchHit) -> None:
+        from termcolor import colored
+
+        before = re.sub(r'\s+', '', hit.context[:hit.start])
+        after = re.sub(r'\s+', '', hit.context[hit.end:])
+        print(before + colored(hit.context[hit.start:hit.end], 'green', attrs=['bold']) + after)
+        print('')
+
+    def search(self, query: str, allPages: bool = False, limit: int = 100) -> None:
+        """
+        Prints the hits of query, searching all pages in the background.
+        The current page, the search index and the scan of the book used until it is built all match
+        query the same way, see parseQuery.
+        """
+        if not allPages:
+            with metrics.timer("search.page"):
+                text = htmlToText(self.epubParser.readText(self.epubParser.currentPagePath()), '\n')
+                hits = list(findAll(text, query, self.epubParser.currentPageIndex))
+            for hit in hits:
+                self.printHit(hit)
+            return
+
+        self.cancelSearch()
+        cancelEvent = self._searchCancelEvent = threading.Event()
+        start = time.perf_counter()
+        if searchIndex := self.readySearchIndex():
+            hits = searchIndex.hits(query)
         else:
-            self.searchPage(self.epubParser.currentPagePath(), query)
+            hits = searchBook(self.epubParser.epubPath, self.epubParser.pagesPath, query, limit, cancelEvent)
 
-    def setHtml(self, html: str, baseUrl: QtCore.QUrl) -> None:
+        def printHits() -> None:
+            for found, hit in enumerate(hits):
+                if cancelEvent.is_set() or (limit and found >= limit):
+                    break
+                self.printHit(hit)
+            metrics.record("search.book", start)
 
-        css = os.path.join(os.path.dirname(__file__), 'ereader.css')
-        with open(css, "r", encoding='utf-8') as f:
-            self.setStyleSheet(f.read())
-        super().setHtml(html, baseUrl)
+        threadPool().submit(printHits)
+
+    def cancelSearch(self) -> None:
+        if self._searchCancelEvent:
+            self._searchCancelEvent.set()
+
+    def setHtml(self, html: str, baseUrl: QtCore.QUrl) -> None:
+        self.setStyleSheet(resource("ereader.css"))
+        super().setHtml(addCssToHtml(self.typography.css(), html, Typography.STYLE_ID), baseUrl)
 
     def openEpub(self) -> None:
         """
@@ -145,18 +356,143 @@ class ReadWidget(WebView):
 
     def loadEpub(self, epubPath: str) -> None:
         """
-        Load EPUB file
+        Load EPUB file in the background, the current book stays readable until its first page is ready.
+        At startup the page the book was closed on is shown from the restore cache right away.
+        A book already open in the session is switched to instead.
+        """
+        if self.session.get(epubPath):
+            self.switchBook(epubPath)
+            return
+        if self.epubParser is None and not self.continuousScroller and not self.paginator:
+            self.showRestorePoint(epubPath)
+        self.bookLoader.load(epubPath, self.settings.get("extract", False))
+
+    def showRestorePoint(self, epubPath: str) -> None:
+        restored = restoreCache.load(epubPath)
+        if restored is None:
+            return
+        self._restored = restored
+        self.schemeHandler.expect(restored["bookId"])
+        self.runALF(lambda: self.scrollToProgress(restored["readProgress"]))
+        self.setHtml(restored["html"], QtCore.QUrl(restored["pageUrl"]))
+
+    def onLoadProgress(self, epubPath: str, stage: str) -> None:
+        self.parent().setWindowTitle(f"EReader - {stage} {Path(epubPath).name}")
+
+    def onLoadFailed(self, epubPath: str, error: str) -> None:
+        print(f"failed to open {epubPath}: {error}")
+        if self._restored:
+            self.schemeHandler.release(self._restored["bookId"])
+            self._restored = None
+        if self.epubParser:
+            self.onProgressChanged()
+
+    def onPageReady(self, epubParser: EpubParser, readProgress: dict) -> None:
+        restored, self._restored = self._restored, None
+        if restored and restored["bookId"] != epubParser.bookId:
+            self.schemeHandler.release(restored["bookId"])
+        # the restored page is the one to show, keep it and where it was scrolled to since
+        keep = bool(restored and restored["bookId"] == epubParser.bookId and
+                    restored["pageIndex"] == epubParser.currentPageIndex)
+        self.deactivateBook()
+        self.session.add(epubParser)
+        self.setBook(epubParser, readProgress)
+        # the restored page was rendered without the highlights
+        if keep and self.loading:
+            self.runALF(lambda: self.applyHighlights(epubParser.currentPageIndex))
+            self.runALF(lambda: self.onBookShown(epubParser))
+        elif keep:
+            self.applyHighlights(epubParser.currentPageIndex)
+            self.onBookShown(epubParser)
+        else:
+            self.showBook(readProgress)
+        data["currentEpubPath"] = str(Path(epubParser.epubPath).resolve())
+
+    def setBook(self, epubParser: EpubParser, readProgress: dict, searchIndex: Optional[Future] = None,
+                navIndex: Optional[NavIndex] = None) -> None:
+        # cleared first, nothing built for the previous book may be used for this one
+        self._navIndex = self.searchIndex = None
+        self.epubParser = epubParser
+        self._navIndex = navIndex
+        self.searchIndex = searchIndex
+        self.prefetcher = Prefetcher(self.epubParser)
+        self.schemeHandler.register(self.epubParser)
+        self._savedProgress = readProgress
+
+    def showBook(self, readProgress: dict) -> None:
+        epubParser = self.epubParser
+        self.progressTracker.reset(readProgress.get("scrollHeight", 0), readProgress.get("fraction", 0))
+        if readProgress:
+            self.runALF(lambda: self.scrollToProgress(readProgress))
+        self.showPage(epubParser.currentPageIndex)
+        self.runALF(lambda: self.onBookShown(epubParser))
+
+    def deactivateBook(self) -> None:
+        """
+        Sends the current book to the background of the session, keeping its parser and indexes.
+        """
+        if not self.epubParser:
+            return
+        self.saveReadProgress()
+        self.prefetcher.cancel()
+        self.schemeHandler.unregister(self.epubParser)
+        self.session.deactivate(self._savedProgress, self.searchIndex, self._navIndex)
+        self.epubParser = None
+
+    def switchBook(self, epubPath: str) -> None:
         """
-        self.epubParser = EpubParser(epubPath)
-        self.setHtml(self.epubParser.currentPageHtml(), QtCore.QUrl.fromLocalFile(
-            str(self.epubParser.currentPagePath())))
+        Shows an open book of the session where it was left, without opening or parsing it again.
+        """
+        book = self.session.get(epubPath)
+        if book is None:
+            raise KeyError(f"{epubPath} is not open")
+        if self.epubParser and book is self.session.active:
+            return
+        start = time.perf_counter()
+        self.bookLoader.cancel()
+        self.deactivateBook()
+        try:
+            epubParser = self.session.activate(book)
+        except Exception:
+            # the book changed or went away since it was demoted, open it again
+            self.session.close(book)
+            self.bookLoader.load(epubPath, self.settings.get("extract", False))
+            return
+        self.setBook(epubParser, book.readProgress, book.searchIndex, book.navIndex)
+        self.showBook(book.readProgress)
         data["currentEpubPath"] = str(Path(epubPath).resolve())
-        data.save()
+        metrics.record("session.switch", start)
+
+    def switchToPrevious(self) -> None:
+        books = self.session.books()
+        if len(books) > 1:
+            self.switchBook(books[-2].epubPath)
 
+    def closeBook(self, book: OpenBook) -> None:
+        self.session.close(book)
+
+    def onBookShown(self, epubParser: EpubParser) -> None:
+        """
+        Fills in what the first page does not need, once it is displayed.
+        """
+        if epubParser is not self.epubParser:
+            return
+        self.prefetcher.schedule(self.epubParser.currentPageIndex)
+        if self.searchIndex is None:
+            self.searchIndex = threadPool().submit(SearchIndex.forBook, self.epubParser)
         self.parent().tocView.load(self.epubParser.toc)
+        self.onProgressChanged()
 
     def wheelEvent(self, e: QtGui.QWheelEvent) -> None:
-        if not self.loading:
+        # the restored page is shown before the book is opened, it only scrolls
+        if self.continuousScroller or not self.epubParser:
+            return super().wheelEvent(e)
+        if self.paginator and not self.loading:
+            if e.angleDelta().y() > 0:
+                self.paginator.previous()
+            else:
+                self.paginator.next()
+        elif not self.loading:
             bias = e.angleDelta().y()
             if bias > 0:
                 self.loadPrePage(scroll=self.scrollToButton)
@@ -164,27 +500,93 @@ class ReadWidget(WebView):
                 self.loadNextPage()
 
     def loadNextPage(self, scroll: Callable = None) -> None:
+        if not self.epubParser:
+            return
         self.loadPage(self.epubParser.currentPageIndex + 1, scroll)
 
     def loadPrePage(self, scroll: Callable = None) -> None:
+        if not self.epubParser:
+            return
         self.loadPage(self.epubParser.currentPageIndex - 1, scroll)
 
+    def showPage(self, index: int) -> None:
+        """
+        Displays page index as a document of its own, as the window of the continuous mode or laid out in pages.
+        """
+        if self.continuousScroller:
+            self.continuousScroller.open(index)
+        elif self.paginator:
+            self.paginator.open(index)
+        else:
+            self.setHtml(self.prefetcher.pageHtml(index),
+                         QtCore.QUrl(self.epubParser.currentPageUrl()))
+            self.runALF(lambda: self.applyHighlights(index))
+
+    def setContinuous(self, enable: bool) -> None:
+        if enable == bool(self.continuousScroller):
+            return
+        readProgress = self.currentReadProgress() if self.epubParser else None
+        if enable:
+            if self.paginator:
+                self.paginator.deleteLater()
+                self.paginator = None
+            self.continuousScroller = ContinuousScroller(self)
+        else:
+            self.continuousScroller.deleteLater()
+            self.continuousScroller = None
+        if readProgress:
+            self.showPage(readProgress["pageIndex"])
+            self.runALF(lambda: self.scrollToProgress(readProgress))
+
+    def setPaginated(self, enable: bool) -> None:
+        if enable == bool(self.paginator):
+            return
+        readProgress = self.currentReadProgress() if self.epubParser else None
+        if enable:
+            if self.continuousScroller:
+                self.continuousScroller.deleteLater()
+                self.continuousScroller = None
+            self.paginator = Paginator(self)
+        else:
+            self.paginator.deleteLater()
+            self.paginator = None
+        if readProgress:
+            self.showPage(readProgress["pageIndex"])
+            self.runALF(lambda: self.scrollToProgress(readProgress))
+
     def loadPage(self, index: int, scroll: Callable = None) -> None:
+        if not self.epubParser:
+            return
         if not scroll:
             scroll = self.scrollToTop
 
         if 0 <= index <= len(self.epubParser.pagesPath) - 1:
+            step = index - self.epubParser.currentPageIndex
+            if abs(step) > 1:
+                # a jump (toc, home/end, shell), nothing prepared around the old page is useful
+                self.prefetcher.cancel()
+                step = 0
             self.epubParser.currentPageIndex = index
-            self.setHtml(self.epubParser.currentPageHtml(), QtCore.QUrl.fromLocalFile(
-                (str(self.epubParser.currentPagePath()))))
-            self.runALF(scroll)
+            if self.continuousScroller:
+                self.continuousScroller.gotoChapter(index, scroll)
+            else:
+                self.showPage(index)
+                self.runALF(scroll)
+            self.progressTracker.reset()
+            self.prefetcher.schedule(index, step)
 
     def scrollToTop(self, func: Callable = None) -> None:
+        if self.paginator:
+            self.paginator.gotoPage(0)
+            return
         if not func:
             func = self.runINL
         func(lambda: self.page().runJavaScript("window.scrollTo(0, 0);"))
 
     def scrollToButton(self, func: Callable = None) -> None:
+        if self.paginator:
+            self.paginator.gotoLast()
+            return
         if not func:
             func = self.runINL
         func(lambda: self.page().runJavaScript(
@@ -0,0 +1,11 @@
+import os
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def resource(name: str) -> str:
+    """
+    Returns the content of a stylesheet or script shipped next to the gui modules, read once.
+    """
+    with open(os.path.join(os.path.dirname(__file__), name), "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,107 @@
+from typing import Optional
+
+from PyQt5 import sip
+from PyQt5.QtCore import QBuffer, QIODevice, QUrl, pyqtSignal
+from PyQt5.QtWebEngineCore import (QWebEngineUrlRequestJob, QWebEngineUrlScheme,
+                                   QWebEngineUrlSchemeHandler)
+
+from ..utils import EpubParser, threadPool
+
+SCHEME = b"epub"
+
+
+def registerEpubScheme() -> None:
+    """
+    Registers the epub:// url scheme, must be called before the QApplication is created.
+    """
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme |
+                    QWebEngineUrlScheme.LocalAccessAllowed |
+                    QWebEngineUrlScheme.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class EpubSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves epub://<bookId>/<path> urls straight from the archive of the registered book.
+    Images larger than the target size are scaled down on the worker pool, unless the url asks for the
+    original with an "original" query.
+    """
+
+    imageReady = pyqtSignal(object, bytes, object)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.parsers = {}
+        self.pending = {}
+        self.targetSize = None
+        self.imageReady.connect(self._reply)
+
+    def expect(self, bookId: str) -> None:
+        """
+        Holds the requests for a book that is still being opened, until its parser is registered.
+        """
+        self.pending.setdefault(bookId, [])
+
+    def register(self, epubParser: EpubParser) -> None:
+        self.parsers[epubParser.bookId] = epubParser
+        for job in self.pending.pop(epubParser.bookId, []):
+            if not sip.isdeleted(job):
+                self.requestStarted(job)
+
+    def unregister(self, epubParser: EpubParser) -> None:
+        self.parsers.pop(epubParser.bookId, None)
+
+    def release(self, bookId: str) -> None:
+        """
+        Fails the requests held for a book that could not be opened.
+        """
+        for job in self.pending.pop(bookId, []):
+            if not sip.isdeleted(job):
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+
+    def setTargetSize(self, width: int, height: int, step: int = 256) -> None:
+        """
+        Sets the device pixel size images are scaled down to, rounded up to step so that small resizes
+        of the window reuse the cached images.
+        """
+        self.targetSize = (-(-width // step) * step, -(-height // step) * step)
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob) -> None:
+        url = job.requestUrl()
+        epubParser = self.parsers.get(url.host())
+        if epubParser is None and url.host() in self.pending:
+            self.pending[url.host()].append(job)
+            return
+        name = url.path(QUrl.FullyDecoded).lstrip("/")
+        if epubParser is None or not epubParser.hasFile(name):
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        mediaType = epubParser.mediaType(name)
+        if self.targetSize and mediaType.startswith("image/") and url.query() != "original":
+            threadPool().submit(self._scale, job, epubParser, name, mediaType, self.targetSize)
+            return
+        self._reply(job, mediaType.encode(), epubParser.readFile(name))
+
+    def _scale(self, job: QWebEngineUrlRequestJob, epubParser: EpubParser, name: str, mediaType: str,
+               targetSize: tuple) -> None:
+        try:
+            data = epubParser.scaledImage(name, *targetSize)
+            if data is None:
+                data = epubParser.readFile(name)
+        except (OSError, KeyError, ValueError):
+            data = None
+        self.imageReady.emit(job, mediaType.encode(), data)
+
+    def _reply(self, job: QWebEngineUrlRequestJob, mediaType: bytes, data: Optional[bytes]) -> None:
+        # the job is deleted if the page stopped loading the request meanwhile
+        if sip.isdeleted(job):
+            return
+        if data is None:
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+            return
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mediaType, buffer)
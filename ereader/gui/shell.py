@@ -0,0 +1,446 @@
+import ast
+import inspect
+import io
+import os
+import shlex
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Collection, Dict, Iterator, List, Optional, Tuple
+
+from PyQt5.QtWidgets import QApplication
+
+from ..utils import OpenBook, annotations, data, library, metrics, threadPool
+
+
+class Shell:
+    """
+    The commands of the ereader shell.
+    Commands print for people and return their result for the json replies of the command server.
+    """
+
+    def __init__(self, ereader) -> None:
+        self.ereader = ereader
+
+    @property
+    def readView(self):
+        return self.ereader.readView
+
+    def next(self, pageNum: int = 1) -> None:
+        self.readView.loadPage(self.readView.epubParser.currentPageIndex + pageNum)
+
+    def pre(self, pageNum: int = 1) -> None:
+        self.readView.loadPage(self.readView.epubParser.currentPageIndex - pageNum)
+
+    def home(self) -> None:
+        self.readView.ctrlHome()
+
+    def end(self) -> None:
+        self.readView.ctrlEnd()
+
+    def path(self) -> str:
+        print(self.readView.epubParser.epubPath)
+        return self.readView.epubParser.epubPath
+
+    def toc(self) -> List[dict]:
+        self.readView.epubParser.printToc()
+        return [item.toDict() for item in self.readView.epubParser.toc]
+
+    def meta(self) -> dict:
+        print(self.readView.epubParser.meta)
+        return self.readView.epubParser.meta
+
+    def search(self, query: str, allPages: bool = False, limit: int = 100) -> None:
+        """
+        Finds whole words, ignoring case; every word must be on the page, "quoted words" as a phrase.
+        """
+        self.readView.search(query, allPages, limit)
+
+    def stop(self) -> None:
+        self.readView.cancelSearch()
+
+    def index(self) -> int:
+        print(self.readView.epubParser.currentPageIndex)
+        return self.readView.epubParser.currentPageIndex
+
+    def goto(self, percentage) -> None:
+        self.readView.gotoPercentage(float(str(percentage).rstrip("%")))
+
+    def percent(self) -> float:
+        percentage = self.readView.percentage()
+        print(f"{percentage:.1f}%")
+        return percentage
+
+    def bookmark(self, note: str = "") -> int:
+        bookmarkId = self.readView.addBookmark(note)
+        print(bookmarkId)
+        return bookmarkId
+
+    def bookmarks(self) -> List[dict]:
+        bookmarks = data.bookmarks(self.readView.epubParser.epubPath)
+        for bookmark in bookmarks:
+            print(bookmark["id"], bookmark["progress"]["pageIndex"], bookmark["note"])
+        return bookmarks
+
+    def gotoBookmark(self, bookmarkId: int) -> None:
+        epubParser = self.readView.epubParser
+        for bookmark in data.bookmarks(epubParser.epubPath):
+            if bookmark["id"] == bookmarkId:
+                pageIndex = epubParser.progressPageIndex(bookmark["progress"])
+                if pageIndex is None:
+                    raise KeyError(f"bookmark {bookmarkId} is not on a page of this book")
+                self.readView.gotoReadProgress(dict(bookmark["progress"], pageIndex=pageIndex))
+
+    def removeBookmark(self, bookmarkId: int) -> None:
+        data.removeBookmark(bookmarkId)
+
+    def highlight(self, note: str = "", color: str = "yellow") -> None:
+        """
+        Highlights the selected text, with an optional note.
+        """
+        def added(highlight) -> None:
+            print(highlight.id if highlight else "nothing is selected")
+
+        self.readView.addHighlight(note, color, added)
+
+    def highlights(self, query: str = None, allBooks: bool = False) -> List[dict]:
+        """
+        Prints the highlights of the book, or the ones whose text or note contains query, of this book or all books.
+        """
+        epubPath = self.readView.epubParser.epubPath if self.readView.epubParser else None
+        if query is None and not allBooks:
+            found = [(epubPath, highlight) for highlight in annotations.all(epubPath)]
+        else:
+            found = annotations.search(query or "", None if allBooks else epubPath)
+        for book, highlight in found:
+            prefix = f"{os.path.basename(book)} " if allBooks else ""
+            print(f"{highlight.id:>6} {prefix}{highlight.pageIndex} {' '.join(highlight.text.split())[:80]}"
+                  + (f" ({highlight.note})" if highlight.note else ""))
+        return [dict(highlight.toDict(), book=book) for book, highlight in found]
+
+    def gotoHighlight(self, highlightId: int) -> None:
+        self.readView.gotoHighlight(highlightId)
+
+    def removeHighlight(self, highlightId: int) -> None:
+        self.readView.removeHighlight(highlightId)
+
+    def annotate(self, highlightId: int, note: str) -> None:
+        annotations.annotate(self.readView.epubParser.epubPath, highlightId, note)
+
+    def exportHighlights(self, outputPath: str = None, format: str = "md") -> str:
+        """
+        Prints the highlights of the book as markdown or json, or writes them to outputPath.
+        """
+        from ..export import bookTitle
+
+        epubParser = self.readView.epubParser
+        text = annotations.export(epubParser.epubPath, format, bookTitle(epubParser))
+        if outputPath:
+            with open(outputPath, "w", encoding="utf-8") as f:
+                f.write(text)
+            print(f"wrote {outputPath}")
+        else:
+            print(text)
+        return text
+
+    def continuous(self, enable: bool = True) -> None:
+        self.readView.setContinuous(enable)
+        data.setSetting("continuous", enable)
+        if enable:
+            data.setSetting("paginated", False)
+
+    def paginated(self, enable: bool = True) -> None:
+        self.readView.setPaginated(enable)
+        data.setSetting("paginated", enable)
+        if enable:
+            data.setSetting("continuous", False)
+
+    def page(self, number: int = None) -> dict:
+        """
+        Prints the page number in the paginated mode, or jumps to page number of the book.
+        """
+        paginator = self.readView.paginator
+        if not paginator:
+            raise RuntimeError("not in the paginated mode, run paginated first")
+        if number is not None:
+            paginator.gotoBookPage(number)
+            return {"page": number}
+        page, pages, exact = paginator.bookPage()
+        print(f"page {page} of {pages if exact else f'~{pages}'}, page {paginator.page + 1} of "
+              f"{paginator.pageCount()} in this chapter")
+        return {"page": page, "pages": pages, "exact": exact, "chapterPage": paginator.page + 1,
+                "chapterPages": paginator.pageCount()}
+
+    def setFontFamily(self, family: str) -> None:
+        self.readView.typography.set(fontFamily=family)
+        data.setSetting("fontFamily", family)
+
+    def setFontSize(self, size: int) -> None:
+        self.readView.typography.set(fontSize=size)
+        data.setSetting("fontSize", size)
+
+    def setLineHeight(self, lineHeight: float = 0) -> None:
+        """
+        Sets the line height as a multiple of the font size, 0 leaves it to the book.
+        """
+        self.readView.typography.set(lineHeight=lineHeight)
+        data.setSetting("lineHeight", lineHeight or None)
+
+    def setMargin(self, margin: int = 0) -> None:
+        """
+        Sets the left and right margins in pixels, 0 leaves them to the book.
+        """
+        self.readView.typography.set(margin=margin)
+        data.setSetting("margin", margin or None)
+
+    def typography(self) -> dict:
+        values = self.readView.typography.values
+        print(", ".join(f"{key}: {value}" for key, value in values.items()))
+        return dict(values)
+
+    def open(self, book) -> None:
+        """
+        Opens a book by its library id, its path, or the first library match of a title or author.
+        """
+        if isinstance(book, int):
+            entry = library.get(book)
+        elif os.path.exists(book):
+            entry = {"path": book}
+        else:
+            entry = next(iter(library.find(book, 1)), None)
+        if entry is None:
+            raise KeyError(f"no book matches {book}")
+        self.readView.loadEpub(entry["path"])
+
+    def _openBook(self, book) -> OpenBook:
+        books = self.readView.session.books()
+        if isinstance(book, int):
+            if not 0 <= book < len(books):
+                raise KeyError(f"no open book {book}")
+            return books[book]
+        for openBook in books:
+            if (os.path.exists(book) and os.path.samefile(openBook.epubPath, book)) or \
+                    book.lower() in openBook.title.lower():
+                return openBook
+        raise KeyError(f"no open book matches {book}")
+
+    def books(self) -> List[dict]:
+        """
+        Prints the open books, the least recently used first, with the memory they hold.
+        """
+        session = self.readView.session
+        books = []
+        for number, book in enumerate(session.books()):
+            state = "active" if book is session.active else "demoted" if book.demoted else "live"
+            megabytes = book.memoryBytes() / 1024 / 1024
+            print(f"{number:>3} {state:<8}{megabytes:>8.1f}MB  {book.title}")
+            books.append({"number": number, "path": book.epubPath, "title": book.title, "state": state,
+                          "bytes": book.memoryBytes()})
+        print(f"{session.memoryBytes() / 1024 / 1024:.1f}MB of {session.maxBytes / 1024 / 1024:.0f}MB")
+        return books
+
+    def switch(self, book) -> None:
+        """
+        Switches to an open book by its number in books, its path or a part of its title.
+        """
+        self.readView.switchBook(self._openBook(book).epubPath)
+
+    def closeBook(self, book) -> None:
+        self.readView.closeBook(self._openBook(book))
+
+    def scan(self, directory: str, workers: int = None) -> None:
+        """
+        Adds the books under directory to the library, in the background.
+        """
+        def scan() -> None:
+            read, removed = library.scan(directory, workers)
+            print(f"library: {read} books read, {removed} removed")
+
+        threadPool().submit(scan)
+
+    def _printBooks(self, books: List[dict]) -> List[dict]:
+        for book in books:
+            percentage = f"{book['percentage']:.0f}%" if book["percentage"] is not None else ""
+            print(f"{book['id']:>6} {book['title']} - {book['author']} {percentage}")
+        return books
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        return self._printBooks(library.list(limit, offset))
+
+    def find(self, query: str, limit: int = 50) -> List[dict]:
+        return self._printBooks(library.find(query, limit))
+
+    def stats(self, reset: bool = False) -> Dict[str, dict]:
+        """
+        Prints the count and the p50/p95/p99/max milliseconds of the timed stages, over their recent calls.
+        """
+        summary = metrics.summary()
+        print(f"{'stage':<24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+        for name, stage in summary.items():
+            print(f"{name:<24}{stage['count']:>8}" +
+                  "".join(f"{stage.get(key, 0):>10.2f}" for key in ("p50", "p95", "p99", "max")))
+        if reset:
+            metrics.reset()
+        return summary
+
+    def trace(self, tracePath: str) -> int:
+        """
+        Writes the recent timed spans to tracePath as a Chrome trace.
+        """
+        count = metrics.dumpTrace(tracePath)
+        print(f"wrote {count} spans to {tracePath}")
+        return count
+
+    def source(self, scriptPath: str) -> List[dict]:
+        """
+        Runs the commands of a script file, one per line.
+        """
+        with open(scriptPath, "r", encoding="utf-8") as f:
+            return [self.ereader.dispatcher.dispatch(line) for line in f
+                    if line.strip() and not line.lstrip().startswith("#")]
+
+    def help(self) -> Dict[str, str]:
+        commands = {}
+        for name, command in self.ereader.dispatcher.commands.items():
+            usage = f"{name}{inspect.signature(command)}"
+            if doc := inspect.getdoc(command):
+                usage += f"  # {doc.splitlines()[0]}"
+            commands[name] = usage
+        for usage in commands.values():
+            print(usage)
+        return commands
+
+    def exit(self) -> None:
+        QApplication.quit()
+
+
+def parseValue(value: str) -> Any:
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def parseCommand(line: str, parameters: Optional[Dict[str, Collection[str]]] = None) -> Tuple[str, list, dict]:
+    """
+    Splits a command line into the command name, its positional and its --keyword arguments.
+    A bare --flag is True and --noflag is False, if parameters, the parameter names of the commands,
+    say the command takes flag and not noflag.
+    """
+    tokens = shlex.split(line)
+    if not tokens:
+        raise ValueError("empty command")
+    known = (parameters or {}).get(tokens[0], ())
+    args, kwargs = [], {}
+    for token in tokens[1:]:
+        if token.startswith("--"):
+            key, separator, value = token[2:].partition("=")
+            if separator:
+                kwargs[key] = parseValue(value)
+            elif key.startswith("no") and key[2:] in known and key not in known:
+                kwargs[key[2:]] = False
+            else:
+                kwargs[key] = True
+        else:
+            args.append(parseValue(token))
+    return tokens[0], args, kwargs
+
+
+class _ThreadStdout(io.TextIOBase):
+    """
+    Stands in for sys.stdout and sends what a thread prints while it captures to that thread's buffer.
+    Other threads, like a background search printing its hits, keep writing to the real stdout.
+    """
+
+    def __init__(self, stdout) -> None:
+        super().__init__()
+        self.stdout = stdout
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, "buffer", None)
+        return (self.stdout if buffer is None else buffer).write(text)
+
+    def flush(self) -> None:
+        self.stdout.flush()
+
+    @contextmanager
+    def capture(self, buffer: io.StringIO) -> Iterator[None]:
+        previous = getattr(self._local, "buffer", None)
+        self._local.buffer = buffer
+        try:
+            yield
+        finally:
+            self._local.buffer = previous
+
+
+def captureOutput(buffer: io.StringIO):
+    """
+    Returns a context capturing what the calling thread prints into buffer.
+    """
+    if not isinstance(sys.stdout, _ThreadStdout):
+        sys.stdout = _ThreadStdout(sys.stdout)
+    return sys.stdout.capture(buffer)
+
+
+class CommandDispatcher:
+    """
+    Dispatches command lines to the methods of a Shell, built once.
+    """
+
+    def __init__(self, shell: Shell) -> None:
+        self.commands = {name: getattr(shell, name) for name, _ in inspect.getmembers(type(shell), inspect.isfunction)
+                         if not name.startswith("_")}
+        self.parameters = {name: set(inspect.signature(command).parameters)
+                           for name, command in self.commands.items()}
+
+    def dispatch(self, line: str, capture: bool = True) -> dict:
+        """
+        Runs one command and returns a reply with its result, and with what it printed if capture is set.
+        """
+        output = io.StringIO()
+        command = line.strip() if isinstance(line, str) else line
+        try:
+            if not isinstance(line, str):
+                raise TypeError(f"a command must be a string, not {type(line).__name__}")
+            name, args, kwargs = parseCommand(line, self.parameters)
+            if name not in self.commands:
+                raise KeyError(f"unknown command: {name}")
+            if capture:
+                with captureOutput(output):
+                    result = self.commands[name](*args, **kwargs)
+            else:
+                result = self.commands[name](*args, **kwargs)
+            reply = {"ok": True, "command": command, "result": result}
+        except Exception as e:
+            reply = {"ok": False, "command": command, "error": f"{type(e).__name__}: {e}"}
+            if not capture:
+                print(reply["error"])
+        if capture:
+            reply["output"] = output.getvalue()
+        return reply
+
+    def dispatchBatch(self, lines: str, capture: bool = True) -> List[dict]:
+        """
+        Runs commands separated by newlines or semicolons, in order.
+        """
+        return [self.dispatch(line, capture) for line in splitCommands(lines)]
+
+
+def splitCommands(lines: str) -> List[str]:
+    """
+    Splits text at newlines and at semicolons outside of quotes.
+    """
+    commands, current, quote = [], [], None
+    for char in lines:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char in ";\n":
+            commands.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    commands.append("".join(current))
+    return [command for command in commands if command.strip()]
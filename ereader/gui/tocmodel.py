@@ -0,0 +1,139 @@
+from typing import List, Optional, Tuple
+
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+
+from ..utils import NavPoint
+
+
+class TocNode:
+    """
+    A materialised row of the toc model. Its own rows are created in batches, only once the view asks for them.
+    """
+
+    __slots__ = ('navPoint', 'parent', 'row', 'points', 'children')
+
+    def __init__(self, navPoint: Optional[NavPoint], parent: Optional['TocNode'], row: int,
+                 points: List[NavPoint]) -> None:
+        self.navPoint = navPoint
+        self.parent = parent
+        self.row = row
+        self.points = points
+        self.children: List['TocNode'] = []
+
+
+class TocModel(QAbstractItemModel):
+    """
+    A tree model over the parsed nav points of a book.
+    Rows are materialised when their parent is expanded, batchSize at a time, and a filter replaces the tree
+    with the flat list of matching nav points, narrowed from the previous matches while the query grows.
+    """
+
+    def __init__(self, parent=None, batchSize: int = 256) -> None:
+        super().__init__(parent)
+        self.batchSize = batchSize
+        self.toc: List[NavPoint] = []
+        self.root = TocNode(None, None, 0, [])
+        self._entries: Optional[List[Tuple[str, NavPoint]]] = None
+        self._query = ''
+        self._matches: List[Tuple[str, NavPoint]] = []
+
+    def load(self, toc: List[NavPoint]) -> None:
+        self.beginResetModel()
+        self.toc = toc
+        self._entries = None
+        self._query = ''
+        self._matches = []
+        self.root = TocNode(None, None, 0, toc)
+        self.endResetModel()
+
+    def entries(self) -> List[Tuple[str, NavPoint]]:
+        """
+        Returns every nav point with its lowercased text in reading order, flattened once per book.
+        """
+        if self._entries is None:
+            self._entries = []
+            stack = list(reversed(self.toc))
+            while stack:
+                navPoint = stack.pop()
+                self._entries.append((navPoint.text.lower(), navPoint))
+                stack.extend(reversed(navPoint.children))
+        return self._entries
+
+    def setFilter(self, query: str) -> None:
+        query = query.strip().lower()
+        if query == self._query:
+            return
+        if not query:
+            points = self.toc
+            self._matches = []
+        else:
+            candidates = self._matches if self._query and query.startswith(self._query) else self.entries()
+            self._matches = [entry for entry in candidates if query in entry[0]]
+            points = [navPoint for _, navPoint in self._matches]
+        self._query = query
+        self.beginResetModel()
+        self.root = TocNode(None, None, 0, points)
+        self.endResetModel()
+
+    def filtering(self) -> bool:
+        return bool(self._query)
+
+    def node(self, index: QModelIndex) -> TocNode:
+        return index.internalPointer() if index.isValid() else self.root
+
+    def navPoint(self, index: QModelIndex) -> Optional[NavPoint]:
+        return self.node(index).navPoint
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self.node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self.node(parent).children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return bool(self.node(parent).points)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self.node(parent)
+        return len(node.children) < len(node.points)
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        node = self.node(parent)
+        start = len(node.children)
+        points = node.points[start:start + self.batchSize]
+        if not points:
+            return
+        flat = self.filtering() and node is self.root
+        self.beginInsertRows(parent, start, start + len(points) - 1)
+        node.children.extend(TocNode(navPoint, node, start + offset, [] if flat else navPoint.children)
+                             for offset, navPoint in enumerate(points))
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        navPoint = index.internalPointer().navPoint
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return navPoint.text
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
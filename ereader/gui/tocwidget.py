@@ -1,39 +1,69 @@
-from pathlib import Path
+from typing import List
 
-from PyQt5.QtWidgets import QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import QModelIndex, QTimer
+from PyQt5.QtWidgets import QLineEdit, QTreeView, QVBoxLayout, QWidget
 
+from ..utils import NavPoint
+from .tocmodel import TocModel
 
-class TocWidget(QTreeWidget):
+
+class TocTree(QTreeView):
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
-        self.setFixedWidth(200)
         self.setHeaderHidden(True)
+        self.setMouseTracking(True)
+        self.setIndentation(6)
+        self.setUniformRowHeights(True)
+
+    def mouseMoveEvent(self, event) -> None:
+        self.parent().mouseMoveEvent(event)
+
+
+class TocWidget(QWidget):
+    """
+    The toc sidebar: a filter box over a lazily populated tree of the book's nav points.
+    """
+
+    def __init__(self, parent=None, filterDelay: int = 120) -> None:
+        super().__init__(parent)
+        self.setFixedWidth(200)
         self.hide()
         self.setMouseTracking(True)
 
-        self.setIndentation(6)
-        self.itemClicked.connect(self.onItemClicked)
-
-    def load(self, toc: list) -> None:
-        self.clear()
-
-        def add_item(item, parent=None):
-            widgetItem = QTreeWidgetItem(parent)
-            widgetItem.setText(0, item["text"])
-            widgetItem.url = Path(item["url"].split("#")[0])
-            if parent is None:
-                self.addTopLevelItem(widgetItem)
-            else:
-                parent.addChild(widgetItem)
-            for subitem in item.get("subitems", []):
-                add_item(subitem, widgetItem)
-
-        for item in toc:
-            add_item(item)
-
-    def onItemClicked(self, item: QTreeWidgetItem, column) -> None:
-        pagesPath = self.parent().readView.epubParser.pagesPath
-        self.parent().readView.loadPage(pagesPath.index(item.url))
+        self.filterEdit = QLineEdit(self)
+        self.filterEdit.setPlaceholderText("Filter")
+        self.filterEdit.setClearButtonEnabled(True)
+        self.model = TocModel(self)
+        self.treeView = TocTree(self)
+        self.treeView.setModel(self.model)
+        self.treeView.clicked.connect(self.onItemClicked)
+
+        self.filterTimer = QTimer(self)
+        self.filterTimer.setSingleShot(True)
+        self.filterTimer.setInterval(filterDelay)
+        self.filterTimer.timeout.connect(self.applyFilter)
+        self.filterEdit.textChanged.connect(self.filterTimer.start)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+        layout.addWidget(self.filterEdit)
+        layout.addWidget(self.treeView)
+
+    def load(self, toc: List[NavPoint]) -> None:
+        self.filterEdit.blockSignals(True)
+        self.filterEdit.clear()
+        self.filterEdit.blockSignals(False)
+        self.filterTimer.stop()
+        self.model.load(toc)
+
+    def applyFilter(self) -> None:
+        self.model.setFilter(self.filterEdit.text())
+
+    def onItemClicked(self, index: QModelIndex) -> None:
+        navPoint = self.model.navPoint(index)
+        if navPoint is not None and navPoint.url:
+            self.parent().readView.gotoHref(navPoint.url)
 
     def mouseMoveEvent(self, event) -> None:
         self.parent().mouseMoveEvent(event)
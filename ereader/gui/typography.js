@@ -0,0 +1,57 @@
+window.ereaderTypography = window.ereaderTypography || (function () {
+    function rootOf(node) {
+        var element = node.nodeType === Node.ELEMENT_NODE ? node : node.parentElement;
+        return (element && element.closest('section.ereader-chapter')) || document.body;
+    }
+
+    // the text offset at the top of the viewport, in the text of its chapter, and where it is on screen
+    function topAnchor() {
+        var x = window.innerWidth / 2;
+        for (var y = 2; y < window.innerHeight / 2; y += 8) {
+            var range = document.caretRangeFromPoint(x, y);
+            if (range && range.startContainer.nodeType === Node.TEXT_NODE) {
+                var root = rootOf(range.startContainer), before = document.createRange();
+                before.selectNodeContents(root);
+                before.setEnd(range.startContainer, range.startOffset);
+                return {root: root, offset: before.toString().length, top: range.getBoundingClientRect().top};
+            }
+        }
+        return null;
+    }
+
+    function rectAt(root, offset) {
+        var walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT), node;
+        while ((node = walker.nextNode())) {
+            if (offset <= node.length) {
+                var range = document.createRange();
+                range.setStart(node, offset);
+                range.collapse(true);
+                var rects = range.getClientRects();
+                return rects.length ? rects[0] : node.parentElement.getBoundingClientRect();
+            }
+            offset -= node.length;
+        }
+        return null;
+    }
+
+    return {
+        // restyles the document in place, scrolling the text that was at the top of the viewport back there
+        apply: function (css, keepAnchor) {
+            var anchor = keepAnchor ? topAnchor() : null;
+            var style = document.getElementById('ereader-typography');
+            if (!style) {
+                style = document.createElement('style');
+                style.id = 'ereader-typography';
+                (document.head || document.documentElement).appendChild(style);
+            }
+            style.textContent = css;
+            if (anchor) {
+                var rect = rectAt(anchor.root, anchor.offset);
+                if (rect) {
+                    window.scrollBy(0, rect.top - anchor.top);
+                }
+            }
+            return anchor ? anchor.offset : null;
+        }
+    };
+})();
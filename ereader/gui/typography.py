@@ -0,0 +1,82 @@
+import json
+import time
+from typing import Optional
+
+from PyQt5.QtWebEngineWidgets import QWebEngineSettings
+
+from ..utils import metrics
+from .resources import resource
+
+
+class Typography:
+    """
+    The font family, font size, line height and margins of the reader, applied as CSS custom properties
+    by a style element every document gets. A change rewrites that element in the live document instead of
+    reloading it, and scrolls the text that was at the top of the viewport back there; in the paginated mode
+    the page breaks, the only layout dependent cache, are measured again for the new layout.
+    Line height and margins are left to the book until they are set. The font is also kept as the default of the
+    web engine, for what the style element does not reach.
+    """
+
+    STYLE_ID = "ereader-typography"
+    DEFAULTS = {"fontFamily": "LXGW WenKai", "fontSize": 24, "lineHeight": None, "margin": None}
+
+    def __init__(self, readView, settings: Optional[dict] = None) -> None:
+        self.readView = readView
+        settings = settings or {}
+        self.values = {key: settings.get(key, default) for key, default in self.DEFAULTS.items()}
+        self.setDefaultFont()
+
+    def setDefaultFont(self) -> None:
+        settings = QWebEngineSettings.globalSettings()
+        settings.setFontFamily(QWebEngineSettings.StandardFont, self.values["fontFamily"])
+        settings.setFontSize(QWebEngineSettings.DefaultFontSize, self.values["fontSize"])
+
+    def css(self) -> str:
+        fontFamily, fontSize = self.values["fontFamily"], self.values["fontSize"]
+        lineHeight, margin = self.values["lineHeight"], self.values["margin"]
+        properties = [f"--ereader-font-family: {json.dumps(fontFamily)};", f"--ereader-font-size: {fontSize}px;"]
+        rules = ["html { font-family: var(--ereader-font-family); font-size: var(--ereader-font-size); }"]
+        if lineHeight is not None:
+            properties.append(f"--ereader-line-height: {lineHeight};")
+            rules.append("body, body p { line-height: var(--ereader-line-height); }")
+        if margin is not None:
+            properties.append(f"--ereader-margin: {margin}px;")
+            rules.append("body { padding-left: var(--ereader-margin); padding-right: var(--ereader-margin); }")
+        return f":root {{ {' '.join(properties)} }}\n" + "\n".join(rules)
+
+    def layoutKey(self) -> str:
+        return "|".join(str(self.values[key]) for key in self.DEFAULTS)
+
+    def set(self, fontFamily: Optional[str] = None, fontSize: Optional[int] = None,
+            lineHeight: Optional[float] = None, margin: Optional[int] = None) -> None:
+        """
+        Changes the given values on the displayed document, a value of 0 hands line height or margins back to the book.
+        """
+        changes = {"fontFamily": fontFamily, "fontSize": fontSize, "lineHeight": lineHeight, "margin": margin}
+        for key, value in changes.items():
+            if value is None:
+                continue
+            if key in ("lineHeight", "margin") and not value:
+                value = None
+            self.values[key] = value
+        self.setDefaultFont()
+        # a document still loading got the old style element, restyle it once it is shown
+        if self.readView.loading:
+            self.readView.runALF(self.apply)
+        else:
+            self.apply()
+
+    def apply(self) -> None:
+        paginator = self.readView.paginator
+        start = time.perf_counter()
+
+        def applied(_) -> None:
+            metrics.record("typography.apply", start)
+            if paginator and paginator is self.readView.paginator:
+                paginator.relayout()
+
+        self.readView.page().runJavaScript(
+            resource("typography.js") +
+            f"ereaderTypography.apply({json.dumps(self.css())}, {json.dumps(not paginator)});",
+            applied)
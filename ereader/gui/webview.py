@@ -1,11 +1,14 @@
+import time
 from queue import Queue
 from typing import Callable
 
-from PyQt5.QtCore import QEvent
+from PyQt5.QtCore import QEvent, QUrl
 from PyQt5.QtGui import QMouseEvent
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 from PyQt5.QtWidgets import QWidget
 
+from ..utils import metrics
+
 
 class WebView(QWebEngineView):
     """
@@ -21,6 +24,7 @@ class WebView(QWebEngineView):
         self.loadFinished.connect(self._onLoadFinished)
         self.loadStarted.connect(self._onLoadStarted)
         self.loading = False
+        self._setHtmlStart = None
 
         self._childWidget = None
         self.installEventFilter(self)
@@ -38,11 +42,18 @@ class WebView(QWebEngineView):
         if not self.loading:
             func()
 
+    def setHtml(self, html: str, baseUrl: QUrl = QUrl()) -> None:
+        self._setHtmlStart = time.perf_counter()
+        super().setHtml(html, baseUrl)
+
     def _onLoadStarted(self) -> None:
         self.loading = True
 
     def _onLoadFinished(self) -> None:
         self.loading = False
+        if self._setHtmlStart is not None:
+            metrics.record("webview.load", self._setHtmlStart)
+            self._setHtmlStart = None
         while not self._loadFinishedQueue.empty():
             self._loadFinishedQueue.get()()
 
@@ -1,25 +1,42 @@
 from queue import Queue
+import inspect
 import logging
-from typing import Optional
+import shlex
+import sys
+from typing import List, Optional, Tuple
 
-import fire
-from PyQt5.QtWidgets import QApplication
+logging.basicConfig(level=logging.INFO)
 
-from .gui import EReader
-from .utils import data
 
-logging.basicConfig(level=logging.INFO)
+def run(epubPath: Optional[str] = None, fontFamily: Optional[str] = None, fontSize: Optional[int] = None,
+        extract: bool = False, continuous: Optional[bool] = None, paginated: Optional[bool] = None,
+        listen: bool = False, script: Optional[str] = None, trace: Optional[str] = None):
+    # imported here so the export and benchmark commands do not load Qt WebEngine
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
 
+    from .gui import CommandServer, EReader, StdinReader, registerEpubScheme
+    from .utils import data, extractCache, imageCache, metrics, setMaxWorkers
 
-def run(epubPath: Optional[str] = None, fontFamily: Optional[str] = None, fontSize: Optional[int] = None):
     queue = Queue()
+    registerEpubScheme()
     app = QApplication([])
 
-    settings = {}
+    settings = {**data.settings(), "extract": extract}
+    if extractCacheBytes := settings.get("extractCacheBytes"):
+        extractCache.maxBytes = extractCacheBytes
+    if imageCacheBytes := settings.get("imageCacheBytes"):
+        imageCache.maxBytes = imageCacheBytes
+    if workers := settings.get("workers"):
+        setMaxWorkers(workers)
     if fontFamily:
         settings["fontFamily"] = fontFamily
     if fontSize:
         settings["fontSize"] = fontSize
+    if continuous is not None:
+        settings["continuous"] = continuous
+    if paginated is not None:
+        settings["paginated"] = paginated
     ereader = EReader(queue,settings)
     if epubPath:
         ereader.loadEpub(epubPath)
@@ -29,19 +46,65 @@ def run(epubPath: Optional[str] = None, fontFamily: Optional[str] = None, fontSi
         else:
             ereader.openEpub()
 
-    if readProgress := data.get("currentReadProgress"):
-        ereader.gotoReadProgress(readProgress)
+    if listen:
+        server = CommandServer(ereader.dispatcher, parent=ereader)
+        if server.listen():
+            logging.info("listening for commands on %s", server.server.fullServerName())
+    if script:
+        QTimer.singleShot(0, lambda: ereader.shell.source(script))
 
-    r = ''
-    while r != 'exit':
-        r =input('$')
-        ereader.receivedCmd.emit(r)
+    # without a terminal stdin is often closed from the start (a launcher, a service, </dev/null)
+    stdinReader = StdinReader(exitOnEof=sys.stdin.isatty() and not listen, parent=ereader)
+    stdinReader.lineReceived.connect(ereader.receivedCmd)
+    stdinReader.start()
 
-    app.exit()
-    data["currentReadProgress"] = ereader.currentReadProgress()
-    data.save()
+    # every way out (closing the window, Q, the exit command) only quits the event loop and ends up here
+    app.exec_()
+    ereader.readView.saveReadProgress()
+    try:
+        ereader.readView.saveRestorePoint()
+    except OSError as e:
+        logging.warning("could not save the restore point: %s", e)
+    # stop the background searches and index builds, the worker pools are joined at interpreter exit
+    ereader.readView.cancelSearch()
+    ereader.readView.deactivateBook()
+    ereader.readView.session.closeAll()
+    extractCache.evict()
+    if trace:
+        metrics.dumpTrace(trace)
+    print("exit")
     logging.shutdown()
 
 
+def parseArgs(argv: List[str]) -> Optional[Tuple[list, dict]]:
+    """
+    Parses the arguments of run with the shell's parser, which is much cheaper to import than fire.
+    Returns None for what only fire handles, like --help or arguments run does not take.
+    """
+    from .gui.shell import parseCommand
+
+    if any(arg in ("-h", "--help") or arg.startswith("--help") for arg in argv):
+        return None
+    try:
+        _, args, kwargs = parseCommand(shlex.join(["run", *argv]), {"run": inspect.signature(run).parameters})
+        inspect.signature(run).bind(*args, **kwargs)
+    except (TypeError, ValueError):
+        return None
+    return args, kwargs
+
+
 def main():
-    fire.Fire(run)
+    if sys.argv[1:2] == ["export"]:
+        import fire
+        from .export import export
+        fire.Fire(export, command=sys.argv[2:], name="ereader export")
+    elif sys.argv[1:2] == ["benchmark"]:
+        import fire
+        from .benchmark import compare, generateEpub, run as benchmark, startup
+        fire.Fire({"run": benchmark, "compare": compare, "generate": generateEpub, "startup": startup},
+                  command=sys.argv[2:], name="ereader benchmark")
+    elif (parsed := parseArgs(sys.argv[1:])) is not None:
+        run(*parsed[0], **parsed[1])
+    else:
+        import fire
+        fire.Fire(run)
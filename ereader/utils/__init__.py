@@ -1,7 +1,24 @@
 
 
+from .annotations import Annotations, Highlight, IntervalIndex, annotations, segments
+from .booksession import BookSession, OpenBook
+from .diskcache import DiskCache
 from .epubparser import EpubParser
-from .persistentdict import data
-from .functions import addCssToHtml
+from .statestore import StateStore, data
+from .extractcache import ExtractCache, extractCache
+from .functions import (addCssToHtml, bodyOf, htmlToMarkdown, htmlToText, normalizeBlankLines,
+                        rewriteUrls)
+from .imagecache import ImageCache, imageCache
+from .imaging import downscaleImage, scaleImage
+from .layoutcache import LayoutCache, layoutCache
+from .library import Library, library
+from .metrics import Metrics, metrics
+from .navindex import NavIndex
+from .opfparser import NavPoint, Package, parseOpf
+from .prefetcher import Prefetcher
+from .restorecache import RestoreCache, restoreCache
+from .search import SearchHit, findAll, searchBook
+from .searchindex import SearchIndex
+from .workers import processPool, setMaxWorkers, threadPool
 
 
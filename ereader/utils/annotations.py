@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from .statestore import StateStore, bookKey, data
+
+
+class Highlight:
+    __slots__ = ('id', 'pageIndex', 'start', 'end', 'text', 'note', 'color', 'created')
+
+    def __init__(self, id: int, pageIndex: int, start: int, end: int, text: str, note: str, color: str,
+                 created: float) -> None:
+        self.id = id
+        self.pageIndex = pageIndex
+        self.start = start
+        self.end = end
+        self.text = text
+        self.note = note
+        self.color = color
+        self.created = created
+
+    def toDict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class IntervalIndex:
+    """
+    The highlights of a chapter sorted by start, with the running maximum of their ends.
+    Both arrays are sorted, so the highlights overlapping a range are found with two bisections.
+    """
+
+    def __init__(self) -> None:
+        self.highlights: List[Highlight] = []
+        self.starts: List[int] = []
+        self.maxEnds: List[int] = []
+
+    def add(self, highlight: Highlight) -> None:
+        index = bisect_right(self.starts, highlight.start)
+        self.starts.insert(index, highlight.start)
+        self.highlights.insert(index, highlight)
+        self._updateMaxEnds(index)
+
+    def remove(self, highlightId: int) -> bool:
+        for index, highlight in enumerate(self.highlights):
+            if highlight.id == highlightId:
+                del self.highlights[index], self.starts[index]
+                self._updateMaxEnds(index)
+                return True
+        return False
+
+    def _updateMaxEnds(self, index: int) -> None:
+        del self.maxEnds[index:]
+        maxEnd = self.maxEnds[-1] if self.maxEnds else -1
+        for highlight in self.highlights[index:]:
+            maxEnd = max(maxEnd, highlight.end)
+            self.maxEnds.append(maxEnd)
+
+    def overlapping(self, start: int, end: int) -> List[Highlight]:
+        """
+        Returns the highlights overlapping [start, end), in the order of their starts.
+        """
+        # before first every highlight ends at or before start, from last on they start at or after end
+        first = bisect_right(self.maxEnds, start)
+        last = bisect_left(self.starts, end)
+        return [highlight for highlight in self.highlights[first:last] if highlight.end > start]
+
+    def __len__(self) -> int:
+        return len(self.highlights)
+
+
+def segments(highlights: List[Highlight]) -> List[list]:
+    """
+    Flattens possibly overlapping highlights into sorted disjoint [start, end, ids, color] segments,
+    the color of the latest highlight winning where they overlap.
+    """
+    bounds = sorted({offset for highlight in highlights for offset in (highlight.start, highlight.end)})
+    result = []
+    for start, end in zip(bounds, bounds[1:]):
+        covering = [highlight for highlight in highlights if highlight.start <= start and highlight.end >= end]
+        if covering:
+            result.append([start, end, [highlight.id for highlight in covering],
+                           max(covering, key=lambda highlight: highlight.created).color])
+    return result
+
+
+class Annotations:
+    """
+    Highlights and their notes, kept in the state database. Positions are character offsets into the text
+    of a chapter's body. The highlights of a book are loaded once into an interval index per chapter.
+    """
+
+    COLUMNS = "id, page, start, end, text, note, color, created"
+
+    def __init__(self, store: StateStore = data) -> None:
+        self.store = store
+        self._indexes: Dict[str, Dict[int, IntervalIndex]] = {}
+        self._lock = threading.Lock()
+
+    def index(self, epubPath: str) -> Dict[int, IntervalIndex]:
+        """
+        Returns the interval indexes of the chapters of a book, loaded on first use.
+        """
+        book = bookKey(epubPath)
+        with self._lock:
+            if book not in self._indexes:
+                indexes = {}
+                for row in self.store.execute(f"SELECT {self.COLUMNS} FROM highlights WHERE book = ? "
+                                              "ORDER BY page, start", (book,)):
+                    highlight = Highlight(*row)
+                    indexes.setdefault(highlight.pageIndex, IntervalIndex()).add(highlight)
+                self._indexes[book] = indexes
+            return self._indexes[book]
+
+    def add(self, epubPath: str, pageIndex: int, start: int, end: int, text: str, note: str = "",
+            color: str = "yellow") -> Highlight:
+        if end <= start:
+            raise ValueError("a highlight must cover some text")
+        indexes = self.index(epubPath)
+        created = time.time()
+        highlightId = self.store.execute(
+            "INSERT INTO highlights (book, page, start, end, text, note, color, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (bookKey(epubPath), pageIndex, start, end, text, note, color, created)).lastrowid
+        highlight = Highlight(highlightId, pageIndex, start, end, text, note, color, created)
+        with self._lock:
+            indexes.setdefault(pageIndex, IntervalIndex()).add(highlight)
+        return highlight
+
+    def remove(self, epubPath: str, highlightId: int) -> None:
+        self.store.execute("DELETE FROM highlights WHERE id = ?", (highlightId,))
+        with self._lock:
+            for index in self._indexes.get(bookKey(epubPath), {}).values():
+                if index.remove(highlightId):
+                    break
+
+    def annotate(self, epubPath: str, highlightId: int, note: str) -> None:
+        self.store.execute("UPDATE highlights SET note = ? WHERE id = ?", (note, highlightId))
+        highlight = self.get(epubPath, highlightId)
+        if highlight:
+            highlight.note = note
+
+    def get(self, epubPath: str, highlightId: int) -> Optional[Highlight]:
+        for index in self.index(epubPath).values():
+            for highlight in index.highlights:
+                if highlight.id == highlightId:
+                    return highlight
+        return None
+
+    def chapter(self, epubPath: str, pageIndex: int, start: int = 0, end: Optional[int] = None) -> List[Highlight]:
+        """
+        Returns the highlights of a chapter overlapping [start, end), all of them by default.
+        """
+        index = self.index(epubPath).get(pageIndex)
+        if not index:
+            return []
+        return index.overlapping(start, end if end is not None else index.maxEnds[-1])
+
+    def all(self, epubPath: str) -> List[Highlight]:
+        indexes = self.index(epubPath)
+        return [highlight for pageIndex in sorted(indexes) for highlight in indexes[pageIndex].highlights]
+
+    def search(self, query: str, epubPath: Optional[str] = None) -> List[Tuple[str, Highlight]]:
+        """
+        Returns the (book, highlight) pairs whose text or note contains query, of one book or of all books.
+        """
+        pattern = f"%{query}%"
+        where, parameters = "(text LIKE ? OR note LIKE ?)", (pattern, pattern)
+        if epubPath:
+            where, parameters = f"book = ? AND {where}", (bookKey(epubPath),) + parameters
+        rows = self.store.execute(f"SELECT book, {self.COLUMNS} FROM highlights WHERE {where} "
+                                  "ORDER BY book, page, start", parameters)
+        return [(row[0], Highlight(*row[1:])) for row in rows]
+
+    def export(self, epubPath: str, format: str = "md", title: str = "") -> str:
+        """
+        Renders the highlights of a book as markdown or json.
+        """
+        highlights = self.all(epubPath)
+        if format == "json":
+            return json.dumps({"book": bookKey(epubPath), "title": title,
+                               "highlights": [highlight.toDict() for highlight in highlights]},
+                              ensure_ascii=False, indent=2)
+        if format != "md":
+            raise ValueError("format must be md or json")
+        lines = [f"# {title or bookKey(epubPath)}", ""]
+        for highlight in highlights:
+            lines.append(f"> {' '.join(highlight.text.split())}")
+            if highlight.note:
+                lines.extend(["", highlight.note])
+            lines.extend(["", f"<sub>chapter {highlight.pageIndex + 1}</sub>", ""])
+        return "\n".join(lines)
+
+
+annotations = Annotations()
@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from pathlib import Path
+from typing import List, Optional
+
+from .epubparser import EpubParser
+from .navindex import NavIndex
+from .statestore import bookKey
+
+
+class OpenBook:
+    """
+    A book of the session, live with its parser or demoted to a compressed snapshot of its parsed structures.
+    """
+
+    __slots__ = ('epubPath', 'title', 'epubParser', 'snapshot', 'readProgress', 'searchIndex', 'navIndex',
+                 'lastUsed')
+
+    def __init__(self, epubParser: EpubParser) -> None:
+        self.epubPath = epubParser.epubPath
+        title = (epubParser.meta or {}).get("dc:title", "")
+        if isinstance(title, list):
+            title = title[0] if title else ""
+        self.title = title or Path(epubParser.epubPath).stem
+        self.epubParser: Optional[EpubParser] = epubParser
+        self.snapshot: Optional[bytes] = None
+        self.readProgress: dict = {}
+        self.searchIndex: Optional[Future] = None
+        self.navIndex: Optional[NavIndex] = None
+        self.lastUsed = time.monotonic()
+
+    @property
+    def demoted(self) -> bool:
+        return self.epubParser is None
+
+    def memoryBytes(self) -> int:
+        if self.epubParser is None:
+            return len(self.snapshot)
+        size = self.epubParser.memoryBytes()
+        searchIndex = self.searchIndex
+        if searchIndex is not None and searchIndex.done() and not searchIndex.cancelled() \
+                and not searchIndex.exception():
+            size += searchIndex.result().memoryBytes()
+        return size
+
+
+class BookSession:
+    """
+    The books open in the reader, one of them active. Switching keeps the books left in the background
+    with their parser, rendered chapters and search index, until the session holds more than maxBytes;
+    then the least recently used background books are demoted to a snapshot of their parsed structures,
+    which reopens without parsing. The search index of a demoted book comes back from its disk cache.
+    """
+
+    def __init__(self, maxBytes: int = 256 * 1024 * 1024) -> None:
+        self.maxBytes = maxBytes
+        self.active: Optional[OpenBook] = None
+        # least recently used first
+        self._books: 'OrderedDict[str, OpenBook]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._books)
+
+    def books(self) -> List[OpenBook]:
+        """
+        Returns the open books, the least recently used first and the active one last.
+        """
+        with self._lock:
+            return list(self._books.values())
+
+    def get(self, epubPath: str) -> Optional[OpenBook]:
+        return self._books.get(bookKey(epubPath))
+
+    def add(self, epubParser: EpubParser) -> OpenBook:
+        """
+        Adds a freshly opened book as the active one, replacing an older instance of it.
+        """
+        with self._lock:
+            key = bookKey(epubParser.epubPath)
+            if (previous := self._books.pop(key, None)) and previous.epubParser is not epubParser:
+                self._close(previous)
+            book = OpenBook(epubParser)
+            self._books[key] = book
+            self.active = book
+            self.enforceBudget()
+            return book
+
+    def activate(self, book: OpenBook) -> EpubParser:
+        """
+        Makes book the active one, reopening it from its snapshot if it was demoted.
+        """
+        with self._lock:
+            if book.epubParser is None:
+                book.epubParser = EpubParser.fromSnapshot(book.epubPath, book.snapshot)
+                book.snapshot = None
+            self._books.move_to_end(bookKey(book.epubPath))
+            book.lastUsed = time.monotonic()
+            self.active = book
+            self.enforceBudget()
+            return book.epubParser
+
+    def deactivate(self, readProgress: dict, searchIndex: Optional[Future], navIndex: Optional[NavIndex]) -> None:
+        """
+        Keeps what the reader built for the active book, which goes to the background.
+        """
+        with self._lock:
+            if self.active is None:
+                return
+            self.active.readProgress = readProgress
+            self.active.searchIndex = searchIndex
+            self.active.navIndex = navIndex
+            self.active = None
+
+    def close(self, book: OpenBook) -> None:
+        with self._lock:
+            if book is self.active:
+                raise RuntimeError("the active book cannot be closed, switch to another book first")
+            if self._books.pop(bookKey(book.epubPath), None) is not None:
+                self._close(book)
+
+    def closeAll(self) -> None:
+        with self._lock:
+            for book in self._books.values():
+                self._close(book)
+            self._books.clear()
+            self.active = None
+
+    def memoryBytes(self) -> int:
+        with self._lock:
+            return sum(book.memoryBytes() for book in self._books.values())
+
+    def enforceBudget(self) -> None:
+        """
+        Demotes background books, the least recently used first, until the session fits in maxBytes.
+        """
+        with self._lock:
+            total = self.memoryBytes()
+            for book in list(self._books.values()):
+                if total <= self.maxBytes:
+                    break
+                if book is self.active or book.demoted:
+                    continue
+                before = book.memoryBytes()
+                if self.demote(book):
+                    total -= before - book.memoryBytes()
+
+    def demote(self, book: OpenBook) -> bool:
+        """
+        Replaces the parser of a background book by its snapshot, unless the snapshot would not be smaller.
+        Returns whether the book was demoted.
+        """
+        with self._lock:
+            if book.demoted or book is self.active:
+                return False
+            snapshot = book.epubParser.snapshot()
+            if len(snapshot) >= book.memoryBytes():
+                return False
+            book.snapshot = snapshot
+            self._close(book)
+            return True
+
+    @staticmethod
+    def _close(book: OpenBook) -> None:
+        if book.epubParser is not None:
+            # a running index build stops after its current page, wait for it before closing the archive
+            book.epubParser.closing.set()
+        if book.searchIndex is not None:
+            book.searchIndex.cancel()
+            wait([book.searchIndex])
+            book.searchIndex = None
+        if book.epubParser is not None:
+            book.epubParser.close()
+            book.epubParser = None
@@ -0,0 +1,91 @@
+import os
+import pickle
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from .functions import cacheDir
+
+
+class DiskCache:
+    """
+    A directory of cache files under the ereader cache directory, with the file handling the caches share:
+    entries are written to a temporary file and moved in place, so readers never see a partial one, and the
+    directory is kept under maxBytes by removing the least recently used files. Subclasses key the entries.
+    """
+
+    VERSION = 1
+
+    def __init__(self, name: str, suffix: str, maxBytes: Optional[int] = None,
+                 directory: Optional[Path] = None) -> None:
+        self.name = name
+        self.suffix = suffix
+        self.maxBytes = maxBytes
+        self._directory = directory
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is None:
+            self._directory = cacheDir(self.name)
+        return self._directory
+
+    def read(self, path: Path) -> Optional[bytes]:
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def write(self, path: Path, data: bytes) -> None:
+        tempPath = path.with_suffix(f".{os.getpid()}.tmp")
+        tempPath.write_bytes(data)
+        os.replace(tempPath, path)
+
+    def loadEntry(self, path: Path) -> Optional[dict]:
+        """
+        Returns the entry pickled at path, or None if there is none, it is damaged or of another version.
+        """
+        data = self.read(path)
+        if data is None:
+            return None
+        try:
+            entry = pickle.loads(zlib.decompress(data))
+        except (zlib.error, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != self.VERSION:
+            return None
+        return entry
+
+    def saveEntry(self, path: Path, entry: dict, level: int = -1) -> None:
+        self.write(path, zlib.compress(pickle.dumps({**entry, "version": self.VERSION}, pickle.HIGHEST_PROTOCOL),
+                                       level))
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        """
+        Marks an entry as used, for the eviction.
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used entries until the cache fits in maxBytes, returns the size left.
+        """
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if self.maxBytes is None:
+            return total
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        return total
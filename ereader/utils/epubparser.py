@@ -1,111 +1,249 @@
-import os
-import shutil
-import tempfile
+import hashlib
+import mimetypes
+import pickle
+import threading
 import zipfile
+import zlib
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from urllib.parse import quote
 
-import xmltodict
-
-from .functions import addCssToHtml
+from .extractcache import extractCache
+from .functions import addCssToHtml, deepSizeOf
+from .imagecache import imageCache
+from .imaging import SCALED_FORMATS, downscaleImage
+from .lrucache import LRUCache
+from .metrics import metrics
+from .opfparser import NavPoint, Package, parseContainer, parseNav, parseNcx, parseOpf, resolveHref
+from .parsecache import parseCache
 
 
 class EpubParser:
-    def __init__(self, epubPath: str) -> None:
+    CACHED_FIELDS = ('opfFile', 'mediaTypes', 'pagesPath', 'css_path', 'toc', 'meta')
+
+    @metrics.timed('parser.open')
+    def __init__(self, epubPath: str, extract: bool = False, renderCacheBytes: int = 32 * 1024 * 1024,
+                 useParseCache: bool = True, state: Optional[dict] = None) -> None:
         """
-        Initialize EpubParser
+        Initialize EpubParser.
+        By default resources are read lazily from the archive, pass extract=True to read them from an extraction cached on disk.
+        Batch tools pass useParseCache=False to leave the parse cache to the books being read.
+        state is the snapshot of a parser of the same book, used instead of parsing if the book has not changed.
         """
         self.epubPath = epubPath
-        self.tempDir = Path(tempfile.TemporaryDirectory().name)
+        self.bookId = hashlib.sha1(
+            str(Path(epubPath).resolve()).encode('utf-8')).hexdigest()[:16]
         self.currentPageIndex = 0
-        self.extract()
-        self.opfFile = next(Path(self.tempDir).rglob('content.opf'), None)
-        self.tempDir = self.opfFile.parent
+        self.renderCache = LRUCache(renderCacheBytes)
+        self._bookCss = None
+        self._structureBytes = None
+        # set while the book is closed, so work on the worker pool stops reading it
+        self.closing = threading.Event()
+        self._zipLock = threading.Lock()
+        self.zipFile = zipfile.ZipFile(epubPath, 'r')
+        self.contentHash = self.computeContentHash()
+        self.extractDir = None
+        if extract:
+            self.extract()
+
+        if state and state["contentHash"] == self.contentHash:
+            cached = state["fields"]
+        else:
+            cached = parseCache.load(epubPath, self.contentHash) if useParseCache else None
+        if cached:
+            self.__dict__.update(cached)
+            return
+
+        self.opfFile = self.findOpf()
+
+        package = parseOpf(self.readFile(self.opfFile), self.opfFile)
+        self.mediaTypes = {item.path: item.mediaType for item in package.manifest.values()}
+        self.pagesPath, self.css_path = self.parse(package)
+        self.toc = self.parseToc(package)
+        self.meta = package.metadata
+        if useParseCache:
+            parseCache.save(epubPath, self.contentHash, {key: getattr(self, key) for key in self.CACHED_FIELDS})
+
+    def snapshot(self) -> bytes:
+        """
+        Returns the parsed structures and position of the book, compressed, to reopen it with fromSnapshot.
+        """
+        state = {"contentHash": self.contentHash, "extract": self.extractDir is not None,
+                 "currentPageIndex": self.currentPageIndex,
+                 "fields": {key: getattr(self, key) for key in self.CACHED_FIELDS}}
+        return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def fromSnapshot(cls, epubPath: str, snapshot: bytes) -> 'EpubParser':
+        state = pickle.loads(zlib.decompress(snapshot))
+        epubParser = cls(epubPath, state["extract"], state=state)
+        if state["currentPageIndex"] < len(epubParser.pagesPath):
+            epubParser.currentPageIndex = state["currentPageIndex"]
+        return epubParser
+
+    def memoryBytes(self) -> int:
+        """
+        Estimates the memory held by the parsed structures, the rendered chapters and stylesheets.
+        """
+        if self._structureBytes is None:
+            self._structureBytes = deepSizeOf([getattr(self, key) for key in self.CACHED_FIELDS])
+        return self._structureBytes + self.renderCache.currentBytes + len(self._bookCss or '')
 
-        self.pagesPath, self.css_path = self.parse()
-        self.toc = self.parseToc()
-        self.meta = self.parseMeta()
+    def computeContentHash(self) -> str:
+        """
+        Hashes the names, sizes and CRCs of the archive's central directory.
+        """
+        sha1 = hashlib.sha1()
+        for info in self.zipFile.infolist():
+            sha1.update(f'{info.filename}\0{info.file_size}\0{info.CRC}\n'.encode('utf-8'))
+        return sha1.hexdigest()
 
     def extract(self) -> None:
-        if self.tempDir.exists():
-            shutil.rmtree(self.tempDir)
-        os.makedirs(self.tempDir)
-        with zipfile.ZipFile(self.epubPath, 'r') as zipRef:
-            zipRef.extractall(self.tempDir)
-
-    def parse(self) -> Tuple[List[Path], List[Path]]:
-        with open(self.opfFile, 'r', encoding='utf-8') as f:
-            opfContent = f.read()
-
-        opfDict = xmltodict.parse(opfContent)
-        manifest = opfDict['package']['manifest']
-        pages = [self.tempDir / item['@href'] for item in manifest['item'] if
-                 item['@media-type'] == 'application/xhtml+xml']
-        css = [self.tempDir / item['@href']
-               for item in manifest['item'] if item['@media-type'] == 'text/css']
-        return pages, css
+        with self._zipLock:
+            self.extractDir = extractCache.extract(self.zipFile, self.contentHash)
+
+    def close(self) -> None:
+        self.zipFile.close()
+        if self.extractDir is not None:
+            extractCache.release(self.contentHash)
+            self.extractDir = None
+
+    def hasFile(self, name: str) -> bool:
+        if self.extractDir is not None:
+            return (self.extractDir / name).is_file()
+        try:
+            self.zipFile.getinfo(name)
+            return True
+        except KeyError:
+            return False
 
-    def currentPagePath(self) -> Path:
-        return self.pagesPath[self.currentPageIndex]
+    def readFile(self, name: str) -> bytes:
+        """
+        Reads a file of the book by its path inside the archive.
+        """
+        if self.extractDir is not None:
+            return (self.extractDir / name).read_bytes()
+        with self._zipLock:
+            return self.zipFile.read(name)
+
+    def fileSize(self, name: str) -> int:
+        if self.extractDir is not None:
+            return (self.extractDir / name).stat().st_size
+        return self.zipFile.getinfo(name).file_size
+
+    def readText(self, name: str) -> str:
+        return self.readFile(name).decode('utf-8')
+
+    def mediaType(self, name: str) -> str:
+        if name in self.mediaTypes:
+            return self.mediaTypes[name]
+        return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    @metrics.timed('parser.scaledImage')
+    def scaledImage(self, name: str, width: int, height: int) -> Optional[bytes]:
+        """
+        Returns an image of the book scaled down to fit in width x height, transcoded once and kept in the image cache.
+        Returns None if the original should be served, because it already fits or is not a transcoded format.
+        """
+        mediaType = self.mediaType(name)
+        if mediaType not in SCALED_FORMATS:
+            return None
+        data = imageCache.load(self.contentHash, name, width, height)
+        if data is None:
+            data = downscaleImage(self.readFile(name), mediaType, width, height)
+            if data is None:
+                return None
+            imageCache.save(self.contentHash, name, width, height, data)
+        return data
+
+    def pageUrl(self, name: str) -> str:
+        """
+        Returns the url the web view loads a file of the book from.
+        """
+        if self.extractDir is not None:
+            return (self.extractDir / name).as_uri()
+        return f'epub://{self.bookId}/{quote(name)}'
 
-    def getPageHtml(self, pageIndex: int, withCss: bool = True) -> str:
-        with open(pageIndex, "r", encoding='utf-8') as f:
-            html = f.read()
-        if withCss:
-            for css in self.css_path:
-                with open(css, "r", encoding='utf-8') as f:
-                    html = addCssToHtml(f.read(), html)
-        return html
+    def resolveHref(self, base: str, href: str) -> str:
+        """
+        Resolves a href relative to the file at base into a path inside the archive.
+        """
+        return resolveHref(base, href)
 
-    def currentPageHtml(self, withCss: bool = True) -> str:
-        return self.getPageHtml(self.currentPagePath(), withCss)
+    def findOpf(self) -> str:
+        try:
+            return parseContainer(self.readFile('META-INF/container.xml'))
+        except KeyError:
+            return next(name for name in self.zipFile.namelist() if name.endswith('.opf'))
 
-    def parseToc(self) -> list:
-        tocFile = next(Path(self.tempDir).rglob('toc.ncx'), None)
-        with open(tocFile, 'r', encoding='utf-8') as f:
-            tocContent = f.read()
+    def parse(self, package: Package) -> Tuple[List[str], List[str]]:
+        """
+        Returns the pages in spine order and the stylesheets of the book.
+        """
+        pages = [pagePath for pagePath in package.spinePaths()
+                 if self.mediaTypes.get(pagePath) in ('application/xhtml+xml', 'text/html')]
+        if not pages:
+            pages = [item.path for item in package.manifest.values() if item.mediaType == 'application/xhtml+xml']
+        css = [item.path for item in package.manifest.values() if item.mediaType == 'text/css']
+        return pages, css
 
-        tocDict = xmltodict.parse(tocContent)
-        navMap = tocDict['ncx']['navMap']
-        toc = []
+    def manifestPages(self) -> List[str]:
+        """
+        Returns the pages in the manifest order older versions numbered them in.
+        """
+        package = parseOpf(self.readFile(self.opfFile), self.opfFile)
+        return [item.path for item in package.manifest.values() if item.mediaType == 'application/xhtml+xml']
 
-        def parseNavPoint(navPoint):
-            tocItem = {'text': navPoint['navLabel']['text'],
-                       'url': str(self.tempDir / navPoint['content']['@src'])}
-            if 'navPoint' in navPoint:
-                if isinstance(navPoint['navPoint'], list):
-                    tocItem['subitems'] = []
-                    for subitem in navPoint['navPoint']:
-                        tocItem['subitems'].append(parseNavPoint(subitem))
-                else:
-                    tocItem['subitems'] = [parseNavPoint(navPoint['navPoint'])]
-            return tocItem
+    def progressPageIndex(self, progress: dict) -> Optional[int]:
+        """
+        Returns the page index saved progress points to, or None if it is not a page of the book.
+        Progress is found by its pagePath; progress saved without one counted pages in manifest order.
+        """
+        if "pagePath" in progress:
+            pagePath = progress["pagePath"]
+        else:
+            pageIndex = progress.get("pageIndex", -1)
+            manifestPages = self.manifestPages()
+            pagePath = manifestPages[pageIndex] if 0 <= pageIndex < len(manifestPages) else None
+        return self.pagesPath.index(pagePath) if pagePath in self.pagesPath else None
+
+    def currentPagePath(self) -> str:
+        return self.pagesPath[self.currentPageIndex]
 
-        for item in navMap['navPoint']:
-            toc.append(parseNavPoint(item))
+    def currentPageUrl(self) -> str:
+        return self.pageUrl(self.currentPagePath())
 
-        return toc
+    def bookCss(self) -> str:
+        """
+        Returns the book's stylesheets concatenated, read once per book.
+        """
+        if self._bookCss is None:
+            self._bookCss = '\n'.join(self.readText(css) for css in self.css_path)
+        return self._bookCss
+
+    def getPageHtml(self, pagePath: str, withCss: bool = True) -> str:
+        if not withCss:
+            return self.readText(pagePath)
+        html = self.renderCache.get(pagePath)
+        if html is None:
+            html = addCssToHtml(self.bookCss(), self.readText(pagePath))
+            self.renderCache.put(pagePath, html)
+        return html
 
-    def printToc(self) -> None:
-        def printTocItem(item, level=0):
-            print('  ' * level + item['text'])
-            if 'subitems' in item:
-                for subitem in item['subitems']:
-                    printTocItem(subitem, level + 1)
+    def currentPageHtml(self, withCss: bool = True) -> str:
+        return self.getPageHtml(self.currentPagePath(), withCss)
 
-        for item in self.toc:
-            printTocItem(item)
+    @metrics.timed('parser.parseToc')
+    def parseToc(self, package: Package) -> List[NavPoint]:
+        if package.ncx and self.hasFile(package.ncx):
+            return parseNcx(self.readFile(package.ncx), package.ncx)
+        if package.nav and self.hasFile(package.nav):
+            return parseNav(self.readFile(package.nav), package.nav)
+        return []
 
-    def parseMeta(self) -> dict:
-        try:
-            with open(self.opfFile, 'r', encoding='utf-8') as f:
-                opfContent = f.read()
-            opfDict = xmltodict.parse(opfContent)
-            metadata = opfDict['package']['metadata']
-            meta = {}
-            for key, value in metadata.items():
-                if key.startswith("dc"):
-                    meta[key] = value
-            return meta
-        except Exception as e:
-            print(e)
+    def printToc(self) -> None:
+        stack = [(item, 0) for item in reversed(self.toc)]
+        while stack:
+            item, level = stack.pop()
+            print('  ' * level + item.text)
+            stack.extend((child, level + 1) for child in reversed(item.children))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+from .functions import cacheDir
+
+
+class ExtractCache:
+    """
+    Extractions of books for setups that read them from disk, keyed by the book's content hash.
+    Reopening a book reuses its extraction. Entries are only visible once complete, and the least
+    recently used ones beyond maxBytes are removed, except those opened by this process.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, maxBytes: int = 1024 * 1024 * 1024) -> None:
+        self._directory = directory
+        self.maxBytes = maxBytes
+        self.inUse = {}
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        if self._directory is None:
+            self._directory = cacheDir("extract")
+        return self._directory
+
+    def extract(self, zipFile: zipfile.ZipFile, contentHash: str) -> Path:
+        """
+        Returns the directory the book is extracted to, extracting it if needed.
+        """
+        target = self.directory / contentHash
+        with self._lock:
+            self.inUse[contentHash] = self.inUse.get(contentHash, 0) + 1
+        if (target / ".complete").exists():
+            os.utime(target)
+            return target
+
+        temp = self.directory / f"{contentHash}.{os.getpid()}.{threading.get_ident()}.tmp"
+        zipFile.extractall(temp)
+        size = sum(info.file_size for info in zipFile.infolist())
+        (temp / ".complete").write_text(str(size))
+        try:
+            os.rename(temp, target)
+        except OSError:
+            # a concurrent open extracted the same book first
+            shutil.rmtree(temp, ignore_errors=True)
+        self.evict()
+        return target
+
+    def release(self, contentHash: str) -> None:
+        with self._lock:
+            if self.inUse.get(contentHash, 0) > 1:
+                self.inUse[contentHash] -= 1
+            else:
+                self.inUse.pop(contentHash, None)
+
+    def _remove(self, path: Path) -> None:
+        # renaming first makes the removal atomic for readers of the cache
+        trash = path.with_name(f"{path.name}.{os.getpid()}.trash")
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used extractions until the cache fits in maxBytes, and leftovers
+        of interrupted extractions.
+        """
+        entries = []
+        for path in self.directory.iterdir():
+            if path.suffix in (".tmp", ".trash"):
+                if time.time() - path.stat().st_mtime > 24 * 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                size = int((path / ".complete").read_text())
+            except (OSError, ValueError):
+                continue
+            entries.append((path.stat().st_mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            inUse = set(self.inUse)
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            if path.name in inUse:
+                continue
+            self._remove(path)
+            total -= size
+
+
+extractCache = ExtractCache()
@@ -1,8 +1,174 @@
-from bs4 import BeautifulSoup
-
-def addCssToHtml(css, html) -> str:
-    soup = BeautifulSoup(html, 'html.parser')
-    style_tag = soup.new_tag('style')
-    style_tag.string = css
-    soup.head.append(style_tag)
-    return str(soup)
+import os
+import re
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable
+
+_headClose = re.compile(r'</head\s*>', re.IGNORECASE)
+_htmlOpen = re.compile(r'<html\b[^>]*>', re.IGNORECASE)
+
+def addCssToHtml(css, html, styleId: str = None) -> str:
+    """
+    Splices a style element holding css into the head of html.
+    """
+    style = f'<style id="{styleId}">{css}</style>' if styleId else f'<style>{css}</style>'
+    if match := _headClose.search(html):
+        return html[:match.start()] + style + html[match.start():]
+    if match := _htmlOpen.search(html):
+        return html[:match.end()] + f'<head>{style}</head>' + html[match.end():]
+    return style + html
+
+def cacheDir(name: str) -> Path:
+    """
+    Returns (and creates) a sub directory of the ereader cache directory, ~/.ereader_cache unless
+    EREADER_CACHE_DIR is set.
+    """
+    path = Path(os.environ.get("EREADER_CACHE_DIR") or os.path.expanduser("~/.ereader_cache")) / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def deepSizeOf(obj) -> int:
+    """
+    Estimates the memory held by obj and the containers, strings and slotted objects it references.
+    """
+    seen, stack, size = set(), [obj], 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__slots__'):
+            stack.extend(getattr(item, slot) for slot in item.__slots__ if hasattr(item, slot))
+        elif hasattr(item, '__dict__') and not isinstance(item, type):
+            stack.append(item.__dict__)
+    return size
+
+class _TextExtractor(HTMLParser):
+    skippedTags = {'head', 'script', 'style'}
+    blockTags = {'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption',
+                 'figure', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p',
+                 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'}
+
+    def __init__(self, blockSeparator: str = '') -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.blockSeparator = blockSeparator
+        self._skipDepth = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in self.skippedTags:
+            self._skipDepth += 1
+        elif tag in self.blockTags and self.blockSeparator:
+            self.parts.append(self.blockSeparator)
+
+    def handle_endtag(self, tag) -> None:
+        if tag in self.skippedTags and self._skipDepth:
+            self._skipDepth -= 1
+        elif tag in self.blockTags and self.blockSeparator:
+            self.parts.append(self.blockSeparator)
+
+    def handle_data(self, data) -> None:
+        if not self._skipDepth:
+            self.parts.append(data)
+
+def htmlToText(html: str, blockSeparator: str = '') -> str:
+    """
+    Returns the text content of the body of html,
+    with blockSeparator inserted around block level elements if given.
+    """
+    extractor = _TextExtractor(blockSeparator)
+    extractor.feed(html)
+    extractor.close()
+    return ''.join(extractor.parts)
+
+_bodyContent = re.compile(r'<body\b[^>]*>(.*)</body\s*>', re.IGNORECASE | re.DOTALL)
+_urlAttribute = re.compile(r'''(\b(?:src|href|xlink:href|poster)\s*=\s*)(["'])(.*?)\2''', re.IGNORECASE | re.DOTALL)
+_absoluteUrl = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*:|/|#)')
+
+def bodyOf(html: str) -> str:
+    """
+    Returns the inner html of the body of html.
+    """
+    if match := _bodyContent.search(html):
+        return match.group(1)
+    return html
+
+def rewriteUrls(html: str, rewrite: Callable[[str], str]) -> str:
+    """
+    Passes every relative url of a src or href attribute in html through rewrite.
+    """
+    def replace(match):
+        url = match.group(3)
+        if _absoluteUrl.match(url):
+            return match.group(0)
+        return f'{match.group(1)}{match.group(2)}{rewrite(url)}{match.group(2)}'
+    return _urlAttribute.sub(replace, html)
+
+class _MarkdownConverter(HTMLParser):
+    headingTags = {'h1': '# ', 'h2': '## ', 'h3': '### ', 'h4': '#### ', 'h5': '##### ', 'h6': '###### '}
+    # a br is a hard line break, not a paragraph
+    blockTags = _TextExtractor.blockTags - {'br'}
+    emphasisTags = {'em': '*', 'i': '*', 'strong': '**', 'b': '**'}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipDepth = 0
+
+    def handle_starttag(self, tag, attrs) -> None:
+        if tag in _TextExtractor.skippedTags:
+            self._skipDepth += 1
+        elif self._skipDepth:
+            return
+        elif tag in self.headingTags:
+            self.parts.append('\n\n' + self.headingTags[tag])
+        elif tag == 'li':
+            self.parts.append('\n- ')
+        elif tag == 'blockquote':
+            self.parts.append('\n\n> ')
+        elif tag == 'br':
+            self.parts.append('  \n')
+        elif tag in self.emphasisTags:
+            self.parts.append(self.emphasisTags[tag])
+        elif tag == 'img':
+            attributes = dict(attrs)
+            self.parts.append(f"![{attributes.get('alt') or ''}]({attributes.get('src') or ''})")
+        elif tag in self.blockTags:
+            self.parts.append('\n\n')
+
+    def handle_endtag(self, tag) -> None:
+        if tag in _TextExtractor.skippedTags and self._skipDepth:
+            self._skipDepth -= 1
+        elif self._skipDepth:
+            return
+        elif tag in self.emphasisTags:
+            self.parts.append(self.emphasisTags[tag])
+        elif tag in self.blockTags:
+            self.parts.append('\n\n')
+
+    def handle_data(self, data) -> None:
+        if not self._skipDepth:
+            self.parts.append(re.sub(r'\s+', ' ', data))
+
+def htmlToMarkdown(html: str) -> str:
+    converter = _MarkdownConverter()
+    converter.feed(html)
+    converter.close()
+    return normalizeBlankLines(''.join(converter.parts), keepHardBreaks=True)
+
+def normalizeBlankLines(text: str, keepHardBreaks: bool = False) -> str:
+    """
+    Strips the lines of text and collapses runs of blank lines into one.
+    With keepHardBreaks, lines ending in two spaces, markdown line breaks, keep them unless a blank line follows.
+    """
+    text = re.sub(r'[ \t]*\n[ \t]*',
+                  lambda match: '  \n' if keepHardBreaks and match.group().startswith('  ') else '\n', text)
+    text = re.sub(r'  \n(?=\n)', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
@@ -0,0 +1,42 @@
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from .diskcache import DiskCache
+
+
+class ImageCache(DiskCache):
+    """
+    A disk cache of images scaled down for display.
+    Entries are keyed by the book's content hash, the asset's path in the book and the target size,
+    the directory is kept under maxBytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, maxBytes: int = 256 * 1024 * 1024) -> None:
+        super().__init__("images", ".img", maxBytes, directory)
+        self._currentBytes = None
+
+    def entryPath(self, contentHash: str, name: str, width: int, height: int) -> Path:
+        key = hashlib.sha1(f"{contentHash}\0{name}".encode("utf-8")).hexdigest()
+        return self.directory / f"{key}-{width}x{height}.img"
+
+    def load(self, contentHash: str, name: str, width: int, height: int) -> Optional[bytes]:
+        entryPath = self.entryPath(contentHash, name, width, height)
+        data = self.read(entryPath)
+        if data is not None:
+            self.touch(entryPath)
+        return data
+
+    def save(self, contentHash: str, name: str, width: int, height: int, data: bytes) -> None:
+        self.write(self.entryPath(contentHash, name, width, height), data)
+        if self._currentBytes is None or self._currentBytes + len(data) > self.maxBytes:
+            self.evict()
+        else:
+            self._currentBytes += len(data)
+
+    def evict(self) -> int:
+        self._currentBytes = super().evict()
+        return self._currentBytes
+
+
+imageCache = ImageCache()
@@ -0,0 +1,52 @@
+from typing import Optional
+
+
+def scaleImage(data: bytes, width: int, height: int, format: str = "JPEG", quality: int = 85) -> Optional[bytes]:
+    """
+    Scales an encoded image to fit in width x height, keeping its aspect ratio.
+    Returns None if the data can not be decoded.
+    QImage needs no QApplication, so this also runs in worker processes.
+    """
+    from PyQt5.QtCore import QBuffer, QIODevice, Qt
+    from PyQt5.QtGui import QImage
+
+    image = QImage.fromData(data)
+    if image.isNull():
+        return None
+    image = image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, format, quality)
+    return bytes(buffer.data())
+
+
+SCALED_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG"}
+
+
+def downscaleImage(data: bytes, mediaType: str, width: int, height: int, quality: int = 85) -> Optional[bytes]:
+    """
+    Scales an encoded image down to fit in width x height, in its own format.
+    Returns None if the image already fits, can not be decoded or its format is not transcoded.
+    """
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QSize, Qt
+    from PyQt5.QtGui import QImageReader
+
+    format = SCALED_FORMATS.get(mediaType)
+    if format is None:
+        return None
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    size = reader.size()
+    if not size.isValid() or (size.width() <= width and size.height() <= height):
+        return None
+    # the reader decodes straight to the target size, the full image is never held in memory
+    reader.setScaledSize(size.scaled(QSize(width, height), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None
+    output = QBuffer()
+    output.open(QIODevice.WriteOnly)
+    image.save(output, format, quality)
+    return bytes(output.data())
@@ -0,0 +1,40 @@
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .diskcache import DiskCache
+
+
+class LayoutCache(DiskCache):
+    """
+    A disk cache of the page breaks of the paginated mode.
+    Entries hold the breaks of every chapter laid out so far, keyed by the book's content hash and the layout
+    (typography and viewport), the directory is kept under maxBytes by evicting the least recently used.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory: Optional[Path] = None, maxBytes: int = 16 * 1024 * 1024) -> None:
+        super().__init__("layout", ".cache", maxBytes, directory)
+
+    def entryPath(self, contentHash: str, layoutKey: str) -> Path:
+        key = hashlib.sha1(f"{contentHash}\0{layoutKey}".encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.cache"
+
+    def load(self, contentHash: str, layoutKey: str) -> Dict[int, List[int]]:
+        """
+        Returns the page breaks, as character offsets of the page starts, of the chapters laid out in this layout.
+        """
+        entryPath = self.entryPath(contentHash, layoutKey)
+        entry = self.loadEntry(entryPath)
+        if entry is None:
+            return {}
+        self.touch(entryPath)
+        return entry["breaks"]
+
+    def save(self, contentHash: str, layoutKey: str, breaks: Dict[int, List[int]]) -> None:
+        self.saveEntry(self.entryPath(contentHash, layoutKey), {"breaks": breaks})
+        self.evict()
+
+
+layoutCache = LayoutCache()
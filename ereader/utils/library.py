@@ -0,0 +1,148 @@
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .imaging import scaleImage
+from .opfparser import parseContainer, parseOpf
+from .statestore import StateStore, bookKey, data
+
+
+def _text(value) -> str:
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    return value or ""
+
+
+def readBookMeta(epubPath: str) -> dict:
+    """
+    Reads the catalog entry of a book from its container and OPF only, runs in the scanning processes.
+    """
+    stat = os.stat(epubPath)
+    entry = {"path": epubPath, "mtime": stat.st_mtime_ns, "size": stat.st_size,
+             "title": Path(epubPath).stem, "author": "", "language": "", "cover": None}
+    with zipfile.ZipFile(epubPath, "r") as zipFile:
+        opfFile = parseContainer(zipFile.read("META-INF/container.xml"))
+        package = parseOpf(zipFile.read(opfFile), opfFile)
+        entry["title"] = _text(package.metadata.get("dc:title")) or entry["title"]
+        entry["author"] = _text(package.metadata.get("dc:creator"))
+        entry["language"] = _text(package.metadata.get("dc:language"))
+
+        cover = package.cover()
+        if cover is not None:
+            try:
+                entry["cover"] = scaleImage(zipFile.read(cover.path), 120, 180)
+            except KeyError:
+                pass
+    return entry
+
+
+class Library:
+    """
+    A catalog of the books under scanned directories, kept in the state database.
+    Rescans only read the books whose size or mtime changed, on a process pool.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE NOT NULL,
+                                          title TEXT NOT NULL, author TEXT NOT NULL, language TEXT NOT NULL,
+                                          mtime INTEGER NOT NULL, size INTEGER NOT NULL, cover BLOB,
+                                          added REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS booksTitle ON books (title COLLATE NOCASE);
+        CREATE INDEX IF NOT EXISTS booksAuthor ON books (author COLLATE NOCASE);
+    """
+    COLUMNS = "books.id, books.path, books.title, books.author, books.language, progress.value"
+
+    def __init__(self, store: StateStore = data) -> None:
+        self.store = store
+        self._ready = False
+
+    def _execute(self, sql: str, parameters: tuple = ()):
+        if not self._ready:
+            self.store.connection.executescript(self.SCHEMA)
+            self._ready = True
+        return self.store.execute(sql, parameters)
+
+    def scan(self, directory: str, workers: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Adds or refreshes the books under directory and drops the ones gone, returns (read, removed).
+        """
+        prefix = bookKey(directory) + os.sep
+        known = {path: (mtime, size) for path, mtime, size in self._execute(
+            "SELECT path, mtime, size FROM books WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+        found, changed = set(), []
+        for book in Path(prefix).rglob("*.epub"):
+            path = str(book)
+            found.add(path)
+            stat = book.stat()
+            if known.get(path) != (stat.st_mtime_ns, stat.st_size):
+                changed.append(path)
+
+        entries = []
+        if changed:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for path, future in [(path, pool.submit(readBookMeta, path)) for path in changed]:
+                    try:
+                        entries.append(future.result())
+                    except Exception as e:
+                        print(f"skipped {path}: {e}")
+        removed = [path for path in known if path not in found]
+
+        with self.store.transaction():
+            for entry in entries:
+                self._execute(
+                    "INSERT INTO books (path, title, author, language, mtime, size, cover, added) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET title = excluded.title, "
+                    "author = excluded.author, language = excluded.language, mtime = excluded.mtime, "
+                    "size = excluded.size, cover = excluded.cover",
+                    (entry["path"], entry["title"], entry["author"], entry["language"], entry["mtime"],
+                     entry["size"], entry["cover"], time.time()))
+            for path in removed:
+                self._execute("DELETE FROM books WHERE path = ?", (path,))
+        return len(entries), len(removed)
+
+    def _rows(self, where: str = "", parameters: tuple = (), limit: int = 50, offset: int = 0) -> List[dict]:
+        rows = self._execute(
+            f"SELECT {self.COLUMNS} FROM books LEFT JOIN progress ON progress.book = books.path {where} "
+            "ORDER BY books.title COLLATE NOCASE LIMIT ? OFFSET ?", parameters + (limit, offset))
+        books = []
+        for id, path, title, author, language, progress in rows:
+            percentage = json.loads(progress).get("percentage") if progress else None
+            books.append({"id": id, "path": path, "title": title, "author": author,
+                          "language": language, "percentage": percentage})
+        return books
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[dict]:
+        return self._rows(limit=limit, offset=offset)
+
+    def find(self, query: str, limit: int = 50) -> List[dict]:
+        """
+        Returns the books whose title or author starts with query, found through the NOCASE indexes,
+        followed by those containing it further in, which takes a scan, up to limit books.
+        """
+        # a range on the NOCASE collation is what the indexes can answer, LIKE would scan
+        upper = query + "\U0010ffff"
+        books = self._rows("WHERE (books.title >= ? COLLATE NOCASE AND books.title < ? COLLATE NOCASE) OR "
+                           "(books.author >= ? COLLATE NOCASE AND books.author < ? COLLATE NOCASE)",
+                           (query, upper, query, upper), limit)
+        if len(books) < limit:
+            pattern = f"%{query}%"
+            found = tuple(book["id"] for book in books)
+            books += self._rows(f"WHERE (books.title LIKE ? OR books.author LIKE ?) AND books.id NOT IN "
+                                f"({', '.join('?' * len(found))})", (pattern, pattern) + found, limit - len(books))
+        return books
+
+    def get(self, bookId: int) -> Optional[dict]:
+        books = self._rows("WHERE books.id = ?", (bookId,), 1)
+        return books[0] if books else None
+
+    def cover(self, bookId: int) -> Optional[bytes]:
+        row = self._execute("SELECT cover FROM books WHERE id = ?", (bookId,)).fetchone()
+        return row[0] if row else None
+
+
+library = Library()
@@ -0,0 +1,57 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    A thread safe least recently used cache bounded by the total size of its values.
+    """
+
+    def __init__(self, maxBytes: int, sizeof: Callable[[Any], int] = sys.getsizeof) -> None:
+        self.maxBytes = maxBytes
+        self.sizeof = sizeof
+        self.currentBytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.currentBytes -= self._items.pop(key)[1]
+            if size > self.maxBytes:
+                return
+            self._items[key] = (value, size)
+            self.currentBytes += size
+            while self.currentBytes > self.maxBytes:
+                _, (_, evictedSize) = self._items.popitem(last=False)
+                self.currentBytes -= evictedSize
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            value, size = self._items.pop(key)
+            self.currentBytes -= size
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.currentBytes = 0
@@ -0,0 +1,115 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+
+class Histogram:
+    """
+    The durations of the last window measurements of a stage, in seconds.
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, duration: float) -> None:
+        self.samples.append(duration)
+        self.count += 1
+        self.total += duration
+
+    def summary(self) -> dict:
+        """
+        Returns the count and the p50, p95, p99 and max of the window, in milliseconds.
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": self.count}
+
+        def at(percent: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * percent / 100))] * 1000, 3)
+
+        return {"count": self.count, "p50": at(50), "p95": at(95), "p99": at(99),
+                "max": round(samples[-1] * 1000, 3)}
+
+
+class Metrics:
+    """
+    Timers of the hot paths: rolling histograms per stage, and a bounded buffer of the latest spans
+    that can be dumped as a Chrome trace (chrome://tracing or Perfetto).
+    """
+
+    def __init__(self, window: int = 1024, traceEvents: int = 100000) -> None:
+        self.window = window
+        self.histograms: Dict[str, Histogram] = {}
+        self.events = deque(maxlen=traceEvents)
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, start: float, end: Optional[float] = None) -> None:
+        """
+        Records a span of stage name between two time.perf_counter() readings.
+        """
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.window)
+            histogram.add(end - start)
+            self.events.append((name, start, end, threading.get_ident()))
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def timed(self, name: str) -> Callable:
+        """
+        Decorates a function to record each of its calls as a span of stage name.
+        """
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, start)
+            return wrapper
+        return decorator
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.events.clear()
+
+    def dumpTrace(self, tracePath: str) -> int:
+        """
+        Writes the buffered spans to tracePath in the Chrome trace event format, returns how many were written.
+        """
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        traceEvents = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                        "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+                       for name, start, end, tid in events]
+        tempPath = f"{tracePath}.{pid}.tmp"
+        with open(tempPath, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": traceEvents, "displayTimeUnit": "ms"}, f)
+        os.replace(tempPath, tracePath)
+        return len(traceEvents)
+
+
+metrics = Metrics()
@@ -0,0 +1,64 @@
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
+
+from .epubparser import EpubParser
+from .opfparser import NavPoint
+
+
+class NavIndex:
+    """
+    Positions across the whole book: cumulative character offsets of the pages in reading order,
+    a href to page index map and the anchors of the toc entries.
+    Without the pages' texts, the uncompressed sizes of the chapters stand in for their lengths.
+    """
+
+    def __init__(self, pagesPath: List[str], lengths: List[int], toc: List[NavPoint], exact: bool) -> None:
+        self.offsets = list(accumulate(lengths, initial=0))
+        self.exact = exact
+        self.hrefIndex: Dict[str, int] = {pagePath: index for index, pagePath in enumerate(pagesPath)}
+        self.anchors: Dict[str, Tuple[int, str]] = {}
+
+        stack = list(toc)
+        while stack:
+            item = stack.pop()
+            pagePath, _, fragment = item.url.partition('#')
+            if pagePath in self.hrefIndex:
+                self.anchors[item.url] = (self.hrefIndex[pagePath], fragment)
+            stack.extend(item.children)
+
+    @classmethod
+    def build(cls, epubParser: EpubParser, texts: Optional[List[str]] = None) -> 'NavIndex':
+        if texts is not None:
+            lengths = [len(text) for text in texts]
+        else:
+            lengths = [epubParser.fileSize(pagePath) for pagePath in epubParser.pagesPath]
+        return cls(epubParser.pagesPath, lengths, epubParser.toc, texts is not None)
+
+    @property
+    def total(self) -> int:
+        return self.offsets[-1]
+
+    def percentage(self, pageIndex: int, fraction: float = 0.0) -> float:
+        if not self.total:
+            return 0.0
+        length = self.offsets[pageIndex + 1] - self.offsets[pageIndex]
+        return 100 * (self.offsets[pageIndex] + fraction * length) / self.total
+
+    def locate(self, percentage: float) -> Tuple[int, float]:
+        """
+        Returns the page index and the fraction inside that page of a percentage of the book.
+        """
+        position = min(max(percentage, 0.0), 100.0) / 100 * self.total
+        pageIndex = min(bisect_right(self.offsets, position) - 1, len(self.offsets) - 2)
+        length = self.offsets[pageIndex + 1] - self.offsets[pageIndex]
+        return pageIndex, (position - self.offsets[pageIndex]) / length if length else 0.0
+
+    def resolve(self, url: str) -> Tuple[Optional[int], str]:
+        """
+        Returns the page index and fragment a toc url points to.
+        """
+        if url in self.anchors:
+            return self.anchors[url]
+        pagePath, _, fragment = url.partition('#')
+        return self.hrefIndex.get(pagePath), fragment
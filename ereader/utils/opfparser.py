@@ -0,0 +1,193 @@
+import io
+import posixpath
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+from xml.etree.ElementTree import iterparse
+
+DC = '{http://purl.org/dc/elements/1.1/}'
+EPUB = '{http://www.idpf.org/2007/ops}'
+
+
+def localName(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def resolveHref(base: str, href: str) -> str:
+    """
+    Resolves a href relative to the file at base into a path inside the archive.
+    """
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), unquote(href)))
+
+
+class ManifestItem:
+    __slots__ = ('id', 'path', 'mediaType', 'properties')
+
+    def __init__(self, id: str, path: str, mediaType: str, properties: str) -> None:
+        self.id = id
+        self.path = path
+        self.mediaType = mediaType
+        self.properties = properties
+
+
+class SpineItem:
+    __slots__ = ('idref', 'linear')
+
+    def __init__(self, idref: str, linear: bool) -> None:
+        self.idref = idref
+        self.linear = linear
+
+
+class NavPoint:
+    __slots__ = ('text', 'url', 'children')
+
+    def __init__(self, text: str = '', url: str = '') -> None:
+        self.text = text
+        self.url = url
+        self.children: List['NavPoint'] = []
+
+    def toDict(self) -> dict:
+        item = {'text': self.text, 'url': self.url}
+        if self.children:
+            item['subitems'] = [child.toDict() for child in self.children]
+        return item
+
+
+class Package:
+    """
+    What the OPF of a book declares: metadata, manifest, spine and the toc documents.
+    """
+
+    __slots__ = ('metadata', 'manifest', 'spine', 'ncx', 'nav', 'coverId')
+
+    def __init__(self) -> None:
+        self.metadata: Dict[str, object] = {}
+        self.manifest: Dict[str, ManifestItem] = {}
+        self.spine: List[SpineItem] = []
+        self.ncx: Optional[str] = None
+        self.nav: Optional[str] = None
+        self.coverId: Optional[str] = None
+
+    def spinePaths(self) -> List[str]:
+        return [self.manifest[item.idref].path for item in self.spine if item.idref in self.manifest]
+
+    def cover(self) -> Optional[ManifestItem]:
+        for item in self.manifest.values():
+            if 'cover-image' in item.properties.split():
+                return item
+        return self.manifest.get(self.coverId)
+
+
+def parseContainer(data: bytes) -> str:
+    """
+    Returns the path of the first rootfile listed in META-INF/container.xml.
+    """
+    for _, element in iterparse(io.BytesIO(data)):
+        if localName(element.tag) == 'rootfile':
+            return element.get('full-path')
+    raise KeyError('rootfile')
+
+
+def parseOpf(data: bytes, opfPath: str) -> Package:
+    """
+    Parses the OPF in a single pass, clearing every element once it is read.
+    """
+    package = Package()
+    ncxId = None
+    for _, element in iterparse(io.BytesIO(data)):
+        tag = element.tag
+        if tag.startswith(DC):
+            key = 'dc:' + tag[len(DC):]
+            value = (element.text or '').strip()
+            if key in package.metadata:
+                previous = package.metadata[key]
+                package.metadata[key] = (previous if isinstance(previous, list) else [previous]) + [value]
+            else:
+                package.metadata[key] = value
+        else:
+            name = localName(tag)
+            if name == 'item':
+                item = ManifestItem(element.get('id'), resolveHref(opfPath, element.get('href', '')),
+                                    element.get('media-type', ''), element.get('properties', ''))
+                package.manifest[item.id] = item
+                if 'nav' in item.properties.split():
+                    package.nav = item.path
+            elif name == 'itemref':
+                package.spine.append(SpineItem(element.get('idref'), element.get('linear', 'yes') != 'no'))
+            elif name == 'spine':
+                ncxId = element.get('toc')
+            elif name == 'meta' and element.get('name') == 'cover':
+                package.coverId = element.get('content')
+            else:
+                continue
+        element.clear()
+
+    ncx = package.manifest.get(ncxId) if ncxId else None
+    if ncx is None:
+        ncx = next((item for item in package.manifest.values()
+                    if item.mediaType == 'application/x-dtbncx+xml'), None)
+    package.ncx = ncx.path if ncx else None
+    return package
+
+
+def _url(base: str, src: str) -> str:
+    path, _, fragment = src.partition('#')
+    url = resolveHref(base, path) if path else base
+    return f'{url}#{fragment}' if fragment else url
+
+
+def parseNcx(data: bytes, ncxPath: str) -> List[NavPoint]:
+    """
+    Builds the nav point tree of a toc.ncx with an explicit stack, however deep it nests.
+    """
+    toc: List[NavPoint] = []
+    stack: List[NavPoint] = []
+    for event, element in iterparse(io.BytesIO(data), events=('start', 'end')):
+        name = localName(element.tag)
+        if event == 'start':
+            if name == 'navPoint':
+                navPoint = NavPoint()
+                (stack[-1].children if stack else toc).append(navPoint)
+                stack.append(navPoint)
+            elif name == 'content' and stack:
+                stack[-1].url = _url(ncxPath, element.get('src', ''))
+            continue
+        if name == 'text' and stack and not stack[-1].text:
+            stack[-1].text = (element.text or '').strip()
+        elif name == 'navPoint':
+            stack.pop()
+            element.clear()
+        elif name == 'navMap':
+            break
+    return toc
+
+
+def parseNav(data: bytes, navPath: str) -> List[NavPoint]:
+    """
+    Builds the nav point tree of the toc nav of an EPUB3 navigation document.
+    """
+    toc: List[NavPoint] = []
+    stack: List[NavPoint] = []
+    inToc = False
+    for event, element in iterparse(io.BytesIO(data), events=('start', 'end')):
+        name = localName(element.tag)
+        if name == 'nav':
+            if event == 'start':
+                inToc = element.get(f'{EPUB}type') == 'toc' or (element.get('role') == 'doc-toc')
+            elif inToc:
+                break
+            continue
+        if not inToc:
+            continue
+        if event == 'start':
+            if name == 'li':
+                navPoint = NavPoint()
+                (stack[-1].children if stack else toc).append(navPoint)
+                stack.append(navPoint)
+            elif name == 'a' and stack:
+                stack[-1].url = _url(navPath, element.get('href', '')) if element.get('href') else ''
+        elif name in ('a', 'span') and stack and not stack[-1].text:
+            stack[-1].text = ' '.join(''.join(element.itertext()).split())
+        elif name == 'li':
+            stack.pop()
+            element.clear()
+    return toc
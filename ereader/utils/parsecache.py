@@ -0,0 +1,48 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+from .diskcache import DiskCache
+
+
+class ParseCache(DiskCache):
+    """
+    A disk cache of parsed book structures.
+    Entries are keyed by the book's path and validated against its size, mtime and content hash,
+    the directory is kept under maxBytes by evicting the least recently used entries.
+    """
+
+    VERSION = 2
+
+    def __init__(self, directory: Optional[Path] = None, maxBytes: int = 64 * 1024 * 1024) -> None:
+        super().__init__("parse", ".cache", maxBytes, directory)
+
+    def entryPath(self, epubPath: str) -> Path:
+        key = hashlib.sha1(str(Path(epubPath).resolve()).encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.cache"
+
+    def load(self, epubPath: str, contentHash: str) -> Optional[dict]:
+        """
+        Returns the cached structures of the book, or None if there are none or the book has changed.
+        """
+        entryPath = self.entryPath(epubPath)
+        entry = self.loadEntry(entryPath)
+        if entry is None:
+            return None
+
+        stat = os.stat(epubPath)
+        if entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns or entry["hash"] != contentHash:
+            entryPath.unlink(missing_ok=True)
+            return None
+        self.touch(entryPath)
+        return entry["data"]
+
+    def save(self, epubPath: str, contentHash: str, data: dict) -> None:
+        stat = os.stat(epubPath)
+        self.saveEntry(self.entryPath(epubPath), {"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                                                  "hash": contentHash, "data": data})
+        self.evict()
+
+
+parseCache = ParseCache()
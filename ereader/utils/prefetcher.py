@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Dict
+
+from .epubparser import EpubParser
+from .metrics import metrics
+from .workers import threadPool
+
+
+class Prefetcher:
+    """
+    Renders the chapters around the displayed one on the worker pool,
+    so turning the page only hands ready html to the web view.
+    """
+
+    def __init__(self, epubParser: EpubParser, ahead: int = 3, behind: int = 1) -> None:
+        self.epubParser = epubParser
+        self.ahead = ahead
+        self.behind = behind
+        self._futures: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def neighbours(self, index: int, direction: int) -> list:
+        """
+        Returns the chapters worth preparing after displaying index, nearest first.
+        """
+        if direction > 0:
+            wanted = [index + i for i in range(1, self.ahead + 1)] + [index - i for i in range(1, self.behind + 1)]
+        elif direction < 0:
+            wanted = [index - i for i in range(1, self.ahead + 1)] + [index + i for i in range(1, self.behind + 1)]
+        else:
+            wanted = [index + 1, index - 1]
+        return [i for i in wanted if 0 <= i < len(self.epubParser.pagesPath)]
+
+    def schedule(self, index: int, direction: int = 0) -> None:
+        """
+        Prepares the neighbours of index, dropping work queued for chapters no longer wanted.
+        """
+        wanted = self.neighbours(index, direction)
+        with self._lock:
+            for i in list(self._futures):
+                if i not in wanted or self._futures[i].done():
+                    self._futures.pop(i).cancel()
+            for i in wanted:
+                pagePath = self.epubParser.pagesPath[i]
+                if i not in self._futures and pagePath not in self.epubParser.renderCache:
+                    self._futures[i] = threadPool().submit(self.epubParser.getPageHtml, pagePath)
+
+    def cancel(self) -> None:
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    @metrics.timed('page.render')
+    def pageHtml(self, index: int) -> str:
+        """
+        Returns the rendered html of index, waiting for a prefetch of it that is already running.
+        Timed here rather than in the parser, so the prefetches and the indexing on the worker pool
+        do not count as the wait of the page shown.
+        """
+        with self._lock:
+            future = self._futures.pop(index, None)
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass
+        return self.epubParser.getPageHtml(self.epubParser.pagesPath[index])
@@ -0,0 +1,46 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+from .diskcache import DiskCache
+
+
+class RestoreCache(DiskCache):
+    """
+    The rendered html of the page the reader was closed on, so the next start can show it
+    before the book is opened. Only the last book is kept, validated against its size and mtime.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        super().__init__("restore", ".cache", None, directory)
+
+    @property
+    def entryPath(self) -> Path:
+        return self.directory / "last.cache"
+
+    def load(self, epubPath: str) -> Optional[dict]:
+        """
+        Returns the snapshot of the book, or None if the last snapshot is of another book or the book has changed.
+        """
+        entry = self.loadEntry(self.entryPath)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(epubPath)
+        except OSError:
+            return None
+        if (entry["epubPath"] != str(Path(epubPath).resolve()) or
+                entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns):
+            return None
+        return entry
+
+    def save(self, epubPath: str, bookId: str, pageIndex: int, pageUrl: str, html: str, readProgress: dict) -> None:
+        stat = os.stat(epubPath)
+        self.saveEntry(self.entryPath, {"epubPath": str(Path(epubPath).resolve()), "size": stat.st_size,
+                                        "mtime": stat.st_mtime_ns, "bookId": bookId, "pageIndex": pageIndex,
+                                        "pageUrl": pageUrl, "html": html, "readProgress": readProgress}, 1)
+
+
+restoreCache = RestoreCache()
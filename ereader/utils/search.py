@@ -0,0 +1,123 @@
+import os
+import re
+import shlex
+import threading
+import zipfile
+from concurrent.futures import TimeoutError
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from .functions import htmlToText
+from .workers import processPool
+
+CONTEXT = 40
+
+_cjk = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+# every CJK character is a token of its own, everything else is split into words
+_token = re.compile(f'[{_cjk}]|[^\\W_{_cjk}]+')
+
+
+class SearchHit(NamedTuple):
+    pageIndex: int
+    context: str
+    start: int
+    end: int
+
+
+# the archive a worker process has open, with the size and mtime of the file it was opened from
+_archive: Optional[Tuple[str, int, float, zipfile.ZipFile]] = None
+
+
+def _openArchive(epubPath: str) -> zipfile.ZipFile:
+    """
+    Returns the archive of the book, reusing the one opened for the previous chapter if the file did not change.
+    """
+    global _archive
+    stat = os.stat(epubPath)
+    if _archive is not None and _archive[:3] == (epubPath, stat.st_size, stat.st_mtime):
+        return _archive[3]
+    if _archive is not None:
+        _archive[3].close()
+    _archive = (epubPath, stat.st_size, stat.st_mtime, zipfile.ZipFile(epubPath, 'r'))
+    return _archive[3]
+
+
+def _searchChapter(epubPath: str, pageIndex: int, pagePath: str, query: str) -> List[SearchHit]:
+    """
+    Runs in a worker process, the archive stays open for the following chapters of the book.
+    """
+    # the same text the search index holds, so both paths find the same hits
+    text = htmlToText(_openArchive(epubPath).read(pagePath).decode('utf-8'), '\n')
+    return list(findAll(text, query, pageIndex))
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    return [(match.group().lower(), match.start(), match.end()) for match in _token.finditer(text)]
+
+
+def parseQuery(query: str) -> List[List[str]]:
+    """
+    Splits a query into the phrases a page must all contain, each a list of lowercased terms.
+    Whitespace separated parts are phrases of one word, quoted parts and runs of CJK characters
+    are phrases of their words; punctuation is not searchable.
+    """
+    try:
+        parts = shlex.split(query)
+    except ValueError:
+        parts = query.split()
+    phrases = [[term for term, _, _ in tokenize(part)] for part in parts]
+    return [phrase for phrase in phrases if phrase]
+
+
+def hitAt(text: str, pageIndex: int, start: int, end: int) -> SearchHit:
+    begin = max(0, start - CONTEXT)
+    return SearchHit(pageIndex, text[begin:end + CONTEXT], start - begin, end - begin)
+
+
+def findAll(text: str, query: str, pageIndex: int) -> Iterator[SearchHit]:
+    """
+    Yields the hits of query in the text of a page, in the order they appear, matching it as the search index does.
+    """
+    phrases = parseQuery(query)
+    if not phrases:
+        return
+    tokens = tokenize(text)
+    terms = [term for term, _, _ in tokens]
+    spans = set()
+    for phrase in phrases:
+        length = len(phrase)
+        found = [i for i in range(len(terms) - length + 1)
+                 if terms[i] == phrase[0] and terms[i:i + length] == phrase]
+        if not found:
+            return
+        spans.update((tokens[i][1], tokens[i + length - 1][2]) for i in found)
+    for start, end in sorted(spans):
+        yield hitAt(text, pageIndex, start, end)
+
+
+def searchBook(epubPath: str, pagesPath: List[str], query: str, limit: Optional[int] = None,
+               cancelEvent: Optional[threading.Event] = None) -> Iterator[SearchHit]:
+    """
+    Searches every chapter on the process pool, yielding hits in spine order as soon as they are known.
+    Stops after limit hits or once cancelEvent is set, dropping the chapters not searched yet.
+    """
+    futures = [processPool().submit(_searchChapter, epubPath, pageIndex, pagePath, query)
+               for pageIndex, pagePath in enumerate(pagesPath)]
+    found = 0
+    try:
+        for future in futures:
+            while True:
+                if cancelEvent is not None and cancelEvent.is_set():
+                    return
+                try:
+                    hits = future.result(timeout=0.1)
+                    break
+                except TimeoutError:
+                    continue
+            for hit in hits:
+                yield hit
+                found += 1
+                if limit and found >= limit:
+                    return
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,145 @@
+import sys
+from array import array
+from collections import defaultdict
+from concurrent.futures import CancelledError
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .diskcache import DiskCache
+from .epubparser import EpubParser
+from .functions import htmlToText
+from .metrics import metrics
+from .search import SearchHit, hitAt, parseQuery, tokenize
+
+
+class IndexCache(DiskCache):
+    """
+    The search indexes of the books, keyed by their content hash, the directory is kept under maxBytes
+    by evicting the least recently used.
+    """
+
+    # 2: pages in spine order
+    VERSION = 2
+
+    def __init__(self, directory: Optional[Path] = None, maxBytes: int = 256 * 1024 * 1024) -> None:
+        super().__init__("index", ".idx", maxBytes, directory)
+
+    def entryPath(self, contentHash: str) -> Path:
+        return self.directory / f"{contentHash}.idx"
+
+
+indexCache = IndexCache()
+
+
+class SearchIndex:
+    """
+    A positional inverted index of a book's text.
+    Terms map to the ordinals of their tokens in each page, so phrases are runs of consecutive ordinals;
+    the character span of every token is kept to locate hits in the stored page text.
+    Indexes are saved in indexCache by the book's content hash.
+    """
+
+    def __init__(self, texts: List[str], postings: Dict[str, Dict[int, array]],
+                 starts: List[array], ends: List[array]) -> None:
+        self.texts = texts
+        self.postings = postings
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    @metrics.timed('search.buildIndex')
+    def build(cls, epubParser: EpubParser) -> 'SearchIndex':
+        """
+        Indexes every page of the book, raises CancelledError if the book is being closed.
+        """
+        texts, starts, ends = [], [], []
+        postings = defaultdict(lambda: defaultdict(lambda: array('I')))
+        for pageIndex, pagePath in enumerate(epubParser.pagesPath):
+            if epubParser.closing.is_set():
+                raise CancelledError
+            text = htmlToText(epubParser.getPageHtml(pagePath, withCss=False), '\n')
+            pageStarts, pageEnds = array('I'), array('I')
+            for ordinal, (term, start, end) in enumerate(tokenize(text)):
+                postings[term][pageIndex].append(ordinal)
+                pageStarts.append(start)
+                pageEnds.append(end)
+            texts.append(text)
+            starts.append(pageStarts)
+            ends.append(pageEnds)
+        return cls(texts, {term: dict(pages) for term, pages in postings.items()}, starts, ends)
+
+    def memoryBytes(self) -> int:
+        """
+        Estimates the memory held by the texts and postings.
+        """
+        arrays = [*self.starts, *self.ends, *(positions for pages in self.postings.values()
+                                             for positions in pages.values())]
+        return (sum(sys.getsizeof(text) for text in self.texts) + sum(a.itemsize * len(a) + 64 for a in arrays) +
+                200 * len(self.postings))
+
+    @classmethod
+    def load(cls, contentHash: str) -> Optional['SearchIndex']:
+        indexPath = indexCache.entryPath(contentHash)
+        state = indexCache.loadEntry(indexPath)
+        if state is None:
+            return None
+        indexCache.touch(indexPath)
+        return cls(state["texts"], state["postings"], state["starts"], state["ends"])
+
+    def save(self, contentHash: str) -> None:
+        indexCache.saveEntry(indexCache.entryPath(contentHash), {"texts": self.texts, "postings": self.postings,
+                                                                 "starts": self.starts, "ends": self.ends}, 1)
+        indexCache.evict()
+
+    @classmethod
+    def forBook(cls, epubParser: EpubParser) -> 'SearchIndex':
+        """
+        Loads the index of the book from disk, building and saving it the first time.
+        """
+        index = cls.load(epubParser.contentHash)
+        if index is None:
+            index = cls.build(epubParser)
+            index.save(epubParser.contentHash)
+        return index
+
+    def _phraseHits(self, terms: List[str]) -> Dict[int, List[int]]:
+        """
+        Returns the ordinals at which the terms occur consecutively, by page.
+        """
+        termPostings = [self.postings.get(term) for term in terms]
+        if not all(termPostings):
+            return {}
+        pages = set.intersection(*(set(pages) for pages in termPostings))
+        hits = {}
+        for page in pages:
+            # start from the rarest term and check its neighbours
+            rarest = min(range(len(terms)), key=lambda i: len(termPostings[i][page]))
+            others = [(i - rarest, set(termPostings[i][page])) for i in range(len(terms)) if i != rarest]
+            found = [ordinal - rarest for ordinal in termPostings[rarest][page]
+                     if all(ordinal + shift in ordinals for shift, ordinals in others)]
+            if found:
+                hits[page] = found
+        return hits
+
+    def search(self, query: str) -> List[Tuple[int, int, int]]:
+        """
+        Returns (pageIndex, start, end) of every match of the query, in reading order.
+        Whitespace separated parts must all occur in a page, quoted parts are matched as phrases,
+        and a run of CJK characters is always a phrase.
+        """
+        phrases = parseQuery(query)
+        if not phrases:
+            return []
+
+        partHits = [(len(phrase), self._phraseHits(phrase)) for phrase in phrases]
+        pages = set.intersection(*(set(hits) for _, hits in partHits))
+        results = []
+        for page in pages:
+            for length, hits in partHits:
+                for ordinal in hits[page]:
+                    results.append((page, self.starts[page][ordinal], self.ends[page][ordinal + length - 1]))
+        return sorted(set(results))
+
+    def hits(self, query: str) -> Iterator[SearchHit]:
+        for pageIndex, start, end in self.search(query):
+            yield hitAt(self.texts[pageIndex], pageIndex, start, end)
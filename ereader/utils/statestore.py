@@ -0,0 +1,145 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+
+def bookKey(epubPath: str) -> str:
+    return str(Path(epubPath).resolve())
+
+
+class StateStore(MutableMapping):
+    """
+    The reader's persistent state in a SQLite database in WAL mode.
+    Every write touches only its own rows, so progress can be checkpointed often and a crash
+    loses at most the write in flight. The database is opened on first use.
+    Besides the plain key/value mapping it keeps per-book progress, bookmarks and settings.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS progress (book TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS bookmarks (id INTEGER PRIMARY KEY AUTOINCREMENT, book TEXT NOT NULL,
+                                              value TEXT NOT NULL, note TEXT NOT NULL, created REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS bookmarksBook ON bookmarks (book);
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS highlights (id INTEGER PRIMARY KEY AUTOINCREMENT, book TEXT NOT NULL,
+                                               page INTEGER NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL,
+                                               text TEXT NOT NULL, note TEXT NOT NULL, color TEXT NOT NULL,
+                                               created REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS highlightsBook ON highlights (book, page, start);
+    """
+
+    def __init__(self, filename: str, legacyFilename: Optional[str] = None) -> None:
+        self.filename = filename
+        self.legacyFilename = legacyFilename
+        self._connection = None
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._connection is None:
+                connection = sqlite3.connect(self.filename, isolation_level=None, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                connection.executescript(self.SCHEMA)
+                self._connection = connection
+                self._migrateLegacy()
+            return self._connection
+
+    def execute(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self.connection.execute(sql, parameters)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Groups the writes of the block into one transaction, other threads wait for it.
+        """
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def _migrateLegacy(self) -> None:
+        """
+        Imports the pickled dict older versions saved, once.
+        """
+        if not self.legacyFilename or not os.path.exists(self.legacyFilename) or "migrated" in self:
+            return
+        try:
+            with open(self.legacyFilename, "rb") as f:
+                legacy = pickle.load(f)
+        except Exception:
+            legacy = {}
+        if epubPath := legacy.get("currentEpubPath"):
+            self["currentEpubPath"] = epubPath
+            if legacy.get("currentReadProgress"):
+                self.setProgress(epubPath, legacy["currentReadProgress"])
+        self["migrated"] = True
+
+    def __getitem__(self, key: str) -> Any:
+        row = self.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def __delitem__(self, key: str) -> None:
+        if self.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self.execute("SELECT key FROM kv")])
+
+    def __len__(self) -> int:
+        return self.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+
+    def progress(self, epubPath: str) -> dict:
+        row = self.execute("SELECT value FROM progress WHERE book = ?", (bookKey(epubPath),)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def setProgress(self, epubPath: str, progress: dict) -> None:
+        self.execute("INSERT OR REPLACE INTO progress (book, value, updated) VALUES (?, ?, ?)",
+                      (bookKey(epubPath), json.dumps(progress), time.time()))
+
+    def bookmarks(self, epubPath: str) -> List[dict]:
+        rows = self.execute("SELECT id, value, note, created FROM bookmarks WHERE book = ? ORDER BY id",
+                             (bookKey(epubPath),)).fetchall()
+        return [{"id": id, "progress": json.loads(value), "note": note, "created": created}
+                for id, value, note, created in rows]
+
+    def addBookmark(self, epubPath: str, progress: dict, note: str = "") -> int:
+        return self.execute("INSERT INTO bookmarks (book, value, note, created) VALUES (?, ?, ?, ?)",
+                             (bookKey(epubPath), json.dumps(progress), note, time.time())).lastrowid
+
+    def removeBookmark(self, bookmarkId: int) -> None:
+        self.execute("DELETE FROM bookmarks WHERE id = ?", (bookmarkId,))
+
+    def settings(self) -> dict:
+        return {key: json.loads(value) for key, value in self.execute("SELECT key, value FROM settings")}
+
+    def setSetting(self, key: str, value: Any) -> None:
+        self.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+data = StateStore(os.path.expanduser("~//.ereader.db"), os.path.expanduser("~//.ereader"))
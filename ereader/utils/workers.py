@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_threadPool = None
+_processPool = None
+_maxWorkers = None
+
+
+def setMaxWorkers(maxWorkers: int) -> None:
+    """
+    Bounds both pools, before they are first used, so all open books together stay within maxWorkers cpus.
+    """
+    global _maxWorkers
+    _maxWorkers = max(1, maxWorkers)
+
+
+def threadPool() -> ThreadPoolExecutor:
+    """
+    Returns the worker thread pool shared by background work of the reader.
+    """
+    global _threadPool
+    if _threadPool is None:
+        _threadPool = ThreadPoolExecutor(max_workers=_maxWorkers or min(4, os.cpu_count() or 1),
+                                         thread_name_prefix="ereader")
+    return _threadPool
+
+
+def processPool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used for cpu bound work like searching a whole book.
+    Workers are spawned rather than forked, the gui process runs Qt threads.
+    """
+    global _processPool
+    if _processPool is None:
+        _processPool = ProcessPoolExecutor(max_workers=_maxWorkers or os.cpu_count() or 1,
+                                           mp_context=multiprocessing.get_context("spawn"))
+    return _processPool
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# the state database and the caches are module singletons placed under the home and cache directories on import
+_home = tempfile.mkdtemp(prefix="ereader-tests-")
+os.environ["HOME"] = _home
+os.environ["EREADER_CACHE_DIR"] = os.path.join(_home, "cache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ereader.benchmark import generateEpub  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def epubPath(tmp_path_factory) -> str:
+    return generateEpub(str(tmp_path_factory.mktemp("books") / "book.epub"), chapters=6, chapterChars=3000)
+
+
+@pytest.fixture(scope="session")
+def cjkEpubPath(tmp_path_factory) -> str:
+    return generateEpub(str(tmp_path_factory.mktemp("books") / "cjk.epub"), chapters=3, chapterChars=2000,
+                        language="cjk")
+
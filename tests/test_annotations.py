@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from ereader.utils import Annotations, Highlight, IntervalIndex, StateStore, segments
+
+
+def highlight(id, start, end, color="yellow", created=0.0):
+    return Highlight(id, 0, start, end, "", "", color, created)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def test_overlapping():
+    index = IntervalIndex()
+    for item in [highlight(1, 0, 100), highlight(2, 10, 20), highlight(3, 30, 40), highlight(4, 50, 60)]:
+        index.add(item)
+    assert [item.id for item in index.overlapping(15, 35)] == [1, 2, 3]
+    assert [item.id for item in index.overlapping(20, 30)] == [1]
+    assert [item.id for item in index.overlapping(100, 200)] == []
+    assert index.remove(1)
+    assert [item.id for item in index.overlapping(20, 30)] == []
+    assert [item.id for item in index.overlapping(0, 100)] == [2, 3, 4]
+
+
+def test_overlapping_matches_a_scan():
+    index = IntervalIndex()
+    items = [highlight(i, (i * 37) % 200, (i * 37) % 200 + 1 + (i * 11) % 50) for i in range(60)]
+    for item in items:
+        index.add(item)
+    for start in range(0, 260, 7):
+        for end in range(start + 1, 260, 13):
+            expected = {item.id for item in items if item.start < end and item.end > start}
+            assert {item.id for item in index.overlapping(start, end)} == expected
+
+
+def test_segments_latest_color_wins():
+    assert segments([highlight(1, 0, 10, "yellow", 1.0), highlight(2, 5, 15, "green", 2.0)]) == [
+        [0, 5, [1], "yellow"], [5, 10, [1, 2], "green"], [10, 15, [2], "green"]]
+    assert segments([highlight(1, 0, 5), highlight(2, 8, 9)]) == [[0, 5, [1], "yellow"], [8, 9, [2], "yellow"]]
+
+
+def test_annotations(store, tmp_path):
+    annotations = Annotations(store)
+    epubPath = str(tmp_path / "book.epub")
+    first = annotations.add(epubPath, 1, 10, 20, "lighthouse", "a note")
+    second = annotations.add(epubPath, 1, 15, 30, "keeper")
+    annotations.add(epubPath, 2, 0, 5, "other")
+    assert [item.id for item in annotations.chapter(epubPath, 1, 18, 19)] == [first.id, second.id]
+    annotations.annotate(epubPath, second.id, "found")
+    assert [(book, item.text) for book, item in annotations.search("found")] == [(epubPath, "keeper")]
+    annotations.remove(epubPath, first.id)
+    # a fresh instance reads them back from the database
+    assert [item.text for item in Annotations(store).all(epubPath)] == ["keeper", "other"]
+    with pytest.raises(ValueError):
+        annotations.add(epubPath, 1, 5, 5, "")
+
+
+def test_first_use_from_several_threads(store, tmp_path):
+    annotations = Annotations(store)
+    epubPath = str(tmp_path / "book.epub")
+    threads = [threading.Thread(target=annotations.add, args=(epubPath, i % 3, 0, 5, "text")) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(annotations.all(epubPath)) == 8
@@ -0,0 +1,23 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+def runCli(*argv) -> str:
+    # a process of its own, the benchmark moves the caches of the process to a temporary directory
+    return subprocess.run([sys.executable, "-c", "from ereader.main import main; main()", "benchmark", *argv],
+                          cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True,
+                          check=True).stdout
+
+
+def test_results_are_printed_once_as_json(tmp_path):
+    output = runCli("run", "--chapters=3", "--chapterChars=500", "--repeat=1")
+    results = json.loads(output)
+    assert results["shape"]["chapters"] == 3 and "search.index" in results["results"]
+
+    resultsPath = tmp_path / "results.json"
+    resultsPath.write_text(output)
+    comparison = runCli("compare", str(resultsPath), str(resultsPath))
+    assert comparison.splitlines()[0].split() == ["stage", "baseline", "ms", "current", "ms", "ratio"]
+    assert "slower" not in comparison
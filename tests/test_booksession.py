@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from ereader.benchmark import generateEpub
+from ereader.utils import BookSession, EpubParser, SearchIndex
+from ereader.utils.workers import threadPool
+
+
+@pytest.fixture(scope="module")
+def books(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("session")
+    return [generateEpub(str(directory / f"book{seed}.epub"), chapters=20, chapterChars=4000, seed=seed)
+            for seed in range(3)]
+
+
+def test_memory_counts_the_parsed_structures(books):
+    epubParser = EpubParser(books[0], useParseCache=False)
+    assert epubParser.memoryBytes() > 0
+    epubParser.getPageHtml(epubParser.pagesPath[0])
+    assert epubParser.memoryBytes() > len(epubParser.snapshot())
+    epubParser.close()
+
+
+def test_background_books_are_demoted_least_recently_used_first(books):
+    session = BookSession()
+    first = session.add(EpubParser(books[0]))
+    first.epubParser.currentPageIndex = 4
+    session.deactivate({"pageIndex": 4}, None, None)
+    second = session.add(EpubParser(books[1]))
+    session.deactivate({}, None, None)
+    third = session.add(EpubParser(books[2]))
+
+    session.maxBytes = session.memoryBytes() - 1
+    session.enforceBudget()
+    assert first.demoted and not second.demoted and not third.demoted
+
+    epubParser = session.activate(first)
+    assert epubParser.currentPageIndex == 4 and not first.demoted
+    with pytest.raises(RuntimeError):
+        session.close(first)
+    session.closeAll()
+    assert len(session) == 0
+
+
+def test_demotion_that_does_not_shrink_the_book_is_skipped(books):
+    session = BookSession(maxBytes=1)
+    book = session.add(EpubParser(books[0]))
+    session.deactivate({}, None, None)
+    # nothing rendered and a structure estimate of zero: the snapshot would be larger than the live book
+    book.epubParser._structureBytes = 0
+    assert not session.demote(book) and not book.demoted
+    session.closeAll()
+
+
+def test_closing_stops_the_index_build(books):
+    epubParser = EpubParser(books[1], useParseCache=False)
+    session = BookSession()
+    book = session.add(epubParser)
+    started = threading.Event()
+    getPageHtml = epubParser.getPageHtml
+
+    def slowPage(*args, **kwargs):
+        started.set()
+        epubParser.closing.wait(1)
+        return getPageHtml(*args, **kwargs)
+
+    epubParser.getPageHtml = slowPage
+    searchIndex = threadPool().submit(SearchIndex.build, epubParser)
+    session.deactivate({}, searchIndex, None)
+    started.wait(1)
+    session.closeAll()
+    # the build stopped after the page it was on, before the archive was closed
+    assert searchIndex.done() and searchIndex.exception().__class__.__name__ == "CancelledError"
@@ -0,0 +1,87 @@
+import os
+import time
+
+from ereader.utils import EpubParser, ImageCache, LayoutCache
+from ereader.utils.diskcache import DiskCache
+from ereader.utils.lrucache import LRUCache
+from ereader.utils.parsecache import ParseCache
+
+
+def test_lru_cache_bounded_by_size():
+    cache = LRUCache(10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    assert cache.get("a") == "xxxx"
+    cache.put("c", "xxxx")
+    # b was the least recently used
+    assert "b" not in cache and "a" in cache and cache.currentBytes == 8
+    cache.put("a", "x")
+    assert cache.currentBytes == 5
+    cache.put("big", "x" * 11)
+    assert "big" not in cache and cache.currentBytes == 5
+    assert cache.pop("a") == "x" and cache.currentBytes == 4
+    cache.clear()
+    assert len(cache) == 0 and cache.currentBytes == 0
+
+
+def test_disk_cache_entries(tmp_path):
+    cache = DiskCache("test", ".cache", directory=tmp_path)
+    path = tmp_path / "entry.cache"
+    cache.saveEntry(path, {"value": [1, 2]})
+    assert cache.loadEntry(path)["value"] == [1, 2]
+    assert list(tmp_path.glob("*.tmp")) == []
+
+    newer = DiskCache("test", ".cache", directory=tmp_path)
+    newer.VERSION = 2
+    assert newer.loadEntry(path) is None
+    path.write_bytes(b"damaged")
+    assert cache.loadEntry(path) is None
+    assert cache.loadEntry(tmp_path / "missing.cache") is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache("test", ".cache", maxBytes=250, directory=tmp_path)
+    now = time.time()
+    for age, name in enumerate(["new", "used", "old"]):
+        path = tmp_path / f"{name}.cache"
+        cache.write(path, b"x" * 100)
+        os.utime(path, (now - 100 * age, now - 100 * age))
+    cache.touch(tmp_path / "used.cache")
+    (tmp_path / "other.txt").write_bytes(b"x" * 1000)
+    assert cache.evict() == 200
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new.cache", "other.txt", "used.cache"]
+
+
+def test_layout_and_image_caches(tmp_path):
+    layoutCache = LayoutCache(tmp_path)
+    layoutCache.save("hash", "24|LXGW", {0: [0, 120]})
+    assert layoutCache.load("hash", "24|LXGW") == {0: [0, 120]}
+    assert layoutCache.load("hash", "18|LXGW") == {}
+
+    imageCache = ImageCache(tmp_path, maxBytes=150)
+    imageCache.save("hash", "a.png", 10, 10, b"a" * 100)
+    assert imageCache.load("hash", "a.png", 10, 10) == b"a" * 100
+    assert imageCache.load("hash", "a.png", 20, 20) is None
+    imageCache.save("hash", "b.png", 10, 10, b"b" * 100)
+    assert imageCache.evict() <= 150
+
+
+def test_parse_cache_is_dropped_when_the_book_changes(tmp_path, epubPath):
+    parseCache = ParseCache(tmp_path)
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    parseCache.save(epubPath, epubParser.contentHash, {"pagesPath": epubParser.pagesPath})
+    assert parseCache.load(epubPath, epubParser.contentHash) == {"pagesPath": epubParser.pagesPath}
+    assert parseCache.load(epubPath, "another hash") is None
+    assert not parseCache.entryPath(epubPath).exists()
+    epubParser.close()
+
+
+def test_snapshot_reopens_without_parsing(epubPath):
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    epubParser.currentPageIndex = 3
+    reopened = EpubParser.fromSnapshot(epubPath, epubParser.snapshot())
+    assert reopened.currentPageIndex == 3
+    assert {key: getattr(reopened, key) for key in ("pagesPath", "css_path", "meta", "mediaTypes")} == \
+           {key: getattr(epubParser, key) for key in ("pagesPath", "css_path", "meta", "mediaTypes")}
+    epubParser.close()
+    reopened.close()
@@ -0,0 +1,37 @@
+from ereader.utils import addCssToHtml, bodyOf, htmlToMarkdown, htmlToText, normalizeBlankLines, rewriteUrls
+from ereader.utils.functions import deepSizeOf
+
+
+def test_htmlToText():
+    html = "<html><head><title>t</title><style>p {}</style></head><body><p>one</p><p>two<br/>three</p></body></html>"
+    assert htmlToText(html) == "onetwothree"
+    assert htmlToText(html, "\n").split() == ["one", "two", "three"]
+
+
+def test_htmlToMarkdown_keeps_hard_line_breaks():
+    html = "<p>line one<br/>line two<br>three</p><p>next</p><h2>Title</h2><p><em>x</em> <b>y</b></p>"
+    assert htmlToMarkdown(html) == "line one  \nline two  \nthree\n\nnext\n\n## Title\n\n*x* **y**"
+
+
+def test_normalizeBlankLines():
+    assert normalizeBlankLines("  a  \n\n\n\n b\t\n") == "a\n\nb"
+    assert normalizeBlankLines("a  \nb  \n\nc", keepHardBreaks=True) == "a  \nb\n\nc"
+
+
+def test_addCssToHtml():
+    assert addCssToHtml("p {}", "<html><head></head><body/></html>", "id") == \
+           '<html><head><style id="id">p {}</style></head><body/></html>'
+    assert addCssToHtml("p {}", "<html><body/></html>") == "<html><head><style>p {}</style></head><body/></html>"
+
+
+def test_rewriteUrls():
+    html = '<img src="../a.png"/><a href="#n">n</a><a href="http://x/y">y</a><a href=\'b.xhtml\'>b</a>'
+    assert bodyOf(f"<body class='c'>{html}</body>") == html
+    assert rewriteUrls(html, lambda url: f"[{url}]") == \
+           '<img src="[../a.png]"/><a href="#n">n</a><a href="http://x/y">y</a><a href=\'[b.xhtml]\'>b</a>'
+
+
+def test_deepSizeOf_follows_references():
+    shared = "x" * 1000
+    assert deepSizeOf([shared, shared]) < deepSizeOf([shared, "y" * 1000])
+    assert deepSizeOf({"key": [shared]}) > 1000
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from ereader.benchmark import generateEpub
+from ereader.utils import Library, StateStore
+
+
+@pytest.fixture
+def library(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    books = tmp_path / "books"
+    (books / "nested").mkdir(parents=True)
+    for seed, directory in enumerate([books, books, books / "nested"]):
+        generateEpub(str(directory / f"book{seed}.epub"), chapters=2, chapterChars=500, seed=seed)
+    library = Library(store)
+    assert library.scan(str(books), workers=1) == (3, 0)
+    yield library
+    store.close()
+
+
+def test_scan_is_incremental(library, tmp_path):
+    books = tmp_path / "books"
+    assert library.scan(str(books), workers=1) == (0, 0)
+    os.remove(books / "nested" / "book2.epub")
+    assert library.scan(str(books), workers=1) == (0, 1)
+    assert [book["title"] for book in library.list()] == ["Benchmark 0", "Benchmark 1"]
+
+
+def test_find_prefix_then_substring(library):
+    assert [book["title"] for book in library.find("bench")] == ["Benchmark 0", "Benchmark 1", "Benchmark 2"]
+    assert [book["title"] for book in library.find("benchmark 1")] == ["Benchmark 1"]
+    assert [book["title"] for book in library.find("mark 2")] == ["Benchmark 2"]
+    assert len(library.find("mark", limit=2)) == 2
+    assert library.find("absent") == []
@@ -0,0 +1,47 @@
+import pytest
+
+from ereader.utils import EpubParser, NavIndex, NavPoint
+
+
+def navPoint(url, *children):
+    item = NavPoint(url, url)
+    item.children = list(children)
+    return item
+
+
+@pytest.fixture
+def navIndex():
+    toc = [navPoint("a.xhtml", navPoint("a.xhtml#s1")), navPoint("c.xhtml#top"), navPoint("gone.xhtml")]
+    return NavIndex(["a.xhtml", "b.xhtml", "c.xhtml"], [100, 0, 300], toc, exact=True)
+
+
+def test_locate(navIndex):
+    assert navIndex.total == 400
+    assert navIndex.locate(0) == (0, 0.0)
+    assert navIndex.locate(12.5) == (0, 0.5)
+    # the empty page is skipped, the position is at the start of the next one
+    assert navIndex.locate(25) == (2, 0.0)
+    assert navIndex.locate(100) == (2, 1.0)
+    assert navIndex.locate(150) == (2, 1.0) and navIndex.locate(-5) == (0, 0.0)
+
+
+def test_percentage_inverts_locate(navIndex):
+    for percentage in (0, 10, 24.9, 25, 60, 99.5, 100):
+        assert navIndex.percentage(*navIndex.locate(percentage)) == pytest.approx(percentage)
+
+
+def test_resolve(navIndex):
+    assert navIndex.resolve("a.xhtml#s1") == (0, "s1")
+    assert navIndex.resolve("c.xhtml#top") == (2, "top")
+    assert navIndex.resolve("b.xhtml#x") == (1, "x")
+    assert navIndex.resolve("gone.xhtml") == (None, "")
+
+
+def test_build(epubPath):
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    estimated = NavIndex.build(epubParser)
+    exact = NavIndex.build(epubParser, ["x" * 10] * len(epubParser.pagesPath))
+    assert not estimated.exact and exact.exact
+    assert exact.locate(50) == (len(epubParser.pagesPath) // 2, 0.0)
+    assert estimated.resolve(epubParser.toc[1].url) == (1, "s1-0")
+    epubParser.close()
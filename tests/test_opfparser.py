@@ -0,0 +1,114 @@
+import zipfile
+
+import pytest
+
+from ereader.utils import EpubParser, parseOpf
+from ereader.utils.opfparser import parseNav, parseNcx, resolveHref
+
+OPF = b"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>A Book</dc:title><dc:creator>One</dc:creator><dc:creator>Two</dc:creator>
+    <meta name="cover" content="cover"/>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="b" href="Text/b.xhtml" media-type="application/xhtml+xml"/>
+    <item id="a" href="Text/a%20one.xhtml" media-type="application/xhtml+xml"/>
+    <item id="toc" href="toc.ncx" media-type="application/x-dtbncx+xml"/>
+    <item id="cover" href="Images/cover.jpg" media-type="image/jpeg"/>
+  </manifest>
+  <spine toc="toc"><itemref idref="a"/><itemref idref="b" linear="no"/><itemref idref="missing"/></spine>
+</package>"""
+
+NCX = b"""<?xml version="1.0"?><ncx xmlns="http://www.daisy.org/z3986/2005/ncx/"><navMap>
+  <navPoint id="1"><navLabel><text>One</text></navLabel><content src="Text/a%20one.xhtml"/>
+    <navPoint id="2"><navLabel><text>One.1</text></navLabel><content src="Text/a%20one.xhtml#s1"/></navPoint>
+  </navPoint>
+  <navPoint id="3"><navLabel><text>Two</text></navLabel><content src="Text/b.xhtml"/></navPoint>
+</navMap></ncx>"""
+
+NAV = b"""<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<body><nav epub:type="landmarks"><ol><li><a href="Text/b.xhtml">Skipped</a></li></ol></nav>
+<nav epub:type="toc"><ol>
+  <li><a href="Text/a%20one.xhtml">One</a><ol><li><a href="Text/a%20one.xhtml#s1">One
+  .1</a></li></ol></li>
+  <li><span>Part</span><ol><li><a href="Text/b.xhtml">Two</a></li></ol></li>
+</ol></nav></body></html>"""
+
+
+def tree(toc):
+    return [item.toDict() for item in toc]
+
+
+def test_resolveHref():
+    assert resolveHref("OEBPS/content.opf", "Text/a%20one.xhtml") == "OEBPS/Text/a one.xhtml"
+    assert resolveHref("OEBPS/Text/a.xhtml", "../Images/x.png") == "OEBPS/Images/x.png"
+
+
+def test_parseOpf():
+    package = parseOpf(OPF, "OEBPS/content.opf")
+    assert package.metadata["dc:title"] == "A Book"
+    assert package.metadata["dc:creator"] == ["One", "Two"]
+    assert list(package.manifest) == ["nav", "b", "a", "toc", "cover"]
+    assert package.spinePaths() == ["OEBPS/Text/a one.xhtml", "OEBPS/Text/b.xhtml"]
+    assert [item.linear for item in package.spine] == [True, False, True]
+    assert package.nav == "OEBPS/nav.xhtml" and package.ncx == "OEBPS/toc.ncx"
+    assert package.cover().path == "OEBPS/Images/cover.jpg"
+
+
+def test_parseNcx():
+    assert tree(parseNcx(NCX, "OEBPS/toc.ncx")) == [
+        {"text": "One", "url": "OEBPS/Text/a one.xhtml",
+         "subitems": [{"text": "One.1", "url": "OEBPS/Text/a one.xhtml#s1"}]},
+        {"text": "Two", "url": "OEBPS/Text/b.xhtml"}]
+
+
+def test_parseNav():
+    assert tree(parseNav(NAV, "OEBPS/nav.xhtml")) == [
+        {"text": "One", "url": "OEBPS/Text/a one.xhtml",
+         "subitems": [{"text": "One .1", "url": "OEBPS/Text/a one.xhtml#s1"}]},
+        {"text": "Part", "url": "", "subitems": [{"text": "Two", "url": "OEBPS/Text/b.xhtml"}]}]
+
+
+def test_deep_ncx():
+    depth = 2000
+    ncx = ("<ncx><navMap>" + "".join(f'<navPoint><navLabel><text>{i}</text></navLabel><content src="c.xhtml"/>'
+                                     for i in range(depth)) + "</navPoint>" * depth + "</navMap></ncx>").encode()
+    item, levels = parseNcx(ncx, "toc.ncx")[0], 1
+    while item.children:
+        item, levels = item.children[0], levels + 1
+    assert levels == depth
+
+
+@pytest.fixture
+def reorderedEpub(tmp_path):
+    epubPath = str(tmp_path / "reordered.epub")
+    with zipfile.ZipFile(epubPath, "w") as zipFile:
+        zipFile.writestr("META-INF/container.xml",
+                         '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+                         '<rootfile full-path="OEBPS/content.opf"/></rootfiles></container>')
+        zipFile.writestr("OEBPS/content.opf", OPF)
+        zipFile.writestr("OEBPS/toc.ncx", NCX)
+        zipFile.writestr("OEBPS/nav.xhtml", NAV)
+        for name in ("a one", "b"):
+            zipFile.writestr(f"OEBPS/Text/{name}.xhtml", f"<html><body><p>{name}</p></body></html>")
+    return epubPath
+
+
+def test_pages_in_spine_order(reorderedEpub):
+    epubParser = EpubParser(reorderedEpub, useParseCache=False)
+    assert epubParser.pagesPath == ["OEBPS/Text/a one.xhtml", "OEBPS/Text/b.xhtml"]
+    assert [item.text for item in epubParser.toc] == ["One", "Two"]
+    epubParser.close()
+
+
+def test_progressPageIndex(reorderedEpub):
+    epubParser = EpubParser(reorderedEpub, useParseCache=False)
+    assert epubParser.progressPageIndex({"pagePath": "OEBPS/Text/b.xhtml", "pageIndex": 0}) == 1
+    # progress saved before the spine order counted pages in manifest order: nav, b, a one
+    assert epubParser.progressPageIndex({"pageIndex": 1}) == 1
+    assert epubParser.progressPageIndex({"pageIndex": 2}) == 0
+    assert epubParser.progressPageIndex({"pageIndex": 0}) is None
+    assert epubParser.progressPageIndex({"pageIndex": 7}) is None
+    epubParser.close()
@@ -0,0 +1,86 @@
+from array import array
+
+import pytest
+
+from ereader.utils import EpubParser, SearchIndex, findAll, searchBook
+from ereader.utils.search import parseQuery, tokenize
+
+
+@pytest.fixture(scope="module")
+def parser(epubPath):
+    epubParser = EpubParser(epubPath, useParseCache=False)
+    yield epubParser
+    epubParser.close()
+
+
+@pytest.fixture(scope="module")
+def index(parser):
+    return SearchIndex.build(parser)
+
+
+def pageIndex(text):
+    """
+    Indexes text as the only page of a book.
+    """
+    postings, starts, ends = {}, array("I"), array("I")
+    for ordinal, (term, start, end) in enumerate(tokenize(text)):
+        postings.setdefault(term, {}).setdefault(0, array("I")).append(ordinal)
+        starts.append(start)
+        ends.append(end)
+    return SearchIndex([text], postings, [starts], [ends])
+
+
+def test_tokenize_splits_words_and_cjk_characters():
+    assert [term for term, _, _ in tokenize("The Keeper's 灯塔, lit")] == ["the", "keeper", "s", "灯", "塔", "lit"]
+    assert tokenize("abc def")[1] == ("def", 4, 7)
+
+
+def test_parseQuery():
+    assert parseQuery('lighthouse "the keeper"') == [["lighthouse"], ["the", "keeper"]]
+    assert parseQuery("灯塔") == [["灯", "塔"]]
+    assert parseQuery("。 ,") == []
+    # an unbalanced quote falls back to splitting at whitespace
+    assert parseQuery('"open') == [["open"]]
+
+
+def test_phraseHits():
+    index = SearchIndex(["", ""], {}, [], [])
+    index.postings = {"the": {0: [0, 3, 7], 1: [2]}, "keeper": {0: [1, 5, 8], 1: [4]}}
+    assert index._phraseHits(["the", "keeper"]) == {0: [0, 7]}
+    assert index._phraseHits(["the", "missing"]) == {}
+
+
+def test_search_is_case_insensitive_and_whole_words():
+    text = "The keeper kept the Lighthouse. keepers"
+    index = pageIndex(text)
+    assert [text[start:end] for _, start, end in index.search("KEEPER")] == ["keeper"]
+    assert [text[start:end] for _, start, end in index.search('"the lighthouse"')] == ["the Lighthouse"]
+    # every part must be on the page
+    assert index.search("keeper absent") == []
+
+
+@pytest.mark.parametrize("query", ["keep", "Keeper", "the reader", '"the lighthouse"', "。", "lighthouse keeper"])
+def test_scan_and_index_agree(parser, index, query):
+    assert list(searchBook(parser.epubPath, parser.pagesPath, query)) == list(index.hits(query))
+
+
+def test_page_search_agrees_with_index(index):
+    for pageIndex, text in enumerate(index.texts):
+        assert list(findAll(text, "lighthouse", pageIndex)) == [hit for hit in index.hits("lighthouse")
+                                                                if hit.pageIndex == pageIndex]
+
+
+def test_cjk_search(cjkEpubPath):
+    epubParser = EpubParser(cjkEpubPath, useParseCache=False)
+    index = SearchIndex.build(epubParser)
+    word = "".join(term for term, _, _ in tokenize(index.texts[1])[20:22])
+    hits = list(index.hits(word))
+    assert hits and all(hit.context[hit.start:hit.end] == word for hit in hits)
+    assert list(searchBook(cjkEpubPath, epubParser.pagesPath, word)) == hits
+    epubParser.close()
+
+
+def test_index_roundtrip(parser, index):
+    index.save(parser.contentHash)
+    loaded = SearchIndex.load(parser.contentHash)
+    assert loaded.texts == index.texts and loaded.search("lighthouse") == index.search("lighthouse")
@@ -0,0 +1,83 @@
+import io
+import threading
+
+import pytest
+
+# the gui package loads Qt WebEngine
+pytest.importorskip("PyQt5.QtWebEngineWidgets", exc_type=ImportError)
+
+from ereader.gui.commandserver import CommandServer  # noqa: E402
+from ereader.gui.shell import CommandDispatcher, captureOutput, parseCommand, splitCommands  # noqa: E402
+
+
+class FakeShell:
+    def goto(self, percentage, note: bool = False) -> tuple:
+        return percentage, note
+
+    def show(self, text: str) -> str:
+        print(text)
+        return text
+
+    def highlight(self, note: str = "", notify: bool = True) -> tuple:
+        return note, notify
+
+
+@pytest.fixture
+def dispatcher():
+    return CommandDispatcher(FakeShell())
+
+
+def test_parseCommand():
+    assert parseCommand('goto 50 --note --limit=10 "two words"') == ("goto", [50, "two words"],
+                                                                      {"note": True, "limit": 10})
+    assert parseCommand("search x --allPages=True") == ("search", ["x"], {"allPages": True})
+    with pytest.raises(ValueError):
+        parseCommand("   ")
+
+
+def test_no_prefix_negates_only_known_flags():
+    parameters = {"goto": {"percentage", "note"}, "highlight": {"note", "notify"}}
+    assert parseCommand("goto 1 --note", parameters)[2] == {"note": True}
+    assert parseCommand("highlight --nonotify", parameters)[2] == {"notify": False}
+    # notify is a parameter of its own, not the negation of tify
+    assert parseCommand("highlight --notify", parameters)[2] == {"notify": True}
+    assert parseCommand("goto 1 --nothing", parameters)[2] == {"nothing": True}
+
+
+def test_splitCommands():
+    assert splitCommands('next; search "a;b"\nprev;') == ["next", ' search "a;b"', "prev"]
+    assert splitCommands("goto 'it''s; fine'; index") == ["goto 'it''s; fine'", " index"]
+
+
+def test_dispatch(dispatcher):
+    assert dispatcher.dispatch("goto 10 --note") == {"ok": True, "command": "goto 10 --note", "result": (10, True),
+                                                     "output": ""}
+    assert dispatcher.dispatch("show hello")["output"] == "hello\n"
+    assert dispatcher.dispatch("unknown")["error"] == "KeyError: 'unknown command: unknown'"
+    assert not dispatcher.dispatch(None)["ok"]
+    assert [reply["result"] for reply in dispatcher.dispatchBatch("goto 1; goto 2")] == [(1, False), (2, False)]
+
+
+def test_capture_is_per_thread():
+    buffer, started, release = io.StringIO(), threading.Event(), threading.Event()
+
+    def background():
+        started.set()
+        release.wait(1)
+        print("background")
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    started.wait(1)
+    with captureOutput(buffer):
+        print("captured")
+        release.set()
+        thread.join()
+    assert buffer.getvalue() == "captured\n"
+
+
+def test_server_rejects_malformed_json(dispatcher):
+    server = CommandServer(dispatcher)
+    assert server.handle('["goto 5", "goto 6"]')[1]["result"] == (6, False)
+    for request in ("[1]", '["goto 1", {}]', "[{"):
+        assert server.handle(request)["ok"] is False
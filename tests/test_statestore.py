@@ -0,0 +1,65 @@
+import pickle
+
+import pytest
+
+from ereader.utils import StateStore
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    legacyPath = tmp_path / ".ereader"
+    with open(legacyPath, "wb") as f:
+        pickle.dump({"currentEpubPath": str(tmp_path / "book.epub"),
+                     "currentReadProgress": {"pageIndex": 3, "scrollHeight": 120}}, f)
+    return legacyPath
+
+
+def test_migrates_the_legacy_state_once(tmp_path, legacy):
+    store = StateStore(str(tmp_path / "state.db"), str(legacy))
+    epubPath = str(tmp_path / "book.epub")
+    assert store["currentEpubPath"] == epubPath
+    assert store.progress(epubPath) == {"pageIndex": 3, "scrollHeight": 120}
+    store.setProgress(epubPath, {"pageIndex": 5})
+    store.close()
+
+    reopened = StateStore(str(tmp_path / "state.db"), str(legacy))
+    assert reopened.progress(epubPath) == {"pageIndex": 5}
+    reopened.close()
+
+
+def test_damaged_legacy_state_is_skipped(tmp_path):
+    legacyPath = tmp_path / ".ereader"
+    legacyPath.write_bytes(b"not a pickle")
+    store = StateStore(str(tmp_path / "state.db"), str(legacyPath))
+    assert "currentEpubPath" not in store and store["migrated"] is True
+    store.close()
+
+
+def test_state(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    epubPath = str(tmp_path / "book.epub")
+    store["key"] = {"nested": [1, 2]}
+    assert store["key"] == {"nested": [1, 2]} and "key" in store
+    del store["key"]
+    with pytest.raises(KeyError):
+        store["key"]
+
+    first = store.addBookmark(epubPath, {"pageIndex": 1, "pagePath": "a.xhtml"}, "note")
+    store.addBookmark(epubPath, {"pageIndex": 2})
+    assert [bookmark["progress"]["pageIndex"] for bookmark in store.bookmarks(epubPath)] == [1, 2]
+    store.removeBookmark(first)
+    assert len(store.bookmarks(epubPath)) == 1
+
+    store.setSetting("fontSize", 20)
+    assert store.settings() == {"fontSize": 20}
+    store.close()
+
+
+def test_transaction_rolls_back(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store["key"] = 1
+            raise RuntimeError
+    assert "key" not in store
+    store.close()